@@ -4,6 +4,9 @@ from rest_framework.response import Response
 from rest_framework.permissions import IsAuthenticated
 from core.models import Activity, ActivityRegistration
 from core.serializers import ActivitySerializer, ActivityRegistrationSerializer
+from core.permissions import IsAdminOrCanBoDoan
+from core.registrations import bulk_transition, parse_id_list
+from core.notifications import notify_users
 from django.db.models import Count, Sum, F, Q
 from django.utils import timezone
 
@@ -71,6 +74,10 @@ class ActivityViewSet(viewsets.ModelViewSet):
                 'registration_id': existing_registration.id
             }, status=status.HTTP_400_BAD_REQUEST)
         
+        # Đăng ký đã được đóng (thủ công hoặc bởi scheduler khi qua hạn)
+        if not activity.registration_open:
+            return Response({'detail': 'Registration is closed'}, status=status.HTTP_400_BAD_REQUEST)
+        
         # Check if registration deadline passed
         if activity.registration_deadline and timezone.now() > activity.registration_deadline:
             print(f"Registration deadline passed: {activity.registration_deadline} vs {timezone.now()}")
@@ -125,13 +132,11 @@ class ActivityViewSet(viewsets.ModelViewSet):
             
             # Create notification for admin/can bo doan about new registration
             from core.models import Notification, User
-            admin_users = User.objects.filter(role__in=['ADMIN', 'CAN_BO_DOAN'])
-            
-            for admin in admin_users:
-                Notification.objects.create(
-                    user=admin,
-                    content=f"Đoàn viên {request.user.full_name} đã đăng ký tham gia hoạt động '{activity.title}'. Vui lòng xét duyệt."
-                )
+            admin_ids = User.objects.filter(role__in=['ADMIN', 'CAN_BO_DOAN']).values_list('id', flat=True)
+            notify_users(
+                admin_ids,
+                f"Đoàn viên {request.user.full_name} đã đăng ký tham gia hoạt động '{activity.title}'. Vui lòng xét duyệt."
+            )
             
             # Create notification for the user
             Notification.objects.create(
@@ -181,13 +186,11 @@ class ActivityViewSet(viewsets.ModelViewSet):
         
         # Create notification for admin/can bo doan about cancellation
         from core.models import User
-        admin_users = User.objects.filter(role__in=['ADMIN', 'CAN_BO_DOAN'])
-        
-        for admin in admin_users:
-            Notification.objects.create(
-                user=admin,
-                content=f"Đoàn viên {request.user.full_name} đã hủy đăng ký tham gia hoạt động '{activity.title}'."
-            )
+        admin_ids = User.objects.filter(role__in=['ADMIN', 'CAN_BO_DOAN']).values_list('id', flat=True)
+        notify_users(
+            admin_ids,
+            f"Đoàn viên {request.user.full_name} đã hủy đăng ký tham gia hoạt động '{activity.title}'."
+        )
         
         return Response({'detail': 'Registration cancelled successfully'}, status=status.HTTP_200_OK)
     
@@ -231,12 +234,33 @@ class ActivityViewSet(viewsets.ModelViewSet):
         serializer = ActivityRegistrationSerializer(registration)
         return Response(serializer.data)
     
+    @action(detail=True, methods=['post'], permission_classes=[IsAdminOrCanBoDoan])
+    def bulk_mark_attendance(self, request, pk=None):
+        activity = self.get_object()
+        
+        try:
+            user_ids = parse_id_list(request.data.get('user_ids'))
+        except (TypeError, ValueError) as e:
+            return Response({'detail': str(e) or 'Invalid user_ids'}, status=status.HTTP_400_BAD_REQUEST)
+        
+        if not user_ids:
+            return Response({'detail': 'user_ids is required'}, status=status.HTTP_400_BAD_REQUEST)
+        
+        summary = bulk_transition('attend', activity_id=activity.id, user_ids=user_ids)
+        return Response(summary)
+    
     @action(detail=False, methods=['get'])
     def stats(self, request):
-        total = Activity.objects.count()
-        upcoming = Activity.objects.filter(start_date__gt=timezone.now()).count()
-        ongoing = Activity.objects.filter(start_date__lte=timezone.now(), end_date__gte=timezone.now()).count()
-        completed = Activity.objects.filter(end_date__lt=timezone.now()).count()
+        # Trạng thái được scheduler cập nhật theo thời gian (core/scheduler.py)
+        counts = Activity.objects.aggregate(
+            total=Count('id'),
+            upcoming=Count('id', filter=Q(status='Upcoming')),
+            ongoing=Count('id', filter=Q(status='Ongoing')),
+            completed=Count('id', filter=Q(status='Completed')),
+        )
+        total, upcoming, ongoing, completed = (
+            counts['total'], counts['upcoming'], counts['ongoing'], counts['completed']
+        )
         
         # Calculate participation stats
         total_participants = ActivityRegistration.objects.filter(status__in=['Approved', 'Attended']).count()
@@ -294,7 +318,7 @@ class DashboardViewSet(viewsets.ViewSet):
         
         # Get upcoming deadlines
         upcoming_deadlines = Activity.objects.filter(
-            registration_deadline__gte=timezone.now()
+            registration_open=True, registration_deadline__gte=timezone.now()
         ).order_by('registration_deadline')[:5]
         
         return Response({
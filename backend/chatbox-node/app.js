@@ -29,8 +29,8 @@ app.get("/health", (req, res) => {
     res.json({ status: "ok", timestamp: new Date().toISOString() });
 });
 
-// Khởi động cập nhật cache tự động mỗi 30 phút
-setupAutomaticRefresh(30);
+// Đồng bộ cache tự động mỗi phút (chỉ tải các thay đổi, xem services/dataCache.js)
+setupAutomaticRefresh(1);
 
 // Chuẩn bị chatbot với context 
 const initChatbot = async () => {
@@ -87,6 +87,13 @@ export const getActivityById = async (activityId) => {
     return callAPI(`/api/activities/${activityId}/`);
 };
 
+// Feed thay đổi: các hoạt động/bài viết đổi sau cursor (xem core/sync.py phía Django)
+export const getChanges = async (cursor = 0, unionVersion = null, limit = 500) => {
+    const params = { cursor, limit };
+    if (unionVersion) params.union_version = unionVersion;
+    return callAPI('/api/sync/changes/', 'GET', params);
+};
+
 // export const getMembers = async (page = 1, pageSize = 10, filters = {}) => {
 //     return callAPI('/members/', 'GET', { page, page_size: pageSize, ...filters });
 // };
@@ -103,6 +110,7 @@ export const getActivityById = async (activityId) => {
 export default {
     getActivities,
     getActivityById,
+    getChanges,
     // getMembers,
     // getEvents,
     // getPosts,
@@ -1,30 +1,126 @@
 import apiService from './apiService.js';
 
-// Cache dữ liệu
+// Cache dữ liệu, đồng bộ tăng dần qua feed /api/sync/changes/:
+// mỗi lần chỉ tải các hoạt động/bài viết thay đổi sau cursor lần trước
 const cache = {
-    activities: { data: null, timestamp: 0 },
-    members: { data: null, timestamp: 0 },
-    posts: { data: null, timestamp: 0 }
+    activities: new Map(),
+    posts: new Map(),
+    unionInfo: null,
+    unionVersion: null,
+    cursor: 0,
+    timestamp: 0,
+    members: { data: null, timestamp: 0 }
 };
 
-// Thời gian cache hết hạn (1 giờ)
-const CACHE_EXPIRY = 60 * 60 * 1000;
+// Dữ liệu cũ hơn khoảng này thì đồng bộ lại trước khi trả về (1 phút, mỗi lần đồng bộ rất nhẹ)
+const CACHE_EXPIRY = 60 * 1000;
 
-// Hàm lấy dữ liệu từ cache hoặc API
-export const getActivitiesData = async (forceRefresh = false) => {
-    const now = Date.now();
+// Số hoạt động tối đa đưa vào prompt của Gemini và độ dài mô tả giữ lại cho mỗi hoạt động
+const ACTIVITIES_LIMIT = 50;
+const DESCRIPTION_LENGTH = 200;
+
+let syncing = null;
+
+const applyChanges = (changes) => {
+    if (changes.reset) {
+        // Cursor không còn hợp lệ phía server (DB được khôi phục): tải lại từ đầu
+        cache.activities.clear();
+        cache.posts.clear();
+        cache.cursor = 0;
+        return;
+    }
+
+    changes.activities.forEach(activity => cache.activities.set(activity.id, activity));
+    changes.posts.forEach(post => cache.posts.set(post.id, post));
+    changes.deleted.activities.forEach(id => cache.activities.delete(id));
+    changes.deleted.posts.forEach(id => cache.posts.delete(id));
+
+    if (changes.union_info) {
+        cache.unionInfo = changes.union_info;
+    }
+    cache.unionVersion = changes.union_version;
+    cache.cursor = changes.cursor;
+};
 
-    if (forceRefresh || !cache.activities.data || (now - cache.activities.timestamp) > CACHE_EXPIRY) {
+// Tải các thay đổi cho tới khi hết (has_more = false)
+export const syncChanges = async () => {
+    // Nhiều lời gọi cùng lúc dùng chung một lần đồng bộ
+    if (!syncing) {
+        syncing = (async () => {
+            try {
+                let changes;
+                do {
+                    changes = await apiService.getChanges(cache.cursor, cache.unionVersion);
+                    applyChanges(changes);
+                } while (changes.has_more || changes.reset);
+                cache.timestamp = Date.now();
+            } finally {
+                syncing = null;
+            }
+        })();
+    }
+    return syncing;
+};
+
+const ensureFresh = async (forceRefresh) => {
+    if (forceRefresh || !cache.timestamp || (Date.now() - cache.timestamp) > CACHE_EXPIRY) {
         try {
-            const data = await apiService.getActivities(1, 50);
-            cache.activities = { data, timestamp: now };
+            await syncChanges();
         } catch (error) {
-            // console.error('Lỗi khi cập nhật cache hoạt động:', error);
-            if (!cache.activities.data) throw error; // Nếu không có dữ liệu cũ, ném lỗi
+            // console.error('Lỗi khi đồng bộ cache:', error);
+            if (!cache.timestamp) throw error; // Nếu không có dữ liệu cũ, ném lỗi
         }
     }
+};
 
-    return cache.activities.data;
+// Hàm lấy dữ liệu từ cache (cùng dạng với response phân trang của API)
+// Chỉ giữ các trường prompt cần, mô tả được cắt ngắn
+const toPromptActivity = (activity) => ({
+    id: activity.id,
+    title: activity.title,
+    type: activity.type,
+    status: activity.status,
+    location: activity.location,
+    start_date: activity.start_date,
+    end_date: activity.end_date,
+    registration_deadline: activity.registration_deadline,
+    registration_open: activity.registration_open,
+    max_participants: activity.max_participants,
+    description: activity.description && activity.description.length > DESCRIPTION_LENGTH
+        ? `${activity.description.slice(0, DESCRIPTION_LENGTH)}…`
+        : activity.description
+});
+
+// Hoạt động sắp tới trước (gần nhất trước), sau đó hoạt động đã qua (mới nhất trước),
+// tối đa limit hoạt động; count là tổng số hoạt động
+export const getActivitiesData = async (forceRefresh = false, limit = ACTIVITIES_LIMIT) => {
+    await ensureFresh(forceRefresh);
+
+    const now = Date.now();
+    const upcoming = [];
+    const past = [];
+    cache.activities.forEach(activity => {
+        (new Date(activity.start_date) > now ? upcoming : past).push(activity);
+    });
+    upcoming.sort((a, b) => new Date(a.start_date) - new Date(b.start_date));
+    past.sort((a, b) => new Date(b.start_date) - new Date(a.start_date));
+
+    const results = upcoming.concat(past).slice(0, limit).map(toPromptActivity);
+    return { count: cache.activities.size, results };
+};
+
+export const getPostsData = async (forceRefresh = false) => {
+    await ensureFresh(forceRefresh);
+
+    const results = [...cache.posts.values()].sort((a, b) =>
+        new Date(b.updated_at) - new Date(a.updated_at)
+    );
+    return { count: results.length, results };
+};
+
+export const getUnionInfo = async (forceRefresh = false) => {
+    await ensureFresh(forceRefresh);
+    return cache.unionInfo;
 };
 
 // export const getMembersData = async (forceRefresh = false) => {
@@ -43,35 +139,12 @@ export const getActivitiesData = async (forceRefresh = false) => {
 //     return cache.members.data;
 // };
 
-// export const getPostsData = async (forceRefresh = false) => {
-//     const now = Date.now();
-
-//     if (forceRefresh || !cache.posts.data || (now - cache.posts.timestamp) > CACHE_EXPIRY) {
-//         try {
-//             const data = await apiService.getPosts(1, 20);
-//             cache.posts = { data, timestamp: now };
-//         } catch (error) {
-//             // console.error('Lỗi khi cập nhật cache bài viết:', error);
-//             if (!cache.posts.data) throw error;
-//         }
-//     }
-
-//     return cache.posts.data;
-// };
-
 // // Cập nhật tất cả cache
 export const refreshAllCaches = async () => {
     try {
-        const ref = await Promise.all([
-            getActivitiesData(true),
-            // getMembersData(true),
-            // getPostsData(true)
-        ]);
+        await syncChanges();
 
-
-        console.log("ref abc : ", ref);
-
-        console.log('Đã cập nhật tất cả cache dữ liệu');
+        console.log(`Đã đồng bộ cache dữ liệu: ${cache.activities.size} hoạt động, ${cache.posts.size} bài viết (cursor ${cache.cursor})`);
         return true;
     } catch (error) {
         console.error('Lỗi khi cập nhật cache:', error);
@@ -80,8 +153,8 @@ export const refreshAllCaches = async () => {
 };
 
 // // Thiết lập cập nhật tự động
-export const setupAutomaticRefresh = (intervalMinutes = 60) => {
-    console.log(`Thiết lập cập nhật cache tự động mỗi ${intervalMinutes} phút`);
+export const setupAutomaticRefresh = (intervalMinutes = 1) => {
+    console.log(`Thiết lập đồng bộ cache tự động mỗi ${intervalMinutes} phút`);
 
     // Cập nhật lần đầu
     refreshAllCaches();
@@ -95,8 +168,9 @@ export const setupAutomaticRefresh = (intervalMinutes = 60) => {
 
 export default {
     getActivitiesData,
+    getPostsData,
+    getUnionInfo,
     // getMembersData,
-    // getPostsData,
     // refreshAllCaches,
     // setupAutomaticRefresh
-};
\ No newline at end of file
+};
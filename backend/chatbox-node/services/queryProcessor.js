@@ -237,13 +237,10 @@ export const processQuery = async (query) => {
           if (intent === "hoạt động sắp tới") {
             // Lọc chỉ lấy hoạt động sắp tới
             const now = new Date();
+            // (getActivitiesData đã xếp hoạt động sắp tới lên trước, gần nhất trước)
             filteredData.results = activitiesData.results.filter(activity => 
               new Date(activity.start_date) > now
             );
-            // Sắp xếp theo thời gian gần nhất
-            filteredData.results.sort((a, b) => 
-              new Date(a.start_date) - new Date(b.start_date)
-            );
             // Giới hạn số lượng
             filteredData.results = filteredData.results.slice(0, params.page_size || 5);
           }
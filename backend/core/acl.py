@@ -0,0 +1,117 @@
+"""
+Phân quyền theo từng bài viết dựa trên bảng permissions.
+
+Mỗi dòng Permission cấp quyền Read/Write/Delete cho một người dùng trên một bài
+viết, hoặc trên mọi bài viết nếu post để trống. Admin, Cán bộ đoàn và tác giả có
+mọi quyền; bài viết đã đăng (Published) thì ai cũng đọc được, bài viết khác chỉ
+đọc được khi có ít nhất một quyền trên bài viết đó.
+
+Toàn bộ quyền của một người dùng được đọc bằng một truy vấn và cache theo phiên
+bản (tăng khi bảng permissions thay đổi), nên hiển thị quyền cho cả một trang bài
+viết không tạo thêm truy vấn nào. Danh sách bài viết được lọc ngay trong SQL.
+Cache chỉ dùng khi có cache dùng chung (REDIS_URL): với cache riêng từng tiến
+trình, quyền bị thu hồi sẽ vẫn còn hiệu lực ở các worker khác, nên khi đó quyền
+luôn được đọc lại từ database.
+"""
+from django.conf import settings
+from django.core.cache import cache
+from django.db import transaction
+from django.db.models import Exists, OuterRef, Q
+
+from .models import Permission
+from .summaries import bump_data_version, get_data_version, has_shared_cache
+
+READ, WRITE, DELETE = 'Read', 'Write', 'Delete'
+PERMISSION_TYPES = (READ, WRITE, DELETE)
+
+OFFICER_ROLES = ['ADMIN', 'CAN_BO_DOAN']
+
+# Bài viết ở trạng thái này ai cũng đọc được
+PUBLIC_POST_STATUSES = ['Published']
+
+# Action của PostViewSet -> quyền cần có trên bài viết
+ACTION_PERMISSIONS = {
+    'retrieve': READ,
+    'update': WRITE,
+    'partial_update': WRITE,
+    'destroy': DELETE,
+}
+
+
+def get_cache_timeout():
+    return getattr(settings, 'ACL_CACHE_TIMEOUT', 300)
+
+
+def version_name(user_id):
+    return f'acl:user:{user_id}'
+
+
+def invalidate_grants(user_ids):
+    names = [version_name(user_id) for user_id in set(user_ids) if user_id]
+    transaction.on_commit(lambda: [bump_data_version(name) for name in names])
+
+
+class Grants:
+    """Quyền của một người dùng: quyền chung và quyền theo id bài viết"""
+
+    def __init__(self, rows):
+        self.global_types = set()
+        self.posts = {}
+        for post_id, permission_type in rows:
+            if post_id is None:
+                self.global_types.add(permission_type)
+            else:
+                self.posts.setdefault(post_id, set()).add(permission_type)
+
+    def types_for(self, post_id):
+        types = self.global_types | self.posts.get(post_id, set())
+        # Có quyền sửa/xóa thì cũng được đọc
+        return types | {READ} if types else types
+
+
+def _load_rows(user):
+    return list(Permission.objects.filter(user_id=user.pk).values_list('post_id', 'permission_type'))
+
+
+def get_grants(user):
+    """Một truy vấn cho mọi quyền của người dùng, cache tới khi permissions thay đổi"""
+    if not has_shared_cache():
+        return Grants(_load_rows(user))
+    key = f'acl:grants:{user.pk}:{get_data_version(version_name(user.pk))}'
+    rows = cache.get(key)
+    if rows is None:
+        rows = _load_rows(user)
+        cache.set(key, rows, get_cache_timeout())
+    return Grants(rows)
+
+
+def is_officer(user):
+    return user.role in OFFICER_ROLES
+
+
+def post_access(user, post, grants):
+    """Danh sách quyền của người dùng trên bài viết"""
+    if is_officer(user) or post.user_id == user.pk:
+        return list(PERMISSION_TYPES)
+    allowed = grants.types_for(post.pk)
+    if post.status in PUBLIC_POST_STATUSES:
+        allowed = allowed | {READ}
+    return [permission_type for permission_type in PERMISSION_TYPES if permission_type in allowed]
+
+
+def has_post_permission(user, post, permission_type, grants=None):
+    if is_officer(user) or post.user_id == user.pk:
+        return True
+    if permission_type == READ and post.status in PUBLIC_POST_STATUSES:
+        return True
+    return permission_type in (grants or get_grants(user)).types_for(post.pk)
+
+
+def readable_posts(queryset, user):
+    """Lọc bài viết người dùng được đọc bằng điều kiện SQL (EXISTS trên permissions)"""
+    if is_officer(user) or get_grants(user).global_types:
+        return queryset
+    granted = Permission.objects.filter(user_id=user.pk, post=OuterRef('pk'))
+    return queryset.filter(
+        Q(status__in=PUBLIC_POST_STATUSES) | Q(user_id=user.pk) | Exists(granted)
+    )
@@ -3,7 +3,8 @@ from django.contrib.auth.admin import UserAdmin as BaseUserAdmin
 from django.contrib.auth.models import Group
 from .models import (
     User, Post, Activity, WorkSchedule, 
-    ActivityRegistration, Notification, Permission
+    ActivityRegistration, Notification, Permission, ScheduledJob, ActivityReminder, ChatIntent, ChatKeyword,
+    ChatQueryLog, RolloverCheckpoint, OrganizationUnit
 )
 
 class UserAdmin(BaseUserAdmin):
@@ -31,8 +32,8 @@ class PostAdmin(admin.ModelAdmin):
     date_hierarchy = 'created_at'
 
 class ActivityAdmin(admin.ModelAdmin):
-    list_display = ('title', 'user', 'status', 'start_date', 'end_date')
-    list_filter = ('status', 'start_date')
+    list_display = ('title', 'user', 'status', 'start_date', 'end_date', 'registration_open')
+    list_filter = ('status', 'registration_open', 'start_date')
     search_fields = ('title', 'description')
     date_hierarchy = 'start_date'
 
@@ -59,6 +60,41 @@ class PermissionAdmin(admin.ModelAdmin):
     list_filter = ('permission_type',)
     search_fields = ('user__username', 'post__title')
 
+class ScheduledJobAdmin(admin.ModelAdmin):
+    list_display = ('name', 'enabled', 'interval_seconds', 'last_run_at', 'next_run_at')
+    list_filter = ('enabled',)
+    readonly_fields = ('last_run_at', 'last_result', 'last_error')
+
+class ChatKeywordInline(admin.TabularInline):
+    model = ChatKeyword
+    extra = 1
+
+class ChatIntentAdmin(admin.ModelAdmin):
+    list_display = ('name', 'priority', 'is_fallback', 'is_active', 'updated_at')
+    list_filter = ('is_active', 'is_fallback')
+    search_fields = ('name', 'answer', 'keywords__phrase')
+    inlines = [ChatKeywordInline]
+
+class ChatQueryLogAdmin(admin.ModelAdmin):
+    list_display = ('query', 'intent', 'cache_hit', 'created_at')
+    list_filter = ('cache_hit', 'intent')
+    search_fields = ('query', 'normalized')
+
+class OrganizationUnitAdmin(admin.ModelAdmin):
+    list_display = ('name', 'kind', 'parent', 'depth')
+    list_filter = ('kind',)
+    search_fields = ('name',)
+    readonly_fields = ('path', 'depth')
+
+class RolloverCheckpointAdmin(admin.ModelAdmin):
+    list_display = ('name', 'step', 'last_id', 'started_at', 'completed_at')
+    readonly_fields = ('plan', 'step', 'last_id', 'counts', 'started_at', 'updated_at', 'completed_at')
+
+class ActivityReminderAdmin(admin.ModelAdmin):
+    list_display = ('activity', 'kind', 'due_at', 'sent_at', 'recipients')
+    list_filter = ('kind',)
+    raw_id_fields = ('activity',)
+
 admin.site.register(User, UserAdmin)
 admin.site.register(Post, PostAdmin)
 admin.site.register(Activity, ActivityAdmin)
@@ -66,4 +102,10 @@ admin.site.register(WorkSchedule, WorkScheduleAdmin)
 admin.site.register(ActivityRegistration, ActivityRegistrationAdmin)
 admin.site.register(Notification, NotificationAdmin)
 admin.site.register(Permission, PermissionAdmin)
+admin.site.register(ScheduledJob, ScheduledJobAdmin)
+admin.site.register(ActivityReminder, ActivityReminderAdmin)
+admin.site.register(ChatIntent, ChatIntentAdmin)
+admin.site.register(ChatQueryLog, ChatQueryLogAdmin)
+admin.site.register(RolloverCheckpoint, RolloverCheckpointAdmin)
+admin.site.register(OrganizationUnit, OrganizationUnitAdmin)
 admin.site.unregister(Group) 
\ No newline at end of file
@@ -3,4 +3,7 @@ from django.apps import AppConfig
 class CoreConfig(AppConfig):
     default_auto_field = 'django.db.models.BigAutoField'
     name = 'core'
-    verbose_name = 'Quản lý Đoàn viên' 
\ No newline at end of file
+    verbose_name = 'Quản lý Đoàn viên'
+
+    def ready(self):
+        from . import signals  # noqa: F401
@@ -0,0 +1,138 @@
+"""
+Các view bất đồng bộ (chạy dưới ASGI, xem project/asgi.py).
+"""
+import asyncio
+import json
+
+from asgiref.sync import sync_to_async
+from django.contrib.auth import get_user_model
+from django.core.handlers.asgi import ASGIRequest
+from django.http import JsonResponse, StreamingHttpResponse
+from rest_framework.exceptions import AuthenticationFailed
+from rest_framework_simplejwt.exceptions import InvalidToken, TokenError
+
+from .authentication import CachedJWTAuthentication
+from .dashboard import OFFICER_WIDGETS, WIDGETS, abuild_widgets
+from .notifications import get_unread_count, hub, read_stream_ticket
+
+User = get_user_model()
+
+# Sau khoảng thời gian này không có thông báo mới, gửi keepalive và kiểm tra bộ đếm
+STREAM_KEEPALIVE_SECONDS = 25
+
+
+async def aauthenticate(request):
+    """Xác thực JWT trong header Authorization cho view async"""
+    authentication = CachedJWTAuthentication()
+    header = authentication.get_header(request)
+    raw_token = authentication.get_raw_token(header) if header else None
+    if not raw_token:
+        return None
+    try:
+        validated_token = authentication.get_validated_token(raw_token)
+        user = await sync_to_async(authentication.get_user)(validated_token)
+    except (InvalidToken, TokenError, AuthenticationFailed):
+        return None
+    return user if user.is_active else None
+
+
+async def aauthenticate_stream(request):
+    """Header Authorization, hoặc ?ticket= lấy từ POST /api/notifications/stream-ticket/"""
+    ticket = request.GET.get('ticket')
+    if not ticket:
+        return await aauthenticate(request)
+    user_id = await sync_to_async(read_stream_ticket)(ticket)
+    if user_id is None:
+        return None
+    return await User.objects.filter(pk=user_id, is_active=True).afirst()
+
+
+def unauthorized():
+    return JsonResponse({'detail': 'Authentication credentials were not provided or are invalid.'}, status=401)
+
+
+def is_officer(user):
+    return user.role in ['ADMIN', 'CAN_BO_DOAN']
+
+
+def sse_event(event, data):
+    return f"event: {event}\ndata: {json.dumps(data, ensure_ascii=False)}\n\n"
+
+
+async def notification_events(user_id):
+    """
+    Luồng Server-Sent Events: thông báo mới trong cùng process được đẩy ngay;
+    định kỳ đọc lại bộ đếm để nhận thay đổi từ các worker khác.
+    """
+    entry = hub.subscribe(user_id)
+    queue = entry[1]
+    try:
+        last_count = await sync_to_async(get_unread_count)(user_id)
+        yield sse_event('unread', {'unread_count': last_count})
+        while True:
+            try:
+                payload = await asyncio.wait_for(queue.get(), timeout=STREAM_KEEPALIVE_SECONDS)
+            except asyncio.TimeoutError:
+                count = await sync_to_async(get_unread_count)(user_id)
+                if count != last_count:
+                    last_count = count
+                    yield sse_event('unread', {'unread_count': count})
+                else:
+                    yield ': keepalive\n\n'
+                continue
+            last_count += 1
+            yield sse_event('notification', payload)
+    finally:
+        hub.unsubscribe(user_id, entry)
+
+
+async def notification_stream(request):
+    """
+    GET /api/notifications/stream/ - nhận thông báo mới không cần polling
+    """
+    user = await aauthenticate_stream(request)
+    if user is None:
+        return unauthorized()
+    # Dưới WSGI Django đọc hết iterator async trước khi gửi: luồng vô tận sẽ treo worker
+    if not isinstance(request, ASGIRequest):
+        return JsonResponse(
+            {'detail': 'Luồng thông báo cần chạy dưới ASGI (uvicorn project.asgi:application).'}, status=501
+        )
+
+    response = StreamingHttpResponse(notification_events(user.id), content_type='text/event-stream')
+    response['Cache-Control'] = 'no-cache'
+    response['X-Accel-Buffering'] = 'no'
+    return response
+
+
+async def dashboard_all(request):
+    """
+    GET /api/dashboard/all/ - dữ liệu của mọi widget dashboard trong một lần gọi.
+    Toàn bộ truy vấn của các widget chạy song song.
+    """
+    if request.method != 'GET':
+        return JsonResponse({'detail': f'Method "{request.method}" not allowed.'}, status=405)
+    user = await aauthenticate(request)
+    if user is None:
+        return unauthorized()
+
+    names = [name for name in WIDGETS if name not in OFFICER_WIDGETS or is_officer(user)]
+    return JsonResponse(await abuild_widgets(names))
+
+
+def async_widget_view(name):
+    """Phiên bản async của một endpoint dashboard/báo cáo"""
+    async def view(request):
+        if request.method != 'GET':
+            return JsonResponse({'detail': f'Method "{request.method}" not allowed.'}, status=405)
+        user = await aauthenticate(request)
+        if user is None:
+            return unauthorized()
+        if name in OFFICER_WIDGETS and not is_officer(user):
+            return JsonResponse({'detail': 'You do not have permission to perform this action.'}, status=403)
+
+        payload = await abuild_widgets([name])
+        return JsonResponse(payload[name])
+
+    view.__name__ = f'async_{name}'
+    return view
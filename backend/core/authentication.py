@@ -0,0 +1,130 @@
+"""
+Xác thực JWT với cache người dùng.
+
+JWTAuthentication mặc định đọc bảng người dùng ở mỗi request. Ở đây dòng người
+dùng được giữ trong một cache LRU nhỏ trong tiến trình, hết hạn sau
+AUTH_USER_CACHE_TTL giây. Mỗi người dùng có một số phiên bản trong Django cache,
+được tăng khi User được lưu/xóa (core/signals.py): worker khác thấy phiên bản đổi
+sẽ đọc lại từ DB, nên khóa tài khoản hay đổi vai trò có hiệu lực ngay.
+
+Điều đó cần cache chung giữa các worker (REDIS_URL). Với cache riêng từng tiến
+trình (LocMem, mặc định khi không đặt REDIS_URL) hay DummyCache, worker khác không
+thấy phiên bản đổi nên cache người dùng bị tắt.
+"""
+import threading
+import time
+from collections import OrderedDict
+
+from django.conf import settings
+from django.contrib.auth import get_user_model
+from django.db import router, transaction
+from django.utils.translation import gettext_lazy as _
+from rest_framework.exceptions import AuthenticationFailed
+from rest_framework_simplejwt.authentication import JWTAuthentication
+from rest_framework_simplejwt.exceptions import InvalidToken
+from rest_framework_simplejwt.settings import api_settings
+
+from .summaries import bump_data_version, get_data_version, has_shared_cache
+
+User = get_user_model()
+
+
+def get_cache_ttl():
+    # Phiên bản người dùng phải dùng chung giữa các worker, nếu không thì tắt cache
+    if not has_shared_cache():
+        return 0
+    return getattr(settings, 'AUTH_USER_CACHE_TTL', 60)
+
+
+def get_cache_size():
+    return getattr(settings, 'AUTH_USER_CACHE_SIZE', 1000)
+
+
+def user_version_name(user_id):
+    return f'auth:user:{user_id}'
+
+
+class UserCache:
+    """LRU giới hạn số phần tử, mỗi phần tử có hạn dùng; an toàn giữa các thread"""
+
+    def __init__(self):
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, key, version):
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                return None
+            values, entry_version, expires_at = entry
+            if entry_version != version or expires_at <= time.monotonic():
+                del self._entries[key]
+                return None
+            self._entries.move_to_end(key)
+            return values
+
+    def set(self, key, version, values):
+        with self._lock:
+            self._entries[key] = (values, version, time.monotonic() + get_cache_ttl())
+            self._entries.move_to_end(key)
+            while len(self._entries) > get_cache_size():
+                self._entries.popitem(last=False)
+
+    def delete(self, key):
+        with self._lock:
+            self._entries.pop(key, None)
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+
+
+user_cache = UserCache()
+
+
+def _field_names():
+    return [field.attname for field in User._meta.concrete_fields]
+
+
+def get_cached_user(user_id):
+    """
+    Người dùng theo id, hoặc None nếu không tồn tại. Mỗi lần gọi trả về một
+    instance mới (dựng từ giá trị đã cache) để request không sửa lẫn nhau.
+    """
+    if get_cache_ttl() <= 0:
+        return User.objects.filter(pk=user_id).first()
+
+    version = get_data_version(user_version_name(user_id))
+    names = _field_names()
+    values = user_cache.get(user_id, version)
+    if values is None:
+        values = User.objects.filter(pk=user_id).values_list(*names).first()
+        if values is None:
+            return None
+        user_cache.set(user_id, version, values)
+    return User.from_db(router.db_for_read(User), names, values)
+
+
+def invalidate_user(user_id):
+    """Bỏ cache trong tiến trình ngay, tăng phiên bản chung sau khi commit"""
+    user_cache.delete(user_id)
+    transaction.on_commit(lambda: bump_data_version(user_version_name(user_id)))
+
+
+class CachedJWTAuthentication(JWTAuthentication):
+    def get_user(self, validated_token):
+        # Kiểm tra token bị thu hồi khi đổi mật khẩu (simplejwt mới) dùng đường mặc định
+        if getattr(api_settings, 'CHECK_REVOKE_TOKEN', False):
+            return super().get_user(validated_token)
+
+        try:
+            user_id = validated_token[api_settings.USER_ID_CLAIM]
+        except KeyError:
+            raise InvalidToken(_('Token contained no recognizable user identification'))
+
+        user = get_cached_user(user_id)
+        if user is None:
+            raise AuthenticationFailed(_('User not found'), code='user_not_found')
+        if not user.is_active:
+            raise AuthenticationFailed(_('User is inactive'), code='user_inactive')
+        return user
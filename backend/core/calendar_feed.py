@@ -0,0 +1,267 @@
+"""
+Lịch iCalendar (RFC 5545) cho từng người dùng: hoạt động đã đăng ký hoặc tự tạo
+và lịch công tác của chính người đó.
+
+Ứng dụng lịch không gửi được JWT nên feed được truy cập qua URL chứa token ký số.
+Token gồm id và User.calendar_token_version; tăng phiên bản (rotate_feed_token)
+thu hồi mọi URL đã phát. Mỗi lần poll đọc một dòng người dùng để kiểm tra token.
+Mỗi sự kiện được dựng một lần và cache theo (id, updated_at), feed chỉ dựng lại
+các sự kiện đã thay đổi. Cả feed được cache theo phiên bản dữ liệu của người dùng
+(signal tăng phiên bản khi dữ liệu đổi) nên lần poll lặp lại không dựng lại feed.
+Không có cache dùng chung (REDIS_URL) thì phiên bản tăng ở tiến trình khác, ví dụ
+scheduler, không tới được web worker: feed được dựng mỗi lần, ETag theo nội dung.
+"""
+import hashlib
+from datetime import datetime, timedelta
+
+from django.conf import settings
+from django.contrib.auth import get_user_model
+from django.core import signing
+from django.core.cache import cache
+from django.db import transaction
+from django.db.models import F, Q
+from django.http import Http404, HttpResponse
+from django.utils import timezone
+from django.utils.cache import get_conditional_response
+from django.utils.dateparse import parse_date
+from django.utils.http import quote_etag
+
+from .models import Activity, ActivityRegistration, WorkSchedule
+from .summaries import bump_data_version, get_data_version, has_shared_cache
+
+User = get_user_model()
+
+CALENDAR_SALT = 'core.calendar'
+CALENDAR_CONTENT_TYPE = 'text/calendar; charset=utf-8'
+PRODID = '-//Quan ly Doan vien//Lich hoat dong//VI'
+UID_DOMAIN = 'doanvien'
+
+# Đăng ký ở các trạng thái này không xuất hiện trong lịch
+FEED_EXCLUDED_STATUSES = ['Rejected', 'Cancelled']
+
+# Khoảng ngày mặc định và tối đa của feed
+FEED_PAST_DAYS = 30
+FEED_FUTURE_DAYS = 365
+FEED_MAX_DAYS = 730
+
+# Lịch công tác chỉ có thời điểm bắt đầu
+SCHEDULE_DURATION = timedelta(hours=1)
+
+ACTIVITY_EVENT_FIELDS = ['id', 'title', 'description', 'location', 'start_date', 'end_date', 'updated_at']
+SCHEDULE_EVENT_FIELDS = ['id', 'title', 'description', 'schedule_date', 'updated_at']
+
+
+def get_cache_timeout():
+    return getattr(settings, 'CALENDAR_FEED_CACHE_TIMEOUT', 3600)
+
+
+def make_feed_token(user):
+    return signing.Signer(salt=CALENDAR_SALT).sign(f'{user.pk}:{user.calendar_token_version}')
+
+
+def read_feed_token(token):
+    """
+    Trả về id người dùng nếu token hợp lệ, đúng phiên bản hiện tại và tài khoản
+    còn hoạt động; ngược lại None
+    """
+    try:
+        user_id, _, version = signing.Signer(salt=CALENDAR_SALT).unsign(token).partition(':')
+        # Token phát trước khi có phiên bản chỉ chứa id: coi là phiên bản 0
+        user_id, version = int(user_id), int(version or 0)
+    except (signing.BadSignature, ValueError):
+        return None
+    if not User.objects.filter(pk=user_id, is_active=True, calendar_token_version=version).exists():
+        return None
+    return user_id
+
+
+def rotate_feed_token(user):
+    """Thu hồi các URL lịch đã phát của user, trả về token mới"""
+    user.calendar_token_version = F('calendar_token_version') + 1
+    user.save(update_fields=['calendar_token_version'])
+    user.refresh_from_db(fields=['calendar_token_version'])
+    return make_feed_token(user)
+
+
+def activities_version_name():
+    return 'calendar:activities'
+
+
+def user_version_name(user_id):
+    return f'calendar:user:{user_id}'
+
+
+def invalidate_user_feeds(user_ids):
+    """Làm mới feed của các người dùng sau khi transaction hiện tại commit"""
+    names = [user_version_name(user_id) for user_id in set(user_ids)]
+    transaction.on_commit(lambda: [bump_data_version(name) for name in names])
+
+
+def feed_window(params):
+    """
+    ?start=YYYY-MM-DD&end=YYYY-MM-DD, mặc định từ 30 ngày trước tới 365 ngày sau.
+    Raise ValueError nếu không hợp lệ.
+    """
+    today = datetime.now().date()
+    start = parse_date(params['start']) if params.get('start') else today - timedelta(days=FEED_PAST_DAYS)
+    end = parse_date(params['end']) if params.get('end') else today + timedelta(days=FEED_FUTURE_DAYS)
+    if start is None or end is None:
+        raise ValueError('start và end phải có dạng YYYY-MM-DD')
+    if end <= start:
+        raise ValueError('end phải sau start')
+    if (end - start).days > FEED_MAX_DAYS:
+        raise ValueError(f'Khoảng thời gian tối đa {FEED_MAX_DAYS} ngày')
+    return datetime.combine(start, datetime.min.time()), datetime.combine(end, datetime.min.time())
+
+
+def escape_text(value):
+    return (
+        (value or '').replace('\\', '\\\\').replace(';', '\\;').replace(',', '\\,')
+        .replace('\r\n', '\\n').replace('\n', '\\n')
+    )
+
+
+def fold(line):
+    """Ngắt dòng dài hơn 75 byte (RFC 5545 3.1), không cắt giữa ký tự UTF-8"""
+    parts = []
+    current, size = '', 0
+    for char in line:
+        char_size = len(char.encode('utf-8'))
+        if size + char_size > 75:
+            parts.append(current)
+            current, size = ' ', 1
+        current += char
+        size += char_size
+    parts.append(current)
+    return '\r\n'.join(parts)
+
+
+def format_datetime(moment):
+    # USE_TZ=False: thời gian lưu theo giờ địa phương nên xuất dạng "floating time"
+    if timezone.is_aware(moment):
+        return moment.astimezone(timezone.utc).strftime('%Y%m%dT%H%M%SZ')
+    return moment.strftime('%Y%m%dT%H%M%S')
+
+
+def render_event(uid, stamp, start, end, summary, description='', location=''):
+    lines = [
+        'BEGIN:VEVENT',
+        f'UID:{uid}@{UID_DOMAIN}',
+        f'DTSTAMP:{format_datetime(stamp)}',
+        f'DTSTART:{format_datetime(start)}',
+        f'DTEND:{format_datetime(end)}',
+        f'SUMMARY:{escape_text(summary)}',
+    ]
+    if description:
+        lines.append(f'DESCRIPTION:{escape_text(description)}')
+    if location:
+        lines.append(f'LOCATION:{escape_text(location)}')
+    lines.append('END:VEVENT')
+    return '\r\n'.join(fold(line) for line in lines)
+
+
+def render_activity(row):
+    return render_event(
+        f"activity-{row['id']}", row['updated_at'], row['start_date'], row['end_date'],
+        row['title'], row['description'], row['location'],
+    )
+
+
+def render_schedule(row):
+    return render_event(
+        f"schedule-{row['id']}", row['updated_at'], row['schedule_date'],
+        row['schedule_date'] + SCHEDULE_DURATION, row['title'], row['description'],
+    )
+
+
+def _render_incrementally(kind, queryset, fields, render):
+    """
+    Lấy (id, updated_at) của các sự kiện, chỉ đọc đầy đủ và dựng lại
+    những sự kiện chưa có trong cache.
+    """
+    stamps = list(queryset.values_list('id', 'updated_at'))
+    keys = [f'calendar:event:{kind}:{pk}:{updated_at.timestamp()}' for pk, updated_at in stamps]
+    chunks = cache.get_many(keys)
+
+    missing = {pk: key for (pk, _), key in zip(stamps, keys) if key not in chunks}
+    if missing:
+        rendered = {
+            missing[row['id']]: render(row)
+            for row in queryset.model.objects.filter(id__in=list(missing)).values(*fields)
+        }
+        cache.set_many(rendered, get_cache_timeout())
+        chunks.update(rendered)
+    return [chunks[key] for key in keys if key in chunks]
+
+
+def build_feed(user_id, start, end):
+    """Nội dung feed, hoặc None nếu người dùng không tồn tại/đã bị khóa"""
+    if not User.objects.filter(pk=user_id, is_active=True).exists():
+        return None
+
+    registered = ActivityRegistration.objects.filter(user_id=user_id).exclude(
+        status__in=FEED_EXCLUDED_STATUSES
+    ).values('activity_id')
+    activities = Activity.objects.filter(
+        start_date__lt=end, end_date__gte=start
+    ).filter(Q(user_id=user_id) | Q(id__in=registered)).order_by('start_date')
+    schedules = WorkSchedule.objects.filter(
+        user_id=user_id, schedule_date__gte=start, schedule_date__lt=end
+    ).order_by('schedule_date')
+
+    events = _render_incrementally('activity', activities, ACTIVITY_EVENT_FIELDS, render_activity)
+    events += _render_incrementally('schedule', schedules, SCHEDULE_EVENT_FIELDS, render_schedule)
+
+    lines = [
+        'BEGIN:VCALENDAR',
+        'VERSION:2.0',
+        f'PRODID:{PRODID}',
+        'CALSCALE:GREGORIAN',
+        'METHOD:PUBLISH',
+        'X-WR-CALNAME:Hoạt động Đoàn',
+        *events,
+        'END:VCALENDAR',
+    ]
+    return '\r\n'.join(lines) + '\r\n'
+
+
+def feed_response(request, user_id, start, end):
+    """Feed của người dùng: 304 nếu ETag còn hợp lệ, ngược lại lấy từ cache hoặc dựng lại"""
+    if not has_shared_cache():
+        content = build_feed(user_id, start, end)
+        if content is None:
+            raise Http404
+        etag = quote_etag(hashlib.md5(content.encode('utf-8')).hexdigest())
+        response = get_conditional_response(request, etag=etag)
+        return _feed_headers(response or _feed_content(content), etag)
+
+    key = ':'.join(str(part) for part in [
+        user_id, get_data_version(activities_version_name()),
+        get_data_version(user_version_name(user_id)), start.date(), end.date(),
+    ])
+    digest = hashlib.md5(key.encode('utf-8')).hexdigest()
+    etag = quote_etag(digest)
+
+    response = get_conditional_response(request, etag=etag)
+    if response is None:
+        cache_key = f'calendar:feed:{digest}'
+        content = cache.get(cache_key)
+        if content is None:
+            content = build_feed(user_id, start, end)
+            if content is None:
+                raise Http404
+            cache.set(cache_key, content, get_cache_timeout())
+        response = _feed_content(content)
+    return _feed_headers(response, etag)
+
+
+def _feed_content(content):
+    response = HttpResponse(content, content_type=CALENDAR_CONTENT_TYPE)
+    response['Content-Disposition'] = 'inline; filename="lich-hoat-dong.ics"'
+    return response
+
+
+def _feed_headers(response, etag):
+    response['ETag'] = etag
+    response['Cache-Control'] = 'private, max-age=300'
+    return response
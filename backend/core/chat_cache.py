@@ -0,0 +1,178 @@
+"""
+Cache câu trả lời và nhật ký câu hỏi của chatbot.
+
+Đoàn viên hỏi đi hỏi lại vài câu (đoàn phí, đăng ký, điểm rèn luyện). Câu trả lời
+được cache theo dạng chuẩn hóa của câu hỏi: bỏ dấu, bỏ từ đệm/hư từ, giữ thứ tự
+các từ; "Cho mình hỏi đóng đoàn phí ở đâu vậy?" và "dong doan phi o dau" dùng
+chung một câu trả lời. Khóa cache gồm phiên bản ý định và phiên bản chỉ mục tìm kiếm
+(core/chatbot.py matcher_version, core/retrieval.py index_version) nên câu trả lời
+cũ tự hết hiệu lực khi ý định, bài viết hay hoạt động thay đổi.
+Khi nối mô hình ngôn ngữ vào build_answer, câu hỏi lặp lại không gọi mô hình.
+
+Mỗi câu hỏi được ghi vào chat_query_logs (trúng cache hay không, ý định) theo lô:
+dòng nhật ký gom trong bộ nhớ và được bulk_create ở thread nền khi đủ
+CHATBOT_LOG_BATCH_SIZE dòng hoặc sau CHATBOT_LOG_FLUSH_SECONDS giây.
+"""
+import atexit
+import hashlib
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+from django.conf import settings
+from django.core.cache import cache
+from django.db import close_old_connections
+from django.db.models import Count, Max, Q
+from django.utils import timezone
+
+from .chatbot import answer_query, fold, get_matcher, matcher_version
+from .models import ChatQueryLog
+from .retrieval import get_index, get_top_k, index_version, search_passages
+
+# Từ đệm/hư từ thường gặp trong câu hỏi (đã bỏ dấu). Từ nào có trong từ khóa của
+# ý định thì vẫn được giữ lại (xem IntentMatcher.terms)
+STOPWORDS = frozenset('''
+    a ah ai anh bi cac cai can cho chu co cua da dang day de den di duoc em gi ha hay hoi
+    khi la lam ma minh muon nao nay ne nhe nhi nha nhu nho oi o phai ra roi sao se the thi
+    to toi va vao vay voi vui long xem
+'''.split())
+
+
+def get_answer_cache_timeout():
+    return getattr(settings, 'CHATBOT_ANSWER_CACHE_TIMEOUT', 3600)
+
+
+def get_log_batch_size():
+    return getattr(settings, 'CHATBOT_LOG_BATCH_SIZE', 50)
+
+
+def get_log_flush_seconds():
+    return getattr(settings, 'CHATBOT_LOG_FLUSH_SECONDS', 30)
+
+
+def normalize_query(query, keep=frozenset()):
+    """
+    Dạng chuẩn hóa của câu hỏi: bỏ dấu, bỏ từ đệm (trừ từ trong keep), giữ nguyên
+    thứ tự các từ vì ý định được so khớp theo cụm từ ("không tham gia" khác
+    "tham gia không")
+    """
+    return ' '.join(word for word in fold(query).split() if word not in STOPWORDS or word in keep)[:255]
+
+
+def answer_key(normalized, versions):
+    digest = hashlib.sha1(normalized.encode('utf-8')).hexdigest()
+    versions = hashlib.sha1(repr(versions).encode('utf-8')).hexdigest()[:16]
+    return f'chatbot:answer:{versions}:{digest}'
+
+
+def build_answer(query, matcher=None, index=None):
+    """Câu trả lời theo ý định kèm các đoạn liên quan nhất (bài viết, hoạt động, quy định)"""
+    answer = answer_query(query, matcher)
+    answer['passages'] = index.results(query, get_top_k()) if index else search_passages(query)
+    if answer['intent'] is None and not answer['sources']:
+        answer['sources'] = [passage['source'] for passage in answer['passages']]
+    return answer
+
+
+def cached_answer(query):
+    """(câu trả lời, có trúng cache không); ghi nhật ký câu hỏi"""
+    # Mỗi phiên bản chỉ đọc một lần cho cả câu hỏi
+    versions = (matcher_version(), index_version())
+    matcher = get_matcher(versions[0])
+    normalized = normalize_query(query, matcher.terms)
+    timeout = get_answer_cache_timeout()
+    # Câu hỏi chỉ gồm từ đệm không đủ nghĩa để dùng chung câu trả lời
+    key = answer_key(normalized, versions) if normalized and timeout > 0 else None
+
+    answer = cache.get(key) if key else None
+    hit = answer is not None
+    if not hit:
+        answer = build_answer(query, matcher, get_index(versions[1]))
+        if key:
+            cache.set(key, answer, timeout)
+    query_log.record(query, normalized, answer['intent'], hit)
+    return answer, hit
+
+
+class QueryLogBuffer:
+    """Gom dòng nhật ký trong bộ nhớ, ghi theo lô ở thread nền"""
+
+    def __init__(self):
+        self._rows = []
+        self._lock = threading.Lock()
+        self._last_flush = time.monotonic()
+        self._executor = None
+
+    def record(self, query, normalized, intent, cache_hit):
+        row = ChatQueryLog(
+            query=query[:500], normalized=normalized, intent=intent,
+            cache_hit=cache_hit, created_at=timezone.now(),
+        )
+        batch_size = get_log_batch_size()
+        # CHATBOT_LOG_BATCH_SIZE=0: ghi ngay trong request
+        if batch_size <= 0:
+            ChatQueryLog.objects.bulk_create([row])
+            return
+        with self._lock:
+            self._rows.append(row)
+            due = len(self._rows) >= batch_size or time.monotonic() - self._last_flush >= get_log_flush_seconds()
+            rows = self._take() if due else None
+        if rows:
+            self._get_executor().submit(self._write_in_worker, rows)
+
+    def flush(self):
+        """Ghi ngay các dòng đang chờ trong thread hiện tại"""
+        with self._lock:
+            rows = self._take()
+        if rows:
+            ChatQueryLog.objects.bulk_create(rows, batch_size=500)
+        return len(rows)
+
+    def _take(self):
+        rows, self._rows = self._rows, []
+        self._last_flush = time.monotonic()
+        return rows
+
+    def _get_executor(self):
+        if self._executor is None:
+            self._executor = ThreadPoolExecutor(max_workers=1, thread_name_prefix='chat-query-log')
+        return self._executor
+
+    @staticmethod
+    def _write_in_worker(rows):
+        try:
+            ChatQueryLog.objects.bulk_create(rows, batch_size=500)
+        finally:
+            # Thread của executor không đi qua vòng đời request, tự đóng kết nối
+            close_old_connections()
+
+
+query_log = QueryLogBuffer()
+
+
+@atexit.register
+def _flush_on_exit():
+    try:
+        query_log.flush()
+    except Exception:
+        # Tiến trình đang dừng (DB có thể đã đóng), bỏ qua lô cuối
+        pass
+
+
+def query_stats(since, limit=20):
+    """Tỉ lệ trúng cache và các câu hỏi không trúng cache thường gặp nhất từ thời điểm since"""
+    logs = ChatQueryLog.objects.filter(created_at__gte=since)
+    totals = logs.aggregate(total=Count('id'), hits=Count('id', filter=Q(cache_hit=True)))
+    top_uncached = (
+        logs.filter(cache_hit=False)
+        .values('normalized')
+        .annotate(count=Count('id'), example=Max('query'), matched_intent=Max('intent'))
+        .order_by('-count', 'normalized')[:limit]
+    )
+    return {
+        'since': since,
+        'total': totals['total'],
+        'cache_hits': totals['hits'],
+        'hit_rate': round(totals['hits'] / totals['total'], 4) if totals['total'] else 0,
+        'top_uncached': list(top_uncached),
+    }
@@ -0,0 +1,167 @@
+"""
+Nhận diện ý định cho chatbot.
+
+Ý định (ChatIntent) và từ khóa (ChatKeyword) nằm trong DB. Từ khóa được chuẩn hóa
+(chữ thường, bỏ dấu tiếng Việt) và biên dịch thành automaton Aho-Corasick, nên
+"diem ren luyen" và "điểm rèn luyện" khớp như nhau và chi phí so khớp chỉ tỉ lệ
+với độ dài câu hỏi, không phụ thuộc số từ khóa. Automaton được giữ trong tiến
+trình và chỉ dựng lại khi bảng ý định/từ khóa thay đổi: có cache dùng chung
+(REDIS_URL) thì theo phiên bản do signal tăng, không có thì theo (MAX(updated_at),
+COUNT) của hai bảng, vì phiên bản trong cache riêng từng tiến trình không tới
+được các worker khác.
+
+Điểm của một ý định là tổng weight x số từ của các từ khóa khác nhau đã khớp:
+cụm từ dài, cụ thể hơn thắng từ đơn lẻ. Điểm bằng nhau thì xét priority.
+"""
+import threading
+import unicodedata
+from collections import deque
+
+from .conditional import queryset_version
+from .models import ChatIntent, ChatKeyword
+from .summaries import get_data_version, has_shared_cache
+
+VERSION_NAME = 'chat_intents'
+
+
+def fold(text):
+    """Chữ thường, bỏ dấu, mọi ký tự không phải chữ/số thành một khoảng trắng"""
+    text = unicodedata.normalize('NFD', text.lower().replace('đ', 'd'))
+    chars = []
+    for char in text:
+        if unicodedata.category(char) == 'Mn':
+            continue
+        chars.append(char if char.isalnum() else ' ')
+    return ' '.join(''.join(chars).split())
+
+
+class Automaton:
+    """Aho-Corasick trên các cụm từ đã chuẩn hóa; chỉ nhận kết quả khớp trọn từ"""
+
+    def __init__(self, phrases):
+        self.goto = [{}]
+        self.fail = [0]
+        self.output = [[]]
+        self.lengths = []
+        for index, phrase in enumerate(phrases):
+            self._add(phrase, index)
+        self._link()
+
+    def _add(self, phrase, index):
+        state = 0
+        for char in phrase:
+            next_state = self.goto[state].get(char)
+            if next_state is None:
+                next_state = len(self.goto)
+                self.goto[state][char] = next_state
+                self.goto.append({})
+                self.fail.append(0)
+                self.output.append([])
+            state = next_state
+        self.output[state].append(index)
+        self.lengths.append(len(phrase))
+
+    def _link(self):
+        queue = deque(self.goto[0].values())
+        while queue:
+            state = queue.popleft()
+            for char, next_state in self.goto[state].items():
+                queue.append(next_state)
+                fallback = self.fail[state]
+                while fallback and char not in self.goto[fallback]:
+                    fallback = self.fail[fallback]
+                self.fail[next_state] = self.goto[fallback].get(char, 0)
+                if self.fail[next_state] == next_state:
+                    self.fail[next_state] = 0
+                self.output[next_state] = self.output[next_state] + self.output[self.fail[next_state]]
+
+    def search(self, text):
+        """Tập chỉ số các cụm từ xuất hiện trong text (đã chuẩn hóa) như một cụm từ trọn vẹn"""
+        found = set()
+        state = 0
+        for position, char in enumerate(text):
+            while state and char not in self.goto[state]:
+                state = self.fail[state]
+            state = self.goto[state].get(char, 0)
+            for index in self.output[state]:
+                start = position - self.lengths[index] + 1
+                end = position + 1
+                if (start == 0 or text[start - 1] == ' ') and (end == len(text) or text[end] == ' '):
+                    found.add(index)
+        return found
+
+
+class IntentMatcher:
+    def __init__(self, intents, keywords):
+        self.intents = {intent['id']: intent for intent in intents}
+        self.fallback = next((intent for intent in intents if intent['is_fallback']), None)
+        phrases, self.keywords = [], []
+        # Các từ có trong từ khóa, không được bỏ khi chuẩn hóa câu hỏi làm khóa cache
+        self.terms = set()
+        for keyword in keywords:
+            phrase = fold(keyword['phrase'])
+            if phrase and keyword['intent_id'] in self.intents:
+                phrases.append(phrase)
+                self.keywords.append((keyword['intent_id'], phrase, keyword['weight'] * len(phrase.split())))
+                self.terms.update(phrase.split())
+        self.automaton = Automaton(phrases)
+
+    def match(self, query):
+        """(ý định, điểm, các từ khóa đã khớp); ý định mặc định nếu không khớp"""
+        scores, matched = {}, {}
+        for index in self.automaton.search(fold(query)):
+            intent_id, phrase, score = self.keywords[index]
+            scores[intent_id] = scores.get(intent_id, 0) + score
+            matched.setdefault(intent_id, []).append(phrase)
+        if not scores:
+            return self.fallback, 0, []
+        best = max(scores, key=lambda intent_id: (scores[intent_id], self.intents[intent_id]['priority']))
+        return self.intents[best], scores[best], sorted(matched[best])
+
+
+_lock = threading.Lock()
+_matcher = None
+_matcher_version = None
+
+
+def load_matcher():
+    intents = list(ChatIntent.objects.filter(is_active=True).values(
+        'id', 'name', 'answer', 'sources', 'priority', 'is_fallback'
+    ))
+    keywords = ChatKeyword.objects.filter(intent__is_active=True, intent__is_fallback=False).values(
+        'intent_id', 'phrase', 'weight'
+    )
+    return IntentMatcher(intents, keywords)
+
+
+def matcher_version():
+    """Phiên bản dữ liệu ý định/từ khóa, giống nhau ở mọi worker"""
+    if has_shared_cache():
+        return get_data_version(VERSION_NAME)
+    return queryset_version(ChatIntent.objects.all()) + queryset_version(ChatKeyword.objects.all())
+
+
+def get_matcher(version=None):
+    """Automaton hiện tại, dựng lại nếu phiên bản dữ liệu ý định đã đổi"""
+    global _matcher, _matcher_version
+    if version is None:
+        version = matcher_version()
+    if _matcher is None or _matcher_version != version:
+        with _lock:
+            if _matcher is None or _matcher_version != version:
+                _matcher = load_matcher()
+                _matcher_version = version
+    return _matcher
+
+
+def answer_query(query, matcher=None):
+    intent, score, keywords = (matcher or get_matcher()).match(query)
+    if intent is None:
+        return {'answer': '', 'sources': [], 'intent': None, 'score': 0, 'keywords': []}
+    return {
+        'answer': intent['answer'],
+        'sources': intent['sources'],
+        'intent': None if intent['is_fallback'] else intent['name'],
+        'score': score,
+        'keywords': keywords,
+    }
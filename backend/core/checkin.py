@@ -0,0 +1,113 @@
+"""
+Điểm danh bằng mã QR: token ký số có thời hạn cho từng hoạt động
+và bộ lọc trong bộ nhớ để bỏ qua các lần quét trùng.
+"""
+import threading
+import time
+from collections import OrderedDict
+
+from django.conf import settings
+from django.core import signing
+from django.utils import timezone
+
+from .models import ActivityRegistration
+from .registrations import BULK_TRANSITIONS
+
+CHECKIN_SALT = 'core.checkin'
+CHECKIN_FROM_STATUSES = BULK_TRANSITIONS['attend'][1]
+
+
+def get_token_max_age():
+    return getattr(settings, 'CHECKIN_TOKEN_MAX_AGE', 600)
+
+
+class CheckinError(Exception):
+    def __init__(self, code, message):
+        super().__init__(message)
+        self.code = code
+        self.message = message
+
+
+class RecentCheckins:
+    """
+    Tập (activity_id, user_id) vừa điểm danh, giới hạn kích thước và thời gian sống.
+    Lần quét lặp lại trong khoảng TTL được trả lời ngay mà không chạm tới DB.
+    """
+    def __init__(self, maxsize=50000, ttl=3600):
+        self.maxsize = maxsize
+        self.ttl = ttl
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+
+    def seen(self, key):
+        with self._lock:
+            expires = self._entries.get(key)
+            if expires is None:
+                return False
+            if expires < time.monotonic():
+                del self._entries[key]
+                return False
+            return True
+
+    def add(self, key):
+        with self._lock:
+            self._entries[key] = time.monotonic() + self.ttl
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.maxsize:
+                self._entries.popitem(last=False)
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+
+
+recent_checkins = RecentCheckins()
+
+
+def make_checkin_token(activity):
+    """Tạo token điểm danh cho hoạt động, hiển thị dưới dạng mã QR tại điểm check-in"""
+    return signing.TimestampSigner(salt=CHECKIN_SALT).sign_object({'a': activity.id})
+
+
+def read_checkin_token(token):
+    """Kiểm tra chữ ký và thời hạn, trả về id hoạt động"""
+    try:
+        payload = signing.TimestampSigner(salt=CHECKIN_SALT).unsign_object(
+            token, max_age=get_token_max_age()
+        )
+    except signing.SignatureExpired:
+        raise CheckinError('expired', 'Mã điểm danh đã hết hạn')
+    except (signing.BadSignature, ValueError, TypeError):
+        raise CheckinError('invalid', 'Mã điểm danh không hợp lệ')
+    return payload['a']
+
+
+def check_in(token, user):
+    """
+    Đánh dấu đăng ký của user là Attended. Gọi lại nhiều lần cho cùng
+    một người vẫn cho cùng kết quả (idempotent).
+    """
+    activity_id = read_checkin_token(token)
+    key = (activity_id, user.id)
+
+    if recent_checkins.seen(key):
+        return {'status': 'already_checked_in', 'activity': activity_id}
+
+    registrations = ActivityRegistration.objects.filter(activity_id=activity_id, user_id=user.id)
+    now = timezone.now()
+    updated = registrations.filter(status__in=CHECKIN_FROM_STATUSES).update(
+        status='Attended',
+        attendance_date=now,
+        updated_at=now
+    )
+    if updated:
+        recent_checkins.add(key)
+        return {'status': 'checked_in', 'activity': activity_id}
+
+    current = registrations.values_list('status', flat=True).first()
+    if current is None:
+        raise CheckinError('not_registered', 'Bạn chưa đăng ký hoạt động này')
+    if current == 'Attended':
+        recent_checkins.add(key)
+        return {'status': 'already_checked_in', 'activity': activity_id}
+    raise CheckinError('invalid_status', f'Không thể điểm danh với trạng thái đăng ký: {current}')
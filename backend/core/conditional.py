@@ -0,0 +1,122 @@
+"""
+Conditional GET (ETag / Last-Modified) cho các endpoint được frontend poll liên tục.
+
+Phiên bản dữ liệu được tính bằng một truy vấn tổng hợp (MAX(updated_at), COUNT)
+trên các bảng mà payload phụ thuộc. Khi client gửi lại ETag/Last-Modified
+và dữ liệu không đổi, view trả về 304 mà không chạy serializer.
+"""
+import hashlib
+from datetime import datetime
+from functools import wraps
+
+from django.db.models import Count, Max
+from django.utils import timezone
+from django.utils.cache import get_conditional_response
+from django.utils.http import http_date, quote_etag
+from rest_framework.response import Response
+
+CACHE_CONTROL = 'private, no-cache'
+
+
+def queryset_version(queryset, field='updated_at'):
+    """(thời điểm thay đổi gần nhất, số dòng) của queryset trong một truy vấn"""
+    stamp = queryset.order_by().aggregate(last_modified=Max(field), count=Count('pk'))
+    return stamp['last_modified'], stamp['count']
+
+
+def _timestamp(value):
+    if value is None:
+        return None
+    if timezone.is_naive(value):
+        value = timezone.make_aware(value)
+    return int(value.timestamp())
+
+
+def build_validators(request, versions, *extra):
+    """
+    Tạo (etag, last_modified) từ danh sách version và các tham số phân biệt
+    (người dùng, query string...). last_modified là timestamp dạng số nguyên.
+    """
+    parts = [request.get_full_path(), getattr(request.user, 'pk', None)]
+    parts.extend(extra)
+    moments = []
+    for version in versions:
+        parts.extend(version)
+        if isinstance(version[0], datetime):
+            moments.append(_timestamp(version[0]))
+    digest = hashlib.md5('|'.join(str(part) for part in parts).encode('utf-8')).hexdigest()
+    return quote_etag(digest), max(moments) if moments else None
+
+
+def not_modified_response(request, etag, last_modified):
+    """Trả về response 304 nếu validator của client còn hợp lệ, ngược lại None"""
+    response = get_conditional_response(request, etag=etag, last_modified=last_modified)
+    if response is not None:
+        set_validators(response, etag, last_modified)
+    return response
+
+
+def set_validators(response, etag, last_modified):
+    response['ETag'] = etag
+    if last_modified is not None:
+        response['Last-Modified'] = http_date(last_modified)
+    response['Cache-Control'] = CACHE_CONTROL
+    return response
+
+
+class ConditionalGetMixin:
+    """
+    Mixin cho ViewSet: list và retrieve trả về 304 khi dữ liệu không đổi.
+
+    Ghi đè get_dependency_versions() để thêm các bảng khác mà payload phụ thuộc
+    (ví dụ số người tham gia tính từ bảng đăng ký).
+    """
+    version_field = 'updated_at'
+
+    def get_dependency_versions(self, instance=None):
+        return []
+
+    def list(self, request, *args, **kwargs):
+        queryset = self.filter_queryset(self.get_queryset())
+        versions = [queryset_version(queryset, self.version_field)] + self.get_dependency_versions()
+        etag, last_modified = build_validators(request, versions)
+
+        response = not_modified_response(request, etag, last_modified)
+        if response is not None:
+            return response
+
+        response = super().list(request, *args, **kwargs)
+        return set_validators(response, etag, last_modified)
+
+    def retrieve(self, request, *args, **kwargs):
+        instance = self.get_object()
+        versions = [(getattr(instance, self.version_field), instance.pk)]
+        versions += self.get_dependency_versions(instance)
+        etag, last_modified = build_validators(request, versions)
+
+        response = not_modified_response(request, etag, last_modified)
+        if response is not None:
+            return response
+
+        serializer = self.get_serializer(instance)
+        return set_validators(Response(serializer.data), etag, last_modified)
+
+
+def conditional_view(version_func):
+    """
+    Decorator cho function view (đặt dưới @api_view/@permission_classes để chạy
+    sau xác thực). version_func(request) trả về danh sách version.
+    """
+    def decorator(view):
+        @wraps(view)
+        def wrapped(request, *args, **kwargs):
+            etag, last_modified = build_validators(request, version_func(request))
+            response = not_modified_response(request, etag, last_modified)
+            if response is not None:
+                return response
+            response = view(request, *args, **kwargs)
+            if response.status_code == 200:
+                set_validators(response, etag, last_modified)
+            return response
+        return wrapped
+    return decorator
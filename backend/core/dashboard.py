@@ -0,0 +1,285 @@
+"""
+Dữ liệu các widget dashboard.
+
+Mỗi widget gồm các truy vấn độc lập (hàm không tham số) và một hàm dựng payload
+từ kết quả. View đồng bộ chạy các truy vấn lần lượt; view async (async_views.py)
+chạy chúng song song nên độ trễ bằng truy vấn chậm nhất thay vì tổng các truy vấn.
+"""
+import asyncio
+from datetime import datetime
+
+from asgiref.sync import sync_to_async
+from django.conf import settings
+from django.contrib.auth import get_user_model
+from django.db import close_old_connections
+from django.db.models import Count, Q
+from django.db.models.functions import ExtractMonth, Substr
+
+from .models import Activity, ActivityRegistration, OrganizationUnit, Post
+
+User = get_user_model()
+
+MONTH_LABELS = ['T1', 'T2', 'T3', 'T4', 'T5', 'T6', 'T7', 'T8', 'T9', 'T10', 'T11', 'T12']
+
+TYPE_CHART_COLORS = [
+    '#4F46E5', '#3B82F6', '#0EA5E9', '#06B6D4', '#14B8A6',
+    '#10B981', '#34D399', '#6EE7B7', '#F59E0B', '#EF4444'
+]
+
+
+# Thống kê tổng quan
+
+def stats_queries():
+    return {
+        'users': lambda: User.objects.count(),
+        'posts': lambda: Post.objects.count(),
+        'activities': lambda: Activity.objects.aggregate(
+            total=Count('id'),
+            upcoming=Count('id', filter=Q(status='Upcoming')),
+            ongoing=Count('id', filter=Q(status='Ongoing')),
+            completed=Count('id', filter=Q(status='Completed')),
+        ),
+        'registrations': lambda: ActivityRegistration.objects.aggregate(
+            total=Count('id'),
+            participants=Count('id', filter=Q(status='Registered')),
+        ),
+        'by_type': lambda: dict(Activity.objects.order_by().values_list('type').annotate(count=Count('id'))),
+    }
+
+
+def build_stats(results):
+    activities = results['activities']
+    registrations = results['registrations']
+    activities_count = activities['total']
+
+    # Tính trung bình số người tham gia mỗi hoạt động
+    average_participation = 0
+    if activities_count > 0:
+        average_participation = registrations['participants'] / activities_count
+
+    # Giữ thứ tự phân loại như trong TYPE_CHOICES
+    activity_by_type = [
+        {'type': activity_type, 'count': results['by_type'][activity_type]}
+        for activity_type, _ in Activity.TYPE_CHOICES
+        if results['by_type'].get(activity_type)
+    ]
+
+    return {
+        'totalUsers': results['users'],
+        'totalActivities': activities_count,
+        'totalPosts': results['posts'],
+        'registrations': registrations['total'],
+
+        'activity_stats': {
+            'total': activities_count,
+            'upcoming': activities['upcoming'],
+            'ongoing': activities['ongoing'],
+            'completed': activities['completed'],
+            'participants': registrations['participants'],
+            'average': round(average_participation, 1),
+            'by_type': activity_by_type
+        }
+    }
+
+
+# Biểu đồ tham gia theo tháng
+
+def participation_chart_queries():
+    current_year = datetime.now().year
+    return {
+        'monthly': lambda: list(
+            ActivityRegistration.objects.filter(
+                registration_date__year=current_year,
+                status='Registered'
+            ).annotate(
+                month=ExtractMonth('registration_date')
+            ).values('month').annotate(
+                count=Count('id')
+            ).order_by('month')
+        ),
+    }
+
+
+def build_participation_chart(results):
+    monthly_counts = [0] * 12
+    for item in results['monthly']:
+        monthly_counts[item['month'] - 1] = item['count']
+
+    return {
+        'labels': MONTH_LABELS,
+        'datasets': [
+            {
+                'label': 'Số lượng đoàn viên tham gia',
+                'data': monthly_counts,
+                'borderColor': '#3B82F6',
+                'backgroundColor': 'rgba(59, 130, 246, 0.1)',
+                'fill': True
+            }
+        ]
+    }
+
+
+# Biểu đồ phân loại hoạt động
+
+def activity_type_chart_queries():
+    return {
+        'by_type': lambda: list(
+            Activity.objects.values('type').annotate(count=Count('type')).order_by('-count')
+        ),
+    }
+
+
+def build_activity_type_chart(results):
+    labels = [item['type'] or 'Không phân loại' for item in results['by_type']]
+    data = [item['count'] for item in results['by_type']]
+
+    background_colors = list(TYPE_CHART_COLORS)
+    while len(background_colors) < len(labels):
+        background_colors.extend(background_colors[:len(labels) - len(background_colors)])
+
+    return {
+        'labels': labels,
+        'datasets': [
+            {
+                'label': 'Số lượng hoạt động theo phân loại',
+                'data': data,
+                'backgroundColor': background_colors[:len(labels)],
+                'borderWidth': 1
+            }
+        ]
+    }
+
+
+# Thống kê đoàn viên
+
+def member_stats_queries():
+    now = datetime.now()
+    members = User.objects.filter(role='DOAN_VIEN')
+    return {
+        'members': lambda: members.aggregate(
+            total=Count('id'),
+            active=Count('id', filter=Q(is_active=True)),
+            new_this_month=Count('id', filter=Q(date_joined__month=now.month, date_joined__year=now.year)),
+        ),
+        'by_role': lambda: dict(User.objects.order_by().values_list('role').annotate(count=Count('id'))),
+        'by_department': lambda: list(
+            members.values('department').annotate(count=Count('id')).order_by('department')
+        ),
+        # Gộp theo Liên chi đoàn khoa (cấp 2 của cây tổ chức) bằng tiền tố của path
+        'by_unit': lambda: dict(
+            members.filter(unit__isnull=False)
+            .annotate(branch=Substr('unit__path', 1, 2 * OrganizationUnit.PATH_SEGMENT))
+            .values_list('branch').annotate(count=Count('id')).order_by()
+        ),
+        'units': lambda: list(OrganizationUnit.objects.filter(depth__lte=1).values('id', 'name', 'path')),
+    }
+
+
+def build_member_stats(results):
+    members = results['members']
+    return {
+        'totalMembers': members['total'],
+        'activeMembers': members['active'],
+        'inactiveMembers': members['total'] - members['active'],
+        'newMembersThisMonth': members['new_this_month'],
+        'membersByRole': [
+            {'role': role, 'count': results['by_role'].get(role, 0)}
+            for role, _ in User.ROLE_CHOICES
+        ],
+        # Chỉ đếm nếu department không phải None hoặc trống
+        'membersByDepartment': [
+            {'department': dept['department'], 'count': dept['count']}
+            for dept in results['by_department'] if dept['department']
+        ],
+        'membersByUnit': [
+            {'unit': unit['id'], 'name': unit['name'], 'count': results['by_unit'][unit['path']]}
+            for unit in results['units'] if results['by_unit'].get(unit['path'])
+        ]
+    }
+
+
+# Báo cáo tổng quan
+
+def report_dashboard_queries():
+    return {
+        'user_stats': lambda: list(User.objects.values('role').annotate(count=Count('id'))),
+        'activity_stats': lambda: Activity.objects.aggregate(
+            total=Count('id'),
+            completed=Count('id', filter=Q(status='Completed')),
+            ongoing=Count('id', filter=Q(status='Published')),
+            upcoming=Count('id', filter=Q(status='Draft')),
+        ),
+        'registration_stats': lambda: ActivityRegistration.objects.aggregate(
+            total=Count('id'),
+            completed=Count('id', filter=Q(status='Completed')),
+            cancelled=Count('id', filter=Q(status='Cancelled')),
+        ),
+    }
+
+
+def build_report_dashboard(results):
+    return {
+        'user_stats': results['user_stats'],
+        'activity_stats': results['activity_stats'],
+        'registration_stats': results['registration_stats'],
+    }
+
+
+WIDGETS = {
+    'stats': (stats_queries, build_stats),
+    'participation_chart': (participation_chart_queries, build_participation_chart),
+    'activity_type_chart': (activity_type_chart_queries, build_activity_type_chart),
+    'member_stats': (member_stats_queries, build_member_stats),
+    'report_dashboard': (report_dashboard_queries, build_report_dashboard),
+}
+
+# Các widget chỉ dành cho Admin và Cán bộ đoàn
+OFFICER_WIDGETS = {'member_stats', 'report_dashboard'}
+
+
+def build_widget(name):
+    """Chạy tuần tự các truy vấn của một widget (dùng cho view đồng bộ)"""
+    queries, build = WIDGETS[name]
+    return build({key: query() for key, query in queries().items()})
+
+
+def _in_own_connection(query):
+    def run():
+        try:
+            return query()
+        finally:
+            # Thread của executor không đi qua vòng đời request, tự đóng kết nối
+            close_old_connections()
+    return run
+
+
+async def run_queries(queries):
+    """
+    Chạy song song các truy vấn, mỗi truy vấn trên một thread (và kết nối DB) riêng.
+    Đặt DASHBOARD_PARALLEL_QUERIES=False để chạy lần lượt trên một kết nối.
+    """
+    names = list(queries)
+    if not getattr(settings, 'DASHBOARD_PARALLEL_QUERIES', True):
+        return {name: await sync_to_async(queries[name])() for name in names}
+
+    results = await asyncio.gather(*(
+        sync_to_async(_in_own_connection(queries[name]), thread_sensitive=False)()
+        for name in names
+    ))
+    return dict(zip(names, results))
+
+
+async def abuild_widgets(names):
+    """Dựng nhiều widget cùng lúc: toàn bộ truy vấn của các widget chạy song song"""
+    queries = {}
+    for name in names:
+        for key, query in WIDGETS[name][0]().items():
+            queries[(name, key)] = query
+
+    results = await run_queries(queries)
+
+    payload = {}
+    for name in names:
+        widget_results = {key: value for (widget, key), value in results.items() if widget == name}
+        payload[name] = WIDGETS[name][1](widget_results)
+    return payload
@@ -0,0 +1,93 @@
+"""
+Tính toán nợ đoàn phí theo quý bằng truy vấn tập hợp (anti-join).
+"""
+import csv
+from decimal import Decimal
+
+from django.contrib.auth import get_user_model
+from django.db.models import Count, DecimalField, FilteredRelation, Q, Sum, Value
+from django.db.models.functions import Coalesce
+
+from .models import UnionFeeStatus
+
+User = get_user_model()
+
+# Mức đoàn phí mặc định khi đoàn viên chưa có bản ghi cho quý
+DEFAULT_FEE_AMOUNT = Decimal(str(UnionFeeStatus._meta.get_field('amount').default))
+
+CSV_HEADER = ['user_id', 'username', 'full_name', 'student_id', 'department',
+              'year', 'quarter', 'has_record', 'outstanding']
+
+
+def arrears_queryset(year, quarter, department=None, unit=None):
+    """
+    Đoàn viên đang hoạt động chưa đóng đoàn phí cho (year, quarter).
+
+    LEFT JOIN với bản ghi đoàn phí của đúng quý đó, giữ lại các dòng không có
+    bản ghi hoặc có bản ghi chưa đóng, tất cả trong một truy vấn.
+    unit: chỉ lấy đoàn viên thuộc đơn vị đó hoặc các đơn vị trực thuộc.
+    """
+    queryset = User.objects.filter(role='DOAN_VIEN', is_active=True).annotate(
+        fee=FilteredRelation(
+            'union_fees',
+            condition=Q(union_fees__year=year, union_fees__quarter=quarter),
+        )
+    ).filter(
+        Q(fee__id__isnull=True) | Q(fee__paid=False)
+    ).annotate(
+        outstanding=Coalesce(
+            'fee__amount',
+            Value(DEFAULT_FEE_AMOUNT),
+            output_field=DecimalField(max_digits=10, decimal_places=2),
+        )
+    )
+
+    if department:
+        queryset = queryset.filter(department=department)
+    if unit is not None:
+        queryset = queryset.filter(unit__path__startswith=unit.path)
+
+    return queryset.order_by('department', 'id')
+
+
+def arrears_by_department(queryset):
+    """Tổng số đoàn viên nợ và số tiền còn thiếu theo từng khoa/ban"""
+    return queryset.order_by().values('department').annotate(
+        members=Count('id'),
+        outstanding_total=Sum('outstanding'),
+    ).order_by('department')
+
+
+def arrears_summary(queryset):
+    totals = queryset.order_by().aggregate(
+        members=Count('id'),
+        outstanding_total=Sum('outstanding'),
+    )
+    return {
+        'members': totals['members'],
+        'outstanding_total': totals['outstanding_total'] or Decimal('0'),
+    }
+
+
+def arrears_rows(queryset, year, quarter):
+    """Duyệt kết quả theo từng khối, không khởi tạo model"""
+    rows = queryset.values_list(
+        'id', 'username', 'full_name', 'student_id', 'department', 'fee__id', 'outstanding'
+    )
+    for user_id, username, full_name, student_id, department, fee_id, outstanding in rows.iterator(chunk_size=2000):
+        yield [user_id, username, full_name, student_id or '', department or '',
+               year, quarter, fee_id is not None, outstanding]
+
+
+class _Echo:
+    """Bộ đệm giả cho csv.writer: trả về dòng thay vì ghi"""
+    def write(self, value):
+        return value
+
+
+def stream_arrears_csv(queryset, year, quarter):
+    writer = csv.writer(_Echo())
+    # BOM để Excel đọc đúng tiếng Việt
+    yield '\ufeff' + writer.writerow(CSV_HEADER)
+    for row in arrears_rows(queryset, year, quarter):
+        yield writer.writerow(row)
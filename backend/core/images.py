@@ -0,0 +1,173 @@
+"""
+Ảnh hoạt động: tạo các phiên bản thu nhỏ (WebP và JPEG) từ ảnh gốc.
+
+Sau khi hoạt động được lưu với ảnh mới, ảnh được xử lý trên thread pool riêng
+(không chặn request). Storage mặc định đặt tên file theo hash nội dung (core/storage.py)
+nên một URL không bao giờ đổi nội dung, có thể cache lâu dài ở trình duyệt/CDN. Kết quả
+được lưu vào Activity.image_variants; khi chưa có thì client dùng ảnh gốc.
+"""
+import hashlib
+import io
+import logging
+import posixpath
+from concurrent.futures import ThreadPoolExecutor
+
+from django.conf import settings
+from django.core.files.base import ContentFile
+from django.core.files.storage import default_storage
+from django.db import close_old_connections, transaction
+from django.utils import timezone
+from PIL import Image, ImageOps, UnidentifiedImageError
+
+from .models import Activity
+
+logger = logging.getLogger(__name__)
+
+VARIANTS_DIR = 'activities/variants'
+
+# Tên phiên bản -> chiều rộng tối đa (giữ nguyên tỉ lệ, không phóng to)
+IMAGE_VARIANTS = {
+    'thumbnail': 320,
+    'card': 640,
+    'detail': 1280,
+}
+
+# Định dạng -> (định dạng Pillow, tham số khi lưu)
+IMAGE_FORMATS = {
+    'webp': ('WEBP', {'quality': 80, 'method': 4}),
+    'jpeg': ('JPEG', {'quality': 82, 'optimize': True, 'progressive': True}),
+}
+
+_executor = None
+
+
+def get_executor():
+    global _executor
+    if _executor is None:
+        _executor = ThreadPoolExecutor(
+            max_workers=getattr(settings, 'IMAGE_PROCESSING_WORKERS', 2),
+            thread_name_prefix='activity-images',
+        )
+    return _executor
+
+
+def content_hash(data):
+    return hashlib.sha256(data).hexdigest()[:16]
+
+
+def variant_name(width, extension):
+    # Storage đổi thành tên theo hash nội dung, phiên bản trùng nội dung chỉ lưu một lần
+    return posixpath.join(VARIANTS_DIR, f'{width}w.{extension}')
+
+
+def _prepare(image, pil_format):
+    # JPEG không có kênh alpha: ghép lên nền trắng
+    if pil_format == 'JPEG' and image.mode != 'RGB':
+        if image.mode in ('RGBA', 'LA', 'P'):
+            image = image.convert('RGBA')
+            background = Image.new('RGB', image.size, (255, 255, 255))
+            background.paste(image, mask=image.getchannel('A'))
+            return background
+        return image.convert('RGB')
+    if pil_format == 'WEBP' and image.mode not in ('RGB', 'RGBA'):
+        return image.convert('RGBA' if 'A' in image.getbands() or image.mode == 'P' else 'RGB')
+    return image
+
+
+def render_variants(data):
+    """
+    Tạo các phiên bản từ nội dung ảnh gốc.
+    Trả về {'source': hash, 'variants': {tên: {'width', 'height', định dạng: đường dẫn}}}.
+    """
+    digest = content_hash(data)
+    with Image.open(io.BytesIO(data)) as source:
+        source = ImageOps.exif_transpose(source)
+        source.load()
+
+    variants = {}
+    for name, max_width in IMAGE_VARIANTS.items():
+        image = source.copy()
+        if image.width > max_width:
+            image.thumbnail((max_width, image.height), Image.LANCZOS)
+
+        entry = {'width': image.width, 'height': image.height}
+        for extension, (pil_format, options) in IMAGE_FORMATS.items():
+            buffer = io.BytesIO()
+            _prepare(image, pil_format).save(buffer, pil_format, **options)
+            entry[extension] = default_storage.save(variant_name(image.width, extension), ContentFile(buffer.getvalue()))
+        variants[name] = entry
+    return {'source': digest, 'variants': variants}
+
+
+def generate_variants(activity_id):
+    """
+    Tạo phiên bản cho ảnh hiện tại của hoạt động. Chỉ ghi kết quả nếu ảnh chưa
+    bị thay trong lúc xử lý; cập nhật updated_at để ETag danh sách thay đổi.
+    """
+    activity = Activity.objects.filter(pk=activity_id).only('id', 'image').first()
+    if activity is None or not activity.image:
+        return None
+
+    image_name = activity.image.name
+    try:
+        with activity.image.open('rb') as source:
+            data = source.read()
+        result = render_variants(data)
+    except (OSError, UnidentifiedImageError, Image.DecompressionBombError):
+        logger.exception('Không tạo được phiên bản ảnh cho hoạt động %s', activity_id)
+        return None
+
+    result['image'] = image_name
+    Activity.objects.filter(pk=activity_id, image=image_name).update(
+        image_variants=result, updated_at=timezone.now()
+    )
+    return result
+
+
+def _generate_in_worker(activity_id):
+    try:
+        generate_variants(activity_id)
+    finally:
+        # Thread của executor không đi qua vòng đời request, tự đóng kết nối
+        close_old_connections()
+
+
+def queue_variants(activity):
+    """
+    Lên lịch tạo phiên bản sau khi transaction hiện tại commit.
+    IMAGE_PROCESSING_WORKERS=0 thì xử lý ngay trong thread hiện tại.
+    """
+    activity_id = activity.pk
+    if getattr(settings, 'IMAGE_PROCESSING_WORKERS', 2) <= 0:
+        transaction.on_commit(lambda: generate_variants(activity_id))
+    else:
+        transaction.on_commit(lambda: get_executor().submit(_generate_in_worker, activity_id))
+
+
+def needs_variants(activity):
+    return bool(activity.image) and (activity.image_variants or {}).get('image') != activity.image.name
+
+
+def variant_urls(activity, build_url=None):
+    """
+    Bản đồ kiểu srcset cho serializer:
+    {'thumbnail': {'width', 'height', 'webp': url, 'jpeg': url}, ..., 'srcset': {'webp': '... 320w, ...'}}
+    Trả về None nếu chưa có phiên bản cho ảnh hiện tại.
+    """
+    stored = activity.image_variants or {}
+    if not activity.image or stored.get('image') != activity.image.name:
+        return None
+
+    build_url = build_url or (lambda url: url)
+    result, srcset = {}, {extension: [] for extension in IMAGE_FORMATS}
+    for name, entry in stored.get('variants', {}).items():
+        item = {'width': entry['width'], 'height': entry['height']}
+        for extension in IMAGE_FORMATS:
+            if extension in entry:
+                item[extension] = build_url(default_storage.url(entry[extension]))
+                candidate = f"{item[extension]} {entry['width']}w"
+                if candidate not in srcset[extension]:
+                    srcset[extension].append(candidate)
+        result[name] = item
+    result['srcset'] = {extension: ', '.join(items) for extension, items in srcset.items() if items}
+    return result
@@ -0,0 +1,31 @@
+from django.core.management.base import BaseCommand
+
+from core.retention import archive_notifications, get_retention_days
+
+
+class Command(BaseCommand):
+    help = 'Lưu trữ thông báo đã đọc quá thời hạn và xóa khỏi bảng notifications theo từng lô'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--days', type=int, default=None,
+                            help='Số ngày giữ lại (mặc định NOTIFICATION_RETENTION_DAYS)')
+        parser.add_argument('--chunk-size', type=int, default=1000, help='Số dòng mỗi lô')
+        parser.add_argument('--pause', type=float, default=0.1, help='Nghỉ giữa các lô (giây)')
+        parser.add_argument('--export-dir', default=None,
+                            help='Thư mục ghi thêm file JSONL nén gzip theo tháng')
+        parser.add_argument('--dry-run', action='store_true', help='Chỉ đếm, không thay đổi dữ liệu')
+
+    def handle(self, *args, **options):
+        days = options['days'] if options['days'] is not None else get_retention_days()
+        count = archive_notifications(
+            older_than_days=days,
+            chunk_size=options['chunk_size'],
+            pause=options['pause'],
+            export_dir=options['export_dir'],
+            dry_run=options['dry_run'],
+            stdout=None if options['dry_run'] else self.stdout,
+        )
+        if options['dry_run']:
+            self.stdout.write(f"{count} thông báo đã đọc cũ hơn {days} ngày sẽ được lưu trữ")
+        else:
+            self.stdout.write(self.style.SUCCESS(f"Đã lưu trữ {count} thông báo"))
@@ -0,0 +1,66 @@
+import gzip
+import statistics
+import time
+from itertools import cycle, islice
+
+from django.core.management.base import BaseCommand, CommandError
+from rest_framework.renderers import JSONRenderer
+
+from core.middleware import brotli, get_brotli_quality
+from core.models import ActivityRegistration
+from core.renderers import ORJSONRenderer, orjson
+from core.serializers import ActivityRegistrationSerializer
+
+
+def measure(func, repeat):
+    """Trả về (kết quả, thời gian trung vị tính bằng ms)"""
+    timings = []
+    for _ in range(repeat):
+        started = time.perf_counter()
+        result = func()
+        timings.append((time.perf_counter() - started) * 1000)
+    return result, statistics.median(timings)
+
+
+class Command(BaseCommand):
+    help = 'So sánh kích thước payload và thời gian render JSON/nén trên danh sách đăng ký hoạt động'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--count', type=int, default=500,
+                            help='Số đăng ký trong payload (lặp lại dữ liệu nếu DB có ít hơn)')
+        parser.add_argument('--repeat', type=int, default=5, help='Số lần đo mỗi phép')
+
+    def handle(self, *args, **options):
+        count, repeat = options['count'], options['repeat']
+        registrations = list(
+            ActivityRegistration.objects.select_related('activity', 'user')[:count]
+        )
+        if not registrations:
+            raise CommandError('Chưa có đăng ký hoạt động nào trong cơ sở dữ liệu để đo')
+
+        rows = ActivityRegistrationSerializer(registrations, many=True).data
+        data = list(islice(cycle(rows), count))
+        self.stdout.write(f"Payload: {len(data)} đăng ký (từ {len(rows)} dòng thực), đo {repeat} lần\n")
+
+        renderers = [('json', JSONRenderer())]
+        if orjson is not None:
+            renderers.append(('orjson', ORJSONRenderer()))
+        else:
+            self.stdout.write(self.style.WARNING('Chưa cài orjson, bỏ qua ORJSONRenderer'))
+
+        self.stdout.write(f"{'renderer':<10}{'render ms':>12}{'bytes':>12}")
+        content = None
+        for name, renderer in renderers:
+            content, elapsed = measure(lambda: renderer.render(data), repeat)
+            self.stdout.write(f"{name:<10}{elapsed:>12.2f}{len(content):>12}")
+
+        self.stdout.write(f"\n{'encoding':<10}{'compress ms':>12}{'bytes':>12}{'ratio':>10}")
+        encoders = [('gzip', lambda: gzip.compress(content, compresslevel=6, mtime=0))]
+        if brotli is not None:
+            encoders.append(('br', lambda: brotli.compress(content, quality=get_brotli_quality())))
+        else:
+            self.stdout.write(self.style.WARNING('Chưa cài Brotli, bỏ qua br'))
+        for name, compress in encoders:
+            compressed, elapsed = measure(compress, repeat)
+            ratio = len(compressed) / len(content)
+            self.stdout.write(f"{name:<10}{elapsed:>12.2f}{len(compressed):>12}{ratio:>10.1%}")
@@ -0,0 +1,24 @@
+from django.core.management.base import BaseCommand
+
+from core.images import generate_variants, needs_variants
+from core.models import Activity
+
+
+class Command(BaseCommand):
+    help = 'Tạo ảnh thu nhỏ (WebP/JPEG) cho ảnh hoạt động chưa có phiên bản'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--all', action='store_true', help='Tạo lại cho mọi hoạt động có ảnh')
+
+    def handle(self, *args, **options):
+        activities = Activity.objects.exclude(image='').exclude(image__isnull=True).only('id', 'image', 'image_variants')
+        done = failed = 0
+        for activity in activities.iterator():
+            if not options['all'] and not needs_variants(activity):
+                continue
+            if generate_variants(activity.pk) is None:
+                failed += 1
+                self.stderr.write(f"Hoạt động {activity.pk}: không đọc được ảnh {activity.image.name}")
+            else:
+                done += 1
+        self.stdout.write(self.style.SUCCESS(f"Đã tạo phiên bản cho {done} ảnh, lỗi {failed}"))
@@ -0,0 +1,38 @@
+import time
+
+from django.core.management.base import BaseCommand, CommandError
+
+from core.member_import import ImportFileError, import_members, read_members, write_error_report
+
+
+class Command(BaseCommand):
+    help = 'Nhập đoàn viên hàng loạt từ file CSV/XLSX (cột bắt buộc: username, email, full_name)'
+
+    def add_arguments(self, parser):
+        parser.add_argument('path', help='File .csv hoặc .xlsx')
+        parser.add_argument('--default-password', help='Mật khẩu cho các dòng không có cột password')
+        parser.add_argument('--report', help='Ghi lỗi từng dòng ra file CSV (mặc định in ra stderr)')
+        parser.add_argument('--dry-run', action='store_true', help='Chỉ kiểm tra, không tạo người dùng')
+
+    def handle(self, *args, **options):
+        started = time.monotonic()
+        try:
+            with open(options['path'], 'rb') as file:
+                result = import_members(
+                    read_members(file, options['path']),
+                    default_password=options['default_password'], dry_run=options['dry_run'],
+                )
+        except (OSError, ImportFileError) as error:
+            raise CommandError(str(error))
+
+        if result.errors:
+            if options['report']:
+                with open(options['report'], 'w', encoding='utf-8', newline='') as report:
+                    write_error_report(result, report)
+            else:
+                write_error_report(result, self.stderr)
+
+        summary = f"{result.total} dòng, tạo {result.created}, lỗi {len(result.errors)} trong {time.monotonic() - started:.1f}s"
+        if options['dry_run']:
+            summary = f"Kiểm tra {summary}"
+        self.stdout.write(self.style.SUCCESS(summary) if not result.errors else self.style.WARNING(summary))
@@ -0,0 +1,49 @@
+import os
+
+from django.conf import settings
+from django.core.files import File
+from django.core.files.storage import default_storage
+from django.core.management.base import BaseCommand
+from django.utils import timezone
+
+from core.models import Activity
+from core.storage import is_content_addressed
+
+
+class Command(BaseCommand):
+    help = 'Chuyển ảnh hoạt động đã upload trước đây sang lưu trữ theo hash nội dung'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--source-dir', default=settings.BASE_DIR,
+                            help='Thư mục chứa file cũ nếu không có trong storage (mặc định thư mục backend)')
+        parser.add_argument('--dry-run', action='store_true', help='Chỉ liệt kê, không thay đổi dữ liệu')
+
+    def handle(self, *args, **options):
+        moved = missing = 0
+        activities = Activity.objects.exclude(image='').exclude(image__isnull=True).only('id', 'image')
+        for activity in activities.iterator():
+            name = activity.image.name
+            if is_content_addressed(name):
+                continue
+
+            if default_storage.exists(name):
+                source = default_storage.open(name, 'rb')
+            elif os.path.isfile(os.path.join(options['source_dir'], name)):
+                source = open(os.path.join(options['source_dir'], name), 'rb')
+            else:
+                missing += 1
+                self.stderr.write(f"Hoạt động {activity.pk}: không tìm thấy {name}")
+                continue
+
+            with source:
+                if options['dry_run']:
+                    self.stdout.write(f"Hoạt động {activity.pk}: {name}")
+                else:
+                    new_name = default_storage.save(name, File(source, name))
+                    Activity.objects.filter(pk=activity.pk).update(image=new_name, updated_at=timezone.now())
+            moved += 1
+
+        verb = 'Sẽ chuyển' if options['dry_run'] else 'Đã chuyển'
+        self.stdout.write(self.style.SUCCESS(f"{verb} {moved} ảnh, không tìm thấy {missing}"))
+        if moved and not options['dry_run']:
+            self.stdout.write('Chạy `python manage.py generate_image_variants` để tạo lại ảnh thu nhỏ')
@@ -0,0 +1,17 @@
+import time
+
+from django.core.management.base import BaseCommand
+
+from core.retrieval import get_index_path, rebuild_index
+
+
+class Command(BaseCommand):
+    help = 'Dựng lại toàn bộ chỉ mục tìm kiếm của chatbot (bài viết, hoạt động, quy định) và lưu ra đĩa'
+
+    def handle(self, *args, **options):
+        started = time.monotonic()
+        index = rebuild_index()
+        self.stdout.write(self.style.SUCCESS(
+            f"Đã đánh chỉ mục {len(index.documents)} tài liệu ({index.live_count} đoạn, {len(index.postings)} từ) "
+            f"trong {time.monotonic() - started:.1f}s: {get_index_path()}"
+        ))
@@ -0,0 +1,39 @@
+import json
+
+from django.core.management.base import BaseCommand, CommandError
+
+from core.rollover import DEFAULT_CHUNK_SIZE, RolloverError, preview, run_rollover
+
+
+class Command(BaseCommand):
+    help = 'Chuyển năm học theo kế hoạch JSON: khóa tài khoản đã tốt nghiệp, đổi khoa/ban, mở quý đoàn phí mới'
+
+    def add_arguments(self, parser):
+        parser.add_argument('plan', help='File JSON mô tả kế hoạch (xem core/rollover.py)')
+        parser.add_argument('--chunk-size', type=int, default=DEFAULT_CHUNK_SIZE, help='Số id người dùng mỗi transaction')
+        parser.add_argument('--pause', type=float, default=0.0, help='Nghỉ giữa các lô (giây)')
+        parser.add_argument('--restart', action='store_true', help='Bỏ checkpoint cũ, chạy lại từ đầu')
+        parser.add_argument('--dry-run', action='store_true', help='Chỉ đếm số dòng sẽ thay đổi')
+
+    def handle(self, *args, **options):
+        try:
+            with open(options['plan'], encoding='utf-8') as file:
+                plan = json.load(file)
+        except (OSError, ValueError) as error:
+            raise CommandError(f"Không đọc được kế hoạch: {error}")
+
+        try:
+            if options['dry_run']:
+                counts = preview(plan)
+                self.stdout.write(json.dumps(counts, ensure_ascii=False, indent=2))
+                return
+            checkpoint = run_rollover(
+                plan, chunk_size=options['chunk_size'], pause=options['pause'],
+                restart=options['restart'], stdout=self.stdout,
+            )
+        except RolloverError as error:
+            raise CommandError(str(error))
+
+        self.stdout.write(self.style.SUCCESS(
+            f"Hoàn tất {checkpoint.name}: {json.dumps(checkpoint.counts, ensure_ascii=False)}"
+        ))
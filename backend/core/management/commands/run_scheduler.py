@@ -0,0 +1,41 @@
+import time
+
+from django.core.management.base import BaseCommand
+from django.db import close_old_connections
+
+from core.scheduler import run_due_jobs, seconds_until_next_job
+
+
+class Command(BaseCommand):
+    help = 'Chạy các tác vụ định kỳ (chuyển trạng thái hoạt động, đóng đăng ký, gửi lời nhắc)'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--once', action='store_true', help='Chạy các tác vụ đến hạn một lần rồi thoát (dùng với cron)')
+        parser.add_argument('--force', action='store_true', help='Chạy mọi tác vụ, kể cả chưa đến hạn')
+        parser.add_argument('--max-sleep', type=float, default=30,
+                            help='Thời gian nghỉ tối đa giữa hai lần kiểm tra (giây)')
+
+    def handle(self, *args, **options):
+        if options['once']:
+            self.run(options['force'])
+            return
+
+        self.stdout.write('Bắt đầu scheduler, nhấn Ctrl+C để dừng')
+        force = options['force']
+        try:
+            while True:
+                self.run(force)
+                force = False
+                wait = seconds_until_next_job()
+                time.sleep(options['max_sleep'] if wait is None else min(wait, options['max_sleep']))
+                # Worker chạy lâu dài: bỏ các kết nối DB đã hỏng hoặc quá hạn
+                close_old_connections()
+        except KeyboardInterrupt:
+            self.stdout.write('Đã dừng scheduler')
+
+    def run(self, force):
+        for name, result in run_due_jobs(force=force).items():
+            if result.get('error'):
+                self.stderr.write(f"{name}: lỗi, xem scheduled_jobs.last_error")
+            else:
+                self.stdout.write(f"{name}: {result}")
@@ -0,0 +1,165 @@
+"""
+Phục vụ file media từ MEDIA_ROOT.
+
+- File lưu theo hash nội dung (core/storage.py) được cache vĩnh viễn ở trình duyệt.
+- Hỗ trợ Range (một khoảng byte) để xem/tua video, tải tiếp file lớn.
+- Trả về bản nén sẵn .br/.gz nếu có và client chấp nhận.
+- Gửi file bằng FileResponse: server WSGI có wsgi.file_wrapper (gunicorn) dùng
+  sendfile() nên nội dung không đi qua Python. Khi đặt MEDIA_ACCEL_REDIRECT_PREFIX,
+  view chỉ kiểm tra đường dẫn rồi chuyển cho nginx (X-Accel-Redirect) gửi file,
+  worker Django được giải phóng ngay.
+"""
+import mimetypes
+import os
+import re
+
+from django.conf import settings
+from django.core.exceptions import SuspiciousFileOperation
+from django.http import FileResponse, Http404, HttpResponse
+from django.utils._os import safe_join
+from django.utils.cache import get_conditional_response, patch_vary_headers
+from django.utils.http import http_date, quote_etag
+from django.views.decorators.http import require_safe
+
+from .middleware import re_accepts_br, re_accepts_gzip
+from .storage import CONTENT_ADDRESSED_RE
+
+IMMUTABLE_CACHE_CONTROL = 'public, max-age=31536000, immutable'
+DEFAULT_CACHE_CONTROL = 'public, max-age=3600'
+
+range_re = re.compile(r'^bytes=(\d*)-(\d*)$')
+
+
+class RangeFile:
+    """
+    File chỉ đọc được length byte tính từ vị trí hiện tại. fileno() và tell()
+    trỏ về file gốc để wsgi.file_wrapper vẫn dùng được sendfile() cho đúng khoảng.
+    """
+
+    def __init__(self, file, length):
+        self.file = file
+        self.remaining = length
+
+    def read(self, size=-1):
+        if self.remaining <= 0:
+            return b''
+        size = self.remaining if size is None or size < 0 else min(size, self.remaining)
+        data = self.file.read(size)
+        self.remaining -= len(data)
+        return data
+
+    def fileno(self):
+        return self.file.fileno()
+
+    def tell(self):
+        return self.file.tell()
+
+    def close(self):
+        self.file.close()
+
+
+def parse_range(header, size):
+    """
+    (start, end) của header Range dạng 'bytes=a-b'. None nếu không dùng được
+    (nhiều khoảng, sai cú pháp: trả về toàn bộ file), ValueError nếu vượt quá file.
+    """
+    match = range_re.match(header.strip())
+    if not match or match.groups() == ('', ''):
+        return None
+    first, last = match.groups()
+    if first == '':
+        # bytes=-N: N byte cuối
+        length = int(last)
+        if length == 0:
+            raise ValueError(header)
+        return max(size - length, 0), size - 1
+    start = int(first)
+    end = min(int(last), size - 1) if last else size - 1
+    if start >= size or end < start:
+        raise ValueError(header)
+    return start, end
+
+
+def resolve_path(path):
+    try:
+        full_path = safe_join(settings.MEDIA_ROOT, path)
+    except SuspiciousFileOperation:
+        raise Http404
+    if not os.path.isfile(full_path):
+        raise Http404
+    return full_path
+
+
+def file_validators(path, stat):
+    """ETag là hash trong tên file nếu có, ngược lại theo mtime và kích thước"""
+    match = CONTENT_ADDRESSED_RE.search(path)
+    if match:
+        return quote_etag(match.group(2)), IMMUTABLE_CACHE_CONTROL
+    return quote_etag(f'{int(stat.st_mtime):x}-{stat.st_size:x}'), DEFAULT_CACHE_CONTROL
+
+
+def precompressed_path(request, full_path):
+    accept_encoding = request.META.get('HTTP_ACCEPT_ENCODING', '')
+    for encoding, suffix, pattern in (('br', '.br', re_accepts_br), ('gzip', '.gz', re_accepts_gzip)):
+        if pattern.search(accept_encoding) and os.path.isfile(full_path + suffix):
+            return encoding, full_path + suffix
+    return None, full_path
+
+
+@require_safe
+def serve_media(request, path):
+    full_path = resolve_path(path)
+    stat = os.stat(full_path)
+    etag, cache_control = file_validators(path, stat)
+    content_type = mimetypes.guess_type(full_path)[0] or 'application/octet-stream'
+
+    response = get_conditional_response(request, etag=etag, last_modified=int(stat.st_mtime))
+    if response is not None:
+        response['Cache-Control'] = cache_control
+        return response
+
+    accel_prefix = getattr(settings, 'MEDIA_ACCEL_REDIRECT_PREFIX', '')
+    if accel_prefix:
+        # nginx tự xử lý Range và gzip_static/brotli_static
+        response = HttpResponse(content_type=content_type)
+        response['X-Accel-Redirect'] = accel_prefix.rstrip('/') + '/' + path.lstrip('/')
+        return _finish(response, etag, stat, cache_control)
+
+    range_header = request.META.get('HTTP_RANGE')
+    # If-Range: chỉ trả về một phần nếu file vẫn là phiên bản client đang có
+    if range_header and request.META.get('HTTP_IF_RANGE', etag) != etag:
+        range_header = None
+
+    if range_header:
+        try:
+            byte_range = parse_range(range_header, stat.st_size)
+        except ValueError:
+            response = HttpResponse(status=416)
+            response['Content-Range'] = f'bytes */{stat.st_size}'
+            return _finish(response, etag, stat, cache_control)
+        if byte_range is not None:
+            start, end = byte_range
+            file = open(full_path, 'rb')
+            file.seek(start)
+            response = FileResponse(RangeFile(file, end - start + 1), status=206, content_type=content_type)
+            response['Content-Length'] = str(end - start + 1)
+            response['Content-Range'] = f'bytes {start}-{end}/{stat.st_size}'
+            return _finish(response, etag, stat, cache_control)
+
+    encoding, send_path = precompressed_path(request, full_path)
+    response = FileResponse(open(send_path, 'rb'), content_type=content_type, filename=os.path.basename(full_path))
+    if os.path.exists(full_path + '.gz') or os.path.exists(full_path + '.br'):
+        patch_vary_headers(response, ('Accept-Encoding',))
+    if encoding:
+        response['Content-Encoding'] = encoding
+        # Bản nén khác nội dung gốc nên không hỗ trợ Range và dùng ETag yếu
+        return _finish(response, 'W/' + etag, stat, cache_control, ranges=False)
+    return _finish(response, etag, stat, cache_control)
+
+
+def _finish(response, etag, stat, cache_control, ranges=True):
+    response['ETag'] = etag
+    response['Last-Modified'] = http_date(stat.st_mtime)
+    response['Cache-Control'] = cache_control
+    response['Accept-Ranges'] = 'bytes' if ranges else 'none'
+    return response
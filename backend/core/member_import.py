@@ -0,0 +1,314 @@
+"""
+Nhập đoàn viên hàng loạt từ file CSV/XLSX.
+
+Tạo từng người dùng qua UserManager.create_user rất chậm với vài nghìn dòng vì
+PBKDF2 cố ý tốn CPU. Ở đây:
+
+- File được đọc và kiểm tra từng dòng (không nạp cả file vào bộ nhớ).
+- Trùng username/email/mã sinh viên được phát hiện bằng tập giá trị đã có trong
+  DB (một truy vấn) và tập giá trị đã gặp trong file.
+- Mật khẩu của mỗi lô dòng hợp lệ được băm song song trong một process pool
+  (MEMBER_IMPORT_WORKERS tiến trình, mặc định bằng số CPU), rồi bulk_create theo
+  lô MEMBER_IMPORT_CHUNK_SIZE dòng. Process pool chỉ dùng cho lệnh
+  import_members; upload qua API bị giới hạn MEMBER_IMPORT_API_MAX_ROWS dòng và
+  băm tuần tự, không fork tiến trình từ worker web.
+- Kết quả gồm số dòng đã tạo và lỗi theo từng dòng (số dòng trong file).
+"""
+import csv
+import io
+import os
+from concurrent.futures import ProcessPoolExecutor
+
+from django.conf import settings
+from django.contrib.auth.hashers import make_password
+from django.contrib.auth import get_user_model
+from django.core.exceptions import ValidationError
+from django.core.validators import validate_email
+from django.db import IntegrityError, transaction
+
+from .chatbot import fold
+from .summaries import bump_data_version
+
+try:
+    import openpyxl
+except ImportError:
+    openpyxl = None
+
+User = get_user_model()
+
+REQUIRED_COLUMNS = ['username', 'email', 'full_name']
+OPTIONAL_COLUMNS = ['password', 'student_id', 'department', 'position', 'phone_number', 'address', 'role']
+
+# Tiêu đề cột tiếng Việt (đã bỏ dấu) -> tên trường
+COLUMN_ALIASES = {
+    'ten dang nhap': 'username',
+    'email': 'email',
+    'ho ten': 'full_name',
+    'ho va ten': 'full_name',
+    'mat khau': 'password',
+    'ma sinh vien': 'student_id',
+    'mssv': 'student_id',
+    'khoa': 'department',
+    'chuc vu': 'position',
+    'so dien thoai': 'phone_number',
+    'dia chi': 'address',
+    'vai tro': 'role',
+}
+
+ROLES = {role for role, _ in User.ROLE_CHOICES}
+
+
+class ImportFileError(Exception):
+    """File không đọc được hoặc thiếu cột bắt buộc"""
+
+
+def get_chunk_size():
+    return getattr(settings, 'MEMBER_IMPORT_CHUNK_SIZE', 1000)
+
+
+def get_worker_count():
+    workers = getattr(settings, 'MEMBER_IMPORT_WORKERS', None)
+    if workers is None:
+        return os.cpu_count() or 1
+    return workers
+
+
+def get_api_max_rows():
+    return getattr(settings, 'MEMBER_IMPORT_API_MAX_ROWS', 100)
+
+
+def limit_rows(rows, limit):
+    """Đọc tối đa limit dòng; raise ImportFileError nếu file dài hơn"""
+    limited = []
+    for row in rows:
+        if len(limited) >= limit:
+            raise ImportFileError(
+                f'File có quá {limit} dòng, hãy chia nhỏ file hoặc dùng lệnh manage.py import_members'
+            )
+        limited.append(row)
+    return limited
+
+
+def column_name(header):
+    header = str(header or '').strip()
+    if header in REQUIRED_COLUMNS or header in OPTIONAL_COLUMNS:
+        return header
+    folded = fold(header)
+    return COLUMN_ALIASES.get(folded, folded.replace(' ', '_'))
+
+
+def _records(header, rows):
+    columns = [column_name(value) for value in header]
+    missing = [column for column in REQUIRED_COLUMNS if column not in columns]
+    if missing:
+        raise ImportFileError(f"Thiếu cột bắt buộc: {', '.join(missing)}")
+    # Dòng 1 là tiêu đề
+    for row_number, values in enumerate(rows, start=2):
+        record = {}
+        for column, value in zip(columns, values):
+            if column in REQUIRED_COLUMNS or column in OPTIONAL_COLUMNS:
+                # Ô số trong Excel (mã sinh viên, số điện thoại) được đọc thành float
+                if isinstance(value, float) and value.is_integer():
+                    value = int(value)
+                record[column] = '' if value is None else str(value).strip()
+        if any(record.values()):
+            yield row_number, record
+
+
+def read_csv(file):
+    reader = csv.reader(io.TextIOWrapper(file, encoding='utf-8-sig', newline=''))
+    header = next(reader, None)
+    if header is None:
+        raise ImportFileError('File trống')
+    return _records(header, reader)
+
+
+def read_xlsx(file):
+    if openpyxl is None:
+        raise ImportFileError('Cần cài đặt openpyxl để đọc file .xlsx')
+    try:
+        workbook = openpyxl.load_workbook(file, read_only=True, data_only=True)
+    except Exception as error:
+        raise ImportFileError(f'Không đọc được file .xlsx: {error}')
+    rows = workbook.active.iter_rows(values_only=True)
+    header = next(rows, None)
+    if header is None:
+        raise ImportFileError('File trống')
+    return _records(header, rows)
+
+
+def read_members(file, filename):
+    """Các cặp (số dòng, dữ liệu dòng), đọc dần từ file"""
+    extension = os.path.splitext(filename)[1].lower()
+    if extension == '.csv':
+        return read_csv(file)
+    if extension == '.xlsx':
+        return read_xlsx(file)
+    raise ImportFileError('Chỉ hỗ trợ file .csv hoặc .xlsx')
+
+
+class ImportResult:
+    def __init__(self):
+        self.total = 0
+        self.created = 0
+        self.errors = []
+
+    def add_error(self, row_number, record, messages):
+        self.errors.append({'row': row_number, 'username': record.get('username', ''), 'errors': messages})
+
+    def as_dict(self):
+        return {
+            'total': self.total,
+            'created': self.created,
+            'failed': len(self.errors),
+            'errors': sorted(self.errors, key=lambda error: error['row']),
+        }
+
+
+class MemberValidator:
+    """Kiểm tra từng dòng; trùng lặp được tra trong tập giá trị đã có trong DB và trong file"""
+
+    def __init__(self, allowed_roles=None, default_password=None):
+        self.allowed_roles = set(allowed_roles or ROLES)
+        self.default_password = default_password
+        self.max_lengths = {
+            column: User._meta.get_field(column).max_length
+            for column in REQUIRED_COLUMNS + OPTIONAL_COLUMNS
+            if column != 'password' and User._meta.get_field(column).max_length
+        }
+        self.usernames, self.emails, self.student_ids = set(), set(), set()
+        for username, email, student_id in User.objects.values_list('username', 'email', 'student_id').iterator():
+            self.usernames.add(username)
+            self.emails.add(email.lower())
+            if student_id:
+                self.student_ids.add(student_id)
+
+    def validate(self, record):
+        """(dữ liệu đã chuẩn hóa, danh sách lỗi)"""
+        errors = []
+        for column in REQUIRED_COLUMNS:
+            if not record.get(column):
+                errors.append(f'Thiếu {column}')
+        for column, max_length in self.max_lengths.items():
+            if len(record.get(column) or '') > max_length:
+                errors.append(f'{column} dài quá {max_length} ký tự')
+
+        email = User.objects.normalize_email(record.get('email', ''))
+        if email:
+            try:
+                validate_email(email)
+            except ValidationError:
+                errors.append('Email không hợp lệ')
+
+        role = record.get('role') or 'DOAN_VIEN'
+        if role not in ROLES:
+            errors.append(f'Vai trò không hợp lệ: {role}')
+        elif role not in self.allowed_roles:
+            errors.append(f'Không có quyền tạo người dùng vai trò {role}')
+
+        password = record.get('password') or self.default_password
+        if not password:
+            errors.append('Thiếu mật khẩu')
+
+        username, student_id = record.get('username'), record.get('student_id')
+        if username in self.usernames:
+            errors.append(f'Tên đăng nhập {username} đã tồn tại')
+        if email and email.lower() in self.emails:
+            errors.append(f'Email {email} đã tồn tại')
+        if student_id and student_id in self.student_ids:
+            errors.append(f'Mã sinh viên {student_id} đã tồn tại')
+        if errors:
+            return None, errors
+
+        self.usernames.add(username)
+        self.emails.add(email.lower())
+        if student_id:
+            self.student_ids.add(student_id)
+        fields = {column: record.get(column) or None for column in OPTIONAL_COLUMNS if column != 'password'}
+        fields.update(username=username, email=email, full_name=record['full_name'], role=role)
+        return (fields, password), []
+
+
+class PasswordHasher:
+    """Băm mật khẩu song song trong process pool; MEMBER_IMPORT_WORKERS <= 1 thì băm tuần tự"""
+
+    def __init__(self, workers):
+        self.executor = ProcessPoolExecutor(max_workers=workers) if workers > 1 else None
+        self.workers = workers
+
+    def hash(self, passwords):
+        if self.executor is None:
+            return [make_password(password) for password in passwords]
+        chunksize = max(1, len(passwords) // (self.workers * 4))
+        return list(self.executor.map(make_password, passwords, chunksize=chunksize))
+
+    def close(self):
+        if self.executor is not None:
+            self.executor.shutdown()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        self.close()
+
+
+def _create_chunk(chunk, hasher, result):
+    passwords = hasher.hash([password for _, (_, password), _ in chunk])
+    users = [
+        User(password=password_hash, **fields)
+        for (_, (fields, _), _), password_hash in zip(chunk, passwords)
+    ]
+    try:
+        with transaction.atomic():
+            User.objects.bulk_create(users)
+        result.created += len(users)
+    except IntegrityError:
+        # Dòng trùng được tạo cùng lúc bởi request khác: tạo lại từng dòng để biết dòng nào lỗi
+        for (row_number, _, record), user in zip(chunk, users):
+            try:
+                with transaction.atomic():
+                    user.save(force_insert=True)
+                result.created += 1
+            except IntegrityError:
+                user.pk = None
+                result.add_error(row_number, record, ['Trùng dữ liệu với người dùng đã có'])
+
+
+def import_members(rows, allowed_roles=None, default_password=None, dry_run=False, workers=None):
+    """
+    Nhập các dòng (số dòng, dữ liệu) đã đọc bằng read_members. Trả về ImportResult.
+    workers: số tiến trình băm mật khẩu, mặc định MEMBER_IMPORT_WORKERS
+    """
+    result = ImportResult()
+    validator = MemberValidator(allowed_roles, default_password)
+    chunk_size = get_chunk_size()
+    if workers is None:
+        workers = get_worker_count()
+    with PasswordHasher(0 if dry_run else workers) as hasher:
+        chunk = []
+        for row_number, record in rows:
+            result.total += 1
+            member, errors = validator.validate(record)
+            if errors:
+                result.add_error(row_number, record, errors)
+            elif not dry_run:
+                chunk.append((row_number, member, record))
+                if len(chunk) >= chunk_size:
+                    _create_chunk(chunk, hasher, result)
+                    chunk = []
+        if chunk:
+            _create_chunk(chunk, hasher, result)
+
+    if result.created:
+        # bulk_create không phát signal, tự làm mới danh sách rút gọn đoàn viên
+        transaction.on_commit(lambda: bump_data_version('members'))
+    return result
+
+
+def write_error_report(result, file):
+    """Báo cáo lỗi dạng CSV: số dòng, tên đăng nhập, lỗi"""
+    writer = csv.writer(file)
+    writer.writerow(['row', 'username', 'errors'])
+    for error in result.as_dict()['errors']:
+        writer.writerow([error['row'], error['username'], '; '.join(error['errors'])])
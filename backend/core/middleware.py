@@ -0,0 +1,83 @@
+"""
+Nén response (brotli nếu có cài đặt và client hỗ trợ, ngược lại gzip).
+"""
+from django.conf import settings
+from django.middleware.gzip import GZipMiddleware
+from django.utils.cache import patch_vary_headers
+from django.utils.regex_helper import _lazy_re_compile
+from django.utils.text import compress_string
+
+try:
+    import brotli
+except ImportError:
+    brotli = None
+
+re_accepts_br = _lazy_re_compile(r'\bbr\b')
+re_accepts_gzip = _lazy_re_compile(r'\bgzip\b')
+
+# Chỉ nén các kiểu nội dung dạng văn bản; ảnh, file nén... đã được nén sẵn
+COMPRESSIBLE_TYPES = (
+    'text/',
+    'application/json',
+    'application/javascript',
+    'application/xml',
+    'application/xhtml+xml',
+    'image/svg+xml',
+)
+
+
+def get_min_size():
+    return getattr(settings, 'COMPRESSION_MIN_SIZE', 1024)
+
+
+def get_brotli_quality():
+    return getattr(settings, 'COMPRESSION_BROTLI_QUALITY', 5)
+
+
+class CompressionMiddleware(GZipMiddleware):
+    """
+    Nén response lớn hơn COMPRESSION_MIN_SIZE byte. Response streaming (xuất CSV)
+    được nén gzip theo từng chunk; luồng Server-Sent Events không bao giờ bị nén
+    vì bộ nén sẽ giữ lại sự kiện cho tới khi đủ dữ liệu.
+    """
+
+    def process_response(self, request, response):
+        # Đã nén sẵn, hoặc là một khoảng byte (Range) của file gốc
+        if response.has_header('Content-Encoding') or response.status_code == 206:
+            return response
+
+        content_type = response.get('Content-Type', '')
+        if not content_type.startswith(COMPRESSIBLE_TYPES) or content_type.startswith('text/event-stream'):
+            return response
+
+        if response.streaming:
+            return super().process_response(request, response)
+
+        if len(response.content) < get_min_size():
+            return response
+
+        patch_vary_headers(response, ('Accept-Encoding',))
+
+        accept_encoding = request.META.get('HTTP_ACCEPT_ENCODING', '')
+        if brotli is not None and re_accepts_br.search(accept_encoding):
+            encoding = 'br'
+            compressed_content = brotli.compress(response.content, quality=get_brotli_quality())
+        elif re_accepts_gzip.search(accept_encoding):
+            encoding = 'gzip'
+            compressed_content = compress_string(response.content, max_random_bytes=self.max_random_bytes)
+        else:
+            return response
+
+        # Chỉ trả về bản nén nếu thực sự nhỏ hơn
+        if len(compressed_content) >= len(response.content):
+            return response
+
+        response.content = compressed_content
+        response.headers['Content-Length'] = str(len(response.content))
+
+        # ETag mạnh phải chuyển thành ETag yếu khi nội dung bị mã hóa (RFC 9110 8.8.1)
+        etag = response.get('ETag')
+        if etag and etag.startswith('"'):
+            response.headers['ETag'] = 'W/' + etag
+        response.headers['Content-Encoding'] = encoding
+        return response
@@ -0,0 +1,29 @@
+# Generated by Django 4.2.5 on 2026-10-19 08:29
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('core', '0012_notification_retention'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='activity',
+            index=models.Index(fields=['start_date', 'end_date'], name='activity_start_end_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='user',
+            index=models.Index(fields=['role', 'full_name'], name='user_role_name_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='workschedule',
+            index=models.Index(fields=['schedule_date'], name='schedule_date_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='workschedule',
+            index=models.Index(fields=['user', 'schedule_date'], name='schedule_user_date_idx'),
+        ),
+    ]
@@ -0,0 +1,47 @@
+# Generated by Django 4.2.5 on 2026-10-19 08:34
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('core', '0014_workschedule_updated_at'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='ScheduledJob',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('name', models.CharField(max_length=100, unique=True)),
+                ('interval_seconds', models.PositiveIntegerField(default=60)),
+                ('enabled', models.BooleanField(default=True)),
+                ('next_run_at', models.DateTimeField(db_index=True)),
+                ('last_run_at', models.DateTimeField(blank=True, null=True)),
+                ('last_result', models.JSONField(blank=True, default=dict)),
+                ('last_error', models.TextField(blank=True, default='')),
+            ],
+            options={
+                'db_table': 'scheduled_jobs',
+                'ordering': ['name'],
+            },
+        ),
+        migrations.AddField(
+            model_name='activity',
+            name='registration_open',
+            field=models.BooleanField(default=True),
+        ),
+        migrations.AddIndex(
+            model_name='activity',
+            index=models.Index(fields=['status', 'start_date'], name='activity_status_start_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='activity',
+            index=models.Index(fields=['status', 'end_date'], name='activity_status_end_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='activity',
+            index=models.Index(condition=models.Q(('registration_open', True)), fields=['registration_deadline'], name='activity_open_deadline_idx'),
+        ),
+    ]
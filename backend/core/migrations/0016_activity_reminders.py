@@ -0,0 +1,50 @@
+# Generated by Django 4.2.5 on 2026-10-19 08:35
+
+from django.db import migrations, models
+import django.db.models.deletion
+from datetime import datetime, timedelta
+
+
+def schedule_existing(apps, schema_editor):
+    # Lên lịch nhắc cho các hoạt động chưa bắt đầu (mặc định 24 giờ trước)
+    Activity = apps.get_model('core', 'Activity')
+    ActivityReminder = apps.get_model('core', 'ActivityReminder')
+    offset = timedelta(hours=24)
+    reminders = []
+    for activity_id, start_date, deadline in Activity.objects.filter(
+        start_date__gt=datetime.now()
+    ).values_list('id', 'start_date', 'registration_deadline').iterator():
+        reminders.append(ActivityReminder(activity_id=activity_id, kind='start', due_at=start_date - offset))
+        if deadline:
+            reminders.append(ActivityReminder(activity_id=activity_id, kind='deadline', due_at=deadline - offset))
+    ActivityReminder.objects.bulk_create(reminders, batch_size=500, ignore_conflicts=True)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('core', '0015_activity_scheduler'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='ActivityReminder',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('kind', models.CharField(choices=[('start', 'Trước giờ bắt đầu'), ('deadline', 'Trước hạn đăng ký')], max_length=20)),
+                ('due_at', models.DateTimeField()),
+                ('sent_at', models.DateTimeField(blank=True, null=True)),
+                ('recipients', models.PositiveIntegerField(default=0)),
+                ('activity', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='reminders', to='core.activity')),
+            ],
+            options={
+                'db_table': 'activity_reminders',
+                'indexes': [models.Index(condition=models.Q(('sent_at__isnull', True)), fields=['due_at'], name='reminder_pending_due_idx')],
+            },
+        ),
+        migrations.AddConstraint(
+            model_name='activityreminder',
+            constraint=models.UniqueConstraint(fields=('activity', 'kind'), name='unique_activity_reminder'),
+        ),
+        migrations.RunPython(schedule_existing, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,18 @@
+# Generated by Django 4.2.5 on 2026-10-19 08:38
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('core', '0016_activity_reminders'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='activity',
+            name='image_variants',
+            field=models.JSONField(blank=True, default=dict, editable=False),
+        ),
+    ]
@@ -0,0 +1,17 @@
+# Generated by Django 4.2.5 on 2026-10-19 08:45
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('core', '0017_activity_image_variants'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='permission',
+            index=models.Index(fields=['user', 'post', 'permission_type'], name='permission_user_post_idx'),
+        ),
+    ]
@@ -0,0 +1,97 @@
+# Generated by Django 4.2.5 on 2026-10-19 08:46
+
+from django.db import migrations, models
+import django.db.models.deletion
+
+
+# Các câu trả lời trước đây được viết cứng trong core.views.chatbot_query
+INTENTS = [
+    ('gio-lam-viec', ['giờ làm việc', 'thời gian làm việc', 'mở cửa'],
+     'Văn phòng Đoàn trường mở cửa từ 8h00 đến 17h00 các ngày trong tuần từ thứ Hai đến thứ Sáu.',
+     ['Quy định hoạt động của Đoàn trường, Điều 5, Khoản 2']),
+    ('dang-ky-hoat-dong', ['đăng ký', 'tham gia', 'hoạt động'],
+     'Để đăng ký tham gia hoạt động, bạn có thể vào mục "Hoạt động" trên thanh menu, chọn hoạt động muốn tham gia và nhấn nút "Đăng ký tham gia".',
+     ['Hướng dẫn sử dụng hệ thống, Phần 3.2']),
+    ('diem-ren-luyen', ['điểm rèn luyện', 'đrl', 'điểm'],
+     'Điểm rèn luyện từ hoạt động Đoàn sẽ được cập nhật vào cuối mỗi học kỳ. Mỗi hoạt động có mức điểm khác nhau tùy theo quy mô và tính chất. Để xem chi tiết điểm, vui lòng kiểm tra trong mục "Hồ sơ cá nhân".',
+     ['Quy định về điểm rèn luyện, Điều 7', 'Quy chế đánh giá kết quả rèn luyện, Điều 12']),
+    ('xin-nghi', ['xin nghỉ', 'vắng mặt', 'không tham gia'],
+     'Để xin nghỉ một hoạt động đã đăng ký, bạn cần gửi đơn xin phép đến cán bộ Đoàn phụ trách hoạt động ít nhất 24 giờ trước khi hoạt động diễn ra. Trong trường hợp khẩn cấp, có thể liên hệ trực tiếp qua số điện thoại của văn phòng Đoàn.',
+     ['Quy định tham gia hoạt động Đoàn, Điều 8, Khoản 3']),
+    ('giay-chung-nhan', ['chứng nhận', 'xác nhận', 'giấy xác nhận'],
+     'Để yêu cầu giấy chứng nhận tham gia hoạt động, bạn cần liên hệ văn phòng Đoàn trường với thông tin hoạt động cụ thể và lý do xin cấp giấy chứng nhận. Thời gian xử lý yêu cầu từ 3-5 ngày làm việc.',
+     ['Quy trình cấp giấy chứng nhận hoạt động, Điều 4']),
+    ('chuyen-sinh-hoat', ['chuyển sinh hoạt', 'chuyển đoàn'],
+     'Để chuyển sinh hoạt Đoàn, bạn cần làm thủ tục tại văn phòng Đoàn trường với các giấy tờ: (1) Đơn xin chuyển sinh hoạt, (2) Sổ đoàn viên, (3) Giấy giới thiệu của chi đoàn. Thời gian xử lý từ 5-7 ngày làm việc.',
+     ['Hướng dẫn chuyển sinh hoạt Đoàn, Mục II, Điểm 2']),
+    ('doan-phi', ['đoàn phí', 'nộp tiền', 'đóng phí'],
+     'Đoàn phí được đóng mỗi năm một lần vào đầu năm học hoặc theo quy định của chi đoàn. Mức đoàn phí hiện tại là 50.000 đồng/năm. Việc đóng đoàn phí là trách nhiệm bắt buộc của mỗi đoàn viên.',
+     ['Điều lệ Đoàn TNCS Hồ Chí Minh, Chương III, Điều 5', 'Quy định nội bộ của Đoàn trường']),
+]
+
+FALLBACK = (
+    'Cảm ơn câu hỏi của bạn. Để có thông tin chi tiết nhất, vui lòng liên hệ văn phòng Đoàn trường qua số điện thoại 0123.456.789 hoặc email doankhoa@example.edu.vn, hoặc kiểm tra mục "Tài liệu - Quy định" trên trang web.',
+    ['Thông tin liên hệ Đoàn trường'],
+)
+
+
+def seed_intents(apps, schema_editor):
+    ChatIntent = apps.get_model('core', 'ChatIntent')
+    ChatKeyword = apps.get_model('core', 'ChatKeyword')
+    # Thứ tự cũ của chuỗi if/elif được giữ bằng priority
+    for position, (name, phrases, answer, sources) in enumerate(INTENTS):
+        intent = ChatIntent.objects.create(
+            name=name, answer=answer, sources=sources, priority=(len(INTENTS) - position) * 10
+        )
+        ChatKeyword.objects.bulk_create([ChatKeyword(intent=intent, phrase=phrase) for phrase in phrases])
+    ChatIntent.objects.create(name='mac-dinh', answer=FALLBACK[0], sources=FALLBACK[1], is_fallback=True)
+
+
+def remove_intents(apps, schema_editor):
+    apps.get_model('core', 'ChatIntent').objects.filter(
+        name__in=[intent[0] for intent in INTENTS] + ['mac-dinh']
+    ).delete()
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('core', '0018_permission_user_post_idx'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='ChatIntent',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('name', models.SlugField(max_length=100, unique=True)),
+                ('answer', models.TextField()),
+                ('sources', models.JSONField(blank=True, default=list)),
+                ('priority', models.IntegerField(default=0)),
+                ('is_fallback', models.BooleanField(default=False)),
+                ('is_active', models.BooleanField(default=True)),
+                ('updated_at', models.DateTimeField(auto_now=True)),
+            ],
+            options={
+                'db_table': 'chat_intents',
+                'ordering': ['-priority', 'name'],
+            },
+        ),
+        migrations.CreateModel(
+            name='ChatKeyword',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('phrase', models.CharField(max_length=255)),
+                ('weight', models.FloatField(default=1.0)),
+                ('intent', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='keywords', to='core.chatintent')),
+            ],
+            options={
+                'db_table': 'chat_keywords',
+            },
+        ),
+        migrations.AddConstraint(
+            model_name='chatkeyword',
+            constraint=models.UniqueConstraint(fields=('intent', 'phrase'), name='unique_chat_keyword'),
+        ),
+        migrations.RunPython(seed_intents, remove_intents),
+    ]
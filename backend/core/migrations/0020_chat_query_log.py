@@ -0,0 +1,29 @@
+# Generated by Django 4.2.5 on 2026-10-19 08:53
+
+from django.db import migrations, models
+import django.utils.timezone
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('core', '0019_chat_intents'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='ChatQueryLog',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('normalized', models.CharField(max_length=255)),
+                ('query', models.CharField(max_length=500)),
+                ('intent', models.CharField(blank=True, max_length=100, null=True)),
+                ('cache_hit', models.BooleanField(default=False)),
+                ('created_at', models.DateTimeField(default=django.utils.timezone.now)),
+            ],
+            options={
+                'db_table': 'chat_query_logs',
+                'indexes': [models.Index(fields=['created_at', 'cache_hit'], name='chat_query_log_time_idx')],
+            },
+        ),
+    ]
@@ -0,0 +1,44 @@
+# Generated by Django 4.2.5 on 2026-10-19 08:55
+
+from django.db import migrations, models
+import django.utils.timezone
+
+
+def record_existing(apps, schema_editor):
+    # Đối tượng đã có được đưa vào nhật ký để lần đồng bộ đầu tiên (cursor=0) nhận đủ dữ liệu
+    Activity = apps.get_model('core', 'Activity')
+    Post = apps.get_model('core', 'Post')
+    SyncChange = apps.get_model('core', 'SyncChange')
+    for kind, model in [('activity', Activity), ('post', Post)]:
+        SyncChange.objects.bulk_create(
+            (SyncChange(kind=kind, object_id=pk) for pk in model.objects.order_by('id').values_list('id', flat=True).iterator()),
+            batch_size=500,
+        )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('core', '0020_chat_query_log'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='SyncChange',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('kind', models.CharField(max_length=20)),
+                ('object_id', models.IntegerField()),
+                ('deleted', models.BooleanField(default=False)),
+                ('changed_at', models.DateTimeField(default=django.utils.timezone.now)),
+            ],
+            options={
+                'db_table': 'sync_changes',
+            },
+        ),
+        migrations.AddConstraint(
+            model_name='syncchange',
+            constraint=models.UniqueConstraint(fields=('kind', 'object_id'), name='unique_sync_change'),
+        ),
+        migrations.RunPython(record_existing, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,31 @@
+# Generated by Django 4.2.5 on 2026-10-19 09:01
+
+from django.db import migrations, models
+import django.utils.timezone
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('core', '0021_sync_changes'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='RolloverCheckpoint',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('name', models.CharField(max_length=100, unique=True)),
+                ('plan', models.JSONField(default=dict)),
+                ('step', models.CharField(blank=True, default='', max_length=50)),
+                ('last_id', models.IntegerField(default=0)),
+                ('counts', models.JSONField(blank=True, default=dict)),
+                ('started_at', models.DateTimeField(default=django.utils.timezone.now)),
+                ('updated_at', models.DateTimeField(auto_now=True)),
+                ('completed_at', models.DateTimeField(blank=True, null=True)),
+            ],
+            options={
+                'db_table': 'rollover_checkpoints',
+            },
+        ),
+    ]
@@ -0,0 +1,61 @@
+# Generated by Django 4.2.5 on 2026-10-19 09:06
+
+from django.db import migrations, models
+import django.db.models.deletion
+
+
+def units_from_departments(apps, schema_editor):
+    # Mỗi khoa đang ghi trong User.department thành một Liên chi đoàn dưới Đoàn trường
+    User = apps.get_model('core', 'User')
+    OrganizationUnit = apps.get_model('core', 'OrganizationUnit')
+    departments = list(
+        User.objects.exclude(department__isnull=True).exclude(department='')
+        .order_by('department').values_list('department', flat=True).distinct()
+    )
+    if not departments:
+        return
+    # Model lịch sử không có OrganizationUnit.save(), tự tạo path
+    root = OrganizationUnit.objects.create(name='Đoàn trường', kind='DOAN_TRUONG', depth=0)
+    root.path = f'{root.pk:06d}/'
+    root.save(update_fields=['path'])
+    for department in departments:
+        unit = OrganizationUnit.objects.create(name=department, kind='LIEN_CHI_DOAN', parent=root, depth=1)
+        unit.path = f'{root.path}{unit.pk:06d}/'
+        unit.save(update_fields=['path'])
+        User.objects.filter(department=department).update(unit=unit)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('core', '0022_rollover_checkpoint'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='OrganizationUnit',
+            fields=[
+                ('id', models.AutoField(primary_key=True, serialize=False)),
+                ('name', models.CharField(max_length=255)),
+                ('kind', models.CharField(choices=[('DOAN_TRUONG', 'Đoàn trường'), ('LIEN_CHI_DOAN', 'Liên chi đoàn'), ('CHI_DOAN', 'Chi đoàn')], default='CHI_DOAN', max_length=20)),
+                ('path', models.CharField(editable=False, max_length=255, null=True, unique=True)),
+                ('depth', models.PositiveSmallIntegerField(default=0, editable=False)),
+                ('parent', models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.PROTECT, related_name='children', to='core.organizationunit')),
+            ],
+            options={
+                'db_table': 'organization_units',
+                'ordering': ['path'],
+            },
+        ),
+        migrations.AddField(
+            model_name='activity',
+            name='unit',
+            field=models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.SET_NULL, related_name='activities', to='core.organizationunit'),
+        ),
+        migrations.AddField(
+            model_name='user',
+            name='unit',
+            field=models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.SET_NULL, related_name='members', to='core.organizationunit'),
+        ),
+        migrations.RunPython(units_from_departments, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,20 @@
+# Generated by Django 4.2.5 on 2026-10-19 11:02
+
+from django.db import migrations, models
+import django.utils.timezone
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('core', '0024_user_calendar_token_version'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='chatkeyword',
+            name='updated_at',
+            field=models.DateTimeField(auto_now=True, default=django.utils.timezone.now),
+            preserve_default=False,
+        ),
+    ]
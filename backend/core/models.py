@@ -1,4 +1,8 @@
-from django.db import models
+from django.core.exceptions import ValidationError
+from django.db import models, transaction
+from django.db.models import F, Value
+from django.db.models.functions import Concat, Substr
+from django.utils import timezone
 from django.contrib.auth.models import AbstractBaseUser, BaseUserManager, PermissionsMixin
 
 class UserManager(BaseUserManager):
@@ -43,6 +47,10 @@ class User(AbstractBaseUser, PermissionsMixin):
     position = models.CharField(max_length=100, blank=True, null=True)
     member_since = models.DateTimeField(blank=True, null=True)
     avatar = models.URLField(blank=True, null=True)
+    # Chi đoàn/Liên chi đoàn trực tiếp quản lý; department giữ tên khoa dạng chữ như cũ
+    unit = models.ForeignKey('OrganizationUnit', on_delete=models.SET_NULL, null=True, blank=True, related_name='members')
+    # Nằm trong token của URL lịch (core/calendar_feed.py); tăng lên để thu hồi URL cũ
+    calendar_token_version = models.PositiveIntegerField(default=0, editable=False)
     
     objects = UserManager()
     
@@ -54,6 +62,80 @@ class User(AbstractBaseUser, PermissionsMixin):
     
     class Meta:
         db_table = 'core_user'
+        indexes = [
+            # Dropdown đoàn viên: lọc theo vai trò, sắp xếp theo tên
+            models.Index(fields=['role', 'full_name'], name='user_role_name_idx'),
+        ]
+
+class OrganizationUnit(models.Model):
+    """
+    Đơn vị trong cây tổ chức: Đoàn trường → Liên chi đoàn khoa → Chi đoàn.
+
+    path là đường dẫn vật hóa gồm id của các đơn vị từ gốc tới chính nó, mỗi id
+    PATH_DIGITS chữ số và '/', ví dụ '000001/000004/'. Cây con của một đơn vị là các đơn vị
+    có path bắt đầu bằng path của nó, nên thống kê cả khoa là một truy vấn
+    LIKE 'path%' trên index (xem core/organization.py).
+    """
+    KIND_CHOICES = (
+        ('DOAN_TRUONG', 'Đoàn trường'),
+        ('LIEN_CHI_DOAN', 'Liên chi đoàn'),
+        ('CHI_DOAN', 'Chi đoàn'),
+    )
+    
+    # Số chữ số của mỗi id trong path; đổi giá trị này cần migration tạo lại path
+    PATH_DIGITS = 6
+    PATH_SEGMENT = PATH_DIGITS + 1
+    
+    id = models.AutoField(primary_key=True)
+    name = models.CharField(max_length=255)
+    kind = models.CharField(max_length=20, choices=KIND_CHOICES, default='CHI_DOAN')
+    parent = models.ForeignKey('self', on_delete=models.PROTECT, null=True, blank=True, related_name='children')
+    # unique: trên PostgreSQL Django tạo thêm index varchar_pattern_ops cho truy vấn LIKE 'path%'
+    path = models.CharField(max_length=255, unique=True, null=True, editable=False)
+    depth = models.PositiveSmallIntegerField(default=0, editable=False)
+    
+    def __str__(self):
+        return self.name
+    
+    def is_descendant_of(self, other):
+        return bool(self.path and other.path and self.path.startswith(other.path))
+    
+    @classmethod
+    def path_segment(cls, pk):
+        if pk >= 10 ** cls.PATH_DIGITS:
+            raise ValueError(f'Id đơn vị vượt quá {cls.PATH_DIGITS} chữ số của path')
+        return f'{pk:0{cls.PATH_DIGITS}d}/'
+    
+    def clean(self):
+        super().clean()
+        if self.pk is not None and self.parent_id and self.parent.is_descendant_of(self):
+            raise ValidationError({'parent': 'Không thể chuyển đơn vị vào cây con của chính nó'})
+    
+    def save(self, *args, **kwargs):
+        with transaction.atomic():
+            # Đơn vị mới cần id để tạo path: lưu trước với path trống
+            if self.pk is None:
+                super().save(*args, **kwargs)
+                kwargs.pop('force_insert', None)
+            
+            if self.parent_id and self.parent.is_descendant_of(self):
+                raise ValueError('Không thể chuyển đơn vị vào cây con của chính nó')
+            parent_path = self.parent.path if self.parent_id else ''
+            old_path, old_depth = self.path, self.depth
+            self.path = parent_path + self.path_segment(self.pk)
+            self.depth = len(self.path) // self.PATH_SEGMENT - 1
+            super().save(*args, **kwargs)
+            
+            if old_path and old_path != self.path:
+                # Đổi đơn vị cha: cập nhật path của cả cây con trong một câu UPDATE
+                OrganizationUnit.objects.filter(path__startswith=old_path).exclude(pk=self.pk).update(
+                    path=Concat(Value(self.path), Substr('path', len(old_path) + 1)),
+                    depth=F('depth') + (self.depth - old_depth),
+                )
+    
+    class Meta:
+        db_table = 'organization_units'
+        ordering = ['path']
 
 class Post(models.Model):
     STATUS_CHOICES = (
@@ -73,6 +155,11 @@ class Post(models.Model):
     def __str__(self):
         return self.title
     
+    def save(self, *args, **kwargs):
+        # post_save ghi sync_changes (core/sync.py) trong cùng transaction với bài viết
+        with transaction.atomic():
+            super().save(*args, **kwargs)
+    
     class Meta:
         db_table = 'posts'
         ordering = ['-created_at']
@@ -103,11 +190,23 @@ class Activity(models.Model):
     type = models.CharField(max_length=50, choices=TYPE_CHOICES, default='Khác')
     max_participants = models.IntegerField(null=True, blank=True)
     registration_deadline = models.DateTimeField(null=True, blank=True)
+    # Tự động chuyển thành False khi qua hạn đăng ký (xem core/scheduler.py)
+    registration_open = models.BooleanField(default=True)
+    # Đơn vị tổ chức hoạt động (Đoàn trường, Liên chi đoàn hoặc Chi đoàn)
+    unit = models.ForeignKey(OrganizationUnit, on_delete=models.SET_NULL, null=True, blank=True, related_name='activities')
     image = models.ImageField(upload_to='activities/', null=True, blank=True)
+    # Phiên bản thu nhỏ của ảnh, do core/images.py tạo sau khi upload
+    image_variants = models.JSONField(default=dict, blank=True, editable=False)
+    updated_at = models.DateTimeField(auto_now=True, db_index=True)
     
     def __str__(self):
         return self.title
     
+    def save(self, *args, **kwargs):
+        # post_save ghi sync_changes (core/sync.py) trong cùng transaction với hoạt động
+        with transaction.atomic():
+            super().save(*args, **kwargs)
+    
     @property
     def participants_count(self):
         """Return the number of active registrations for this activity"""
@@ -121,6 +220,16 @@ class Activity(models.Model):
     class Meta:
         db_table = 'activities'
         ordering = ['-start_date']
+        indexes = [
+            # Lịch hoạt động: hoạt động giao với một khoảng ngày
+            models.Index(fields=['start_date', 'end_date'], name='activity_start_end_idx'),
+            # Chuyển trạng thái theo lịch và thống kê theo trạng thái
+            models.Index(fields=['status', 'start_date'], name='activity_status_start_idx'),
+            models.Index(fields=['status', 'end_date'], name='activity_status_end_idx'),
+            # Chỉ các hoạt động còn mở đăng ký cần quét hạn đăng ký
+            models.Index(fields=['registration_deadline'], name='activity_open_deadline_idx',
+                         condition=models.Q(registration_open=True)),
+        ]
 
 class WorkSchedule(models.Model):
     STATUS_CHOICES = (
@@ -134,6 +243,7 @@ class WorkSchedule(models.Model):
     description = models.TextField()
     schedule_date = models.DateTimeField()
     status = models.CharField(max_length=20, choices=STATUS_CHOICES, default='Pending')
+    updated_at = models.DateTimeField(auto_now=True)
     
     def __str__(self):
         return self.title
@@ -141,6 +251,10 @@ class WorkSchedule(models.Model):
     class Meta:
         db_table = 'work_schedules'
         ordering = ['-schedule_date']
+        indexes = [
+            models.Index(fields=['schedule_date'], name='schedule_date_idx'),
+            models.Index(fields=['user', 'schedule_date'], name='schedule_user_date_idx'),
+        ]
 
 class ActivityRegistration(models.Model):
     STATUS_CHOICES = (
@@ -165,6 +279,7 @@ class ActivityRegistration(models.Model):
     emergency_contact = models.CharField(max_length=100, blank=True, null=True)
     dietary_requirements = models.TextField(blank=True, null=True)
     additional_info = models.TextField(blank=True, null=True)
+    updated_at = models.DateTimeField(auto_now=True, db_index=True)
     
     def __str__(self):
         return f"{self.user.username} - {self.activity.title}"
@@ -179,6 +294,7 @@ class Notification(models.Model):
     content = models.TextField()
     created_at = models.DateTimeField(auto_now_add=True)
     is_read = models.BooleanField(default=False)
+    updated_at = models.DateTimeField(auto_now=True, db_index=True)
     
     def __str__(self):
         return f"Notification for {self.user.username}"
@@ -186,6 +302,45 @@ class Notification(models.Model):
     class Meta:
         db_table = 'notifications'
         ordering = ['-created_at']
+        indexes = [
+            # Truy vấn thường xuyên: thông báo mới nhất của một người dùng
+            models.Index(fields=['user', '-created_at'], name='notif_user_created_idx'),
+            # Quét thông báo đã đọc cũ để lưu trữ
+            models.Index(fields=['is_read', 'created_at'], name='notif_read_created_idx'),
+        ]
+
+class NotificationArchive(models.Model):
+    """Thông báo đã đọc được chuyển khỏi bảng notifications, phân theo tháng tạo"""
+    id = models.AutoField(primary_key=True)
+    original_id = models.IntegerField()
+    user = models.ForeignKey(User, on_delete=models.CASCADE, related_name='archived_notifications')
+    content = models.TextField()
+    created_at = models.DateTimeField()
+    month = models.DateField(help_text="Ngày đầu tháng tạo thông báo")
+    archived_at = models.DateTimeField(auto_now_add=True)
+    
+    def __str__(self):
+        return f"Archived notification for {self.user_id} ({self.month:%Y-%m})"
+    
+    class Meta:
+        db_table = 'notifications_archive'
+        ordering = ['-created_at']
+        indexes = [
+            models.Index(fields=['user', 'month'], name='notif_archive_user_month_idx'),
+            models.Index(fields=['month'], name='notif_archive_month_idx'),
+        ]
+
+class NotificationCounter(models.Model):
+    """Số thông báo chưa đọc của mỗi người dùng, được cập nhật khi tạo/đọc thông báo"""
+    id = models.AutoField(primary_key=True)
+    user = models.OneToOneField(User, on_delete=models.CASCADE, related_name='notification_counter')
+    unread_count = models.IntegerField(default=0)
+    
+    def __str__(self):
+        return f"{self.user.username} - {self.unread_count} unread"
+    
+    class Meta:
+        db_table = 'notification_counters'
 
 class Permission(models.Model):
     PERMISSION_CHOICES = (
@@ -205,6 +360,10 @@ class Permission(models.Model):
     
     class Meta:
         db_table = 'permissions'
+        indexes = [
+            # Kiểm tra quyền trên bài viết (core/acl.py)
+            models.Index(fields=['user', 'post', 'permission_type'], name='permission_user_post_idx'),
+        ]
 
 class MemberAchievement(models.Model):
     id = models.AutoField(primary_key=True)
@@ -273,4 +432,140 @@ class MemberStatistics(models.Model):
         return f"{self.user.username} - Statistics"
     
     class Meta:
-        db_table = 'member_statistics' 
\ No newline at end of file
+        db_table = 'member_statistics'
+
+class ScheduledJob(models.Model):
+    """Tác vụ định kỳ do lệnh run_scheduler thực thi"""
+    name = models.CharField(max_length=100, unique=True)
+    interval_seconds = models.PositiveIntegerField(default=60)
+    enabled = models.BooleanField(default=True)
+    next_run_at = models.DateTimeField(db_index=True)
+    last_run_at = models.DateTimeField(null=True, blank=True)
+    last_result = models.JSONField(default=dict, blank=True)
+    last_error = models.TextField(blank=True, default='')
+    
+    def __str__(self):
+        return self.name
+    
+    class Meta:
+        db_table = 'scheduled_jobs'
+        ordering = ['name']
+
+class ActivityReminder(models.Model):
+    """Lời nhắc đã lên lịch cho một hoạt động; due_at là thời điểm gửi"""
+    KIND_CHOICES = (
+        ('start', 'Trước giờ bắt đầu'),
+        ('deadline', 'Trước hạn đăng ký'),
+    )
+    
+    activity = models.ForeignKey(Activity, on_delete=models.CASCADE, related_name='reminders')
+    kind = models.CharField(max_length=20, choices=KIND_CHOICES)
+    due_at = models.DateTimeField()
+    sent_at = models.DateTimeField(null=True, blank=True)
+    recipients = models.PositiveIntegerField(default=0)
+    
+    def __str__(self):
+        return f"{self.activity_id} - {self.kind}"
+    
+    class Meta:
+        db_table = 'activity_reminders'
+        constraints = [
+            models.UniqueConstraint(fields=['activity', 'kind'], name='unique_activity_reminder'),
+        ]
+        indexes = [
+            # Hàng đợi theo thời gian: chỉ các lời nhắc chưa gửi
+            models.Index(fields=['due_at'], name='reminder_pending_due_idx',
+                         condition=models.Q(sent_at__isnull=True)),
+        ]
+
+
+class ChatIntent(models.Model):
+    """Câu hỏi thường gặp của chatbot; được nhận diện qua các từ khóa (ChatKeyword)"""
+    name = models.SlugField(max_length=100, unique=True)
+    answer = models.TextField()
+    sources = models.JSONField(default=list, blank=True)
+    # Khi điểm bằng nhau, ý định có priority cao hơn được chọn
+    priority = models.IntegerField(default=0)
+    # Câu trả lời mặc định khi không có ý định nào khớp
+    is_fallback = models.BooleanField(default=False)
+    is_active = models.BooleanField(default=True)
+    updated_at = models.DateTimeField(auto_now=True)
+    
+    def __str__(self):
+        return self.name
+    
+    class Meta:
+        db_table = 'chat_intents'
+        ordering = ['-priority', 'name']
+
+class ChatKeyword(models.Model):
+    intent = models.ForeignKey(ChatIntent, on_delete=models.CASCADE, related_name='keywords')
+    phrase = models.CharField(max_length=255)
+    weight = models.FloatField(default=1.0)
+    updated_at = models.DateTimeField(auto_now=True)
+    
+    def __str__(self):
+        return self.phrase
+    
+    class Meta:
+        db_table = 'chat_keywords'
+        constraints = [
+            models.UniqueConstraint(fields=['intent', 'phrase'], name='unique_chat_keyword'),
+        ]
+
+class ChatQueryLog(models.Model):
+    """Nhật ký câu hỏi gửi chatbot, ghi theo lô (xem core/chat_cache.py)"""
+    # Câu hỏi đã chuẩn hóa: các câu hỏi cùng dạng được gộp khi thống kê
+    normalized = models.CharField(max_length=255)
+    query = models.CharField(max_length=500)
+    intent = models.CharField(max_length=100, blank=True, null=True)
+    cache_hit = models.BooleanField(default=False)
+    created_at = models.DateTimeField(default=timezone.now)
+    
+    def __str__(self):
+        return self.query
+    
+    class Meta:
+        db_table = 'chat_query_logs'
+        indexes = [
+            models.Index(fields=['created_at', 'cache_hit'], name='chat_query_log_time_idx'),
+        ]
+
+class SyncChange(models.Model):
+    """
+    Nhật ký thay đổi cho đồng bộ tăng dần (xem core/sync.py). Mỗi đối tượng có một
+    dòng; mỗi lần đối tượng đổi, dòng cũ được thay bằng dòng mới nên id (tăng dần)
+    là con trỏ đồng bộ.
+    """
+    kind = models.CharField(max_length=20)
+    object_id = models.IntegerField()
+    deleted = models.BooleanField(default=False)
+    changed_at = models.DateTimeField(default=timezone.now)
+    
+    def __str__(self):
+        return f"{self.kind}:{self.object_id}"
+    
+    class Meta:
+        db_table = 'sync_changes'
+        constraints = [
+            models.UniqueConstraint(fields=['kind', 'object_id'], name='unique_sync_change'),
+        ]
+
+class RolloverCheckpoint(models.Model):
+    """Tiến độ của một lần chuyển năm học (xem core/rollover.py), để chạy tiếp khi bị gián đoạn"""
+    name = models.CharField(max_length=100, unique=True)
+    plan = models.JSONField(default=dict)
+    # Bước đang chạy và id người dùng cuối cùng đã xử lý trong bước đó
+    step = models.CharField(max_length=50, blank=True, default='')
+    last_id = models.IntegerField(default=0)
+    counts = models.JSONField(default=dict, blank=True)
+    started_at = models.DateTimeField(default=timezone.now)
+    updated_at = models.DateTimeField(auto_now=True)
+    completed_at = models.DateTimeField(null=True, blank=True)
+    
+    def __str__(self):
+        return self.name
+    
+    class Meta:
+        db_table = 'rollover_checkpoints'
+
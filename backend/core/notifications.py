@@ -0,0 +1,153 @@
+"""
+Bộ đếm thông báo chưa đọc và kênh đẩy thông báo theo thời gian thực.
+"""
+import asyncio
+import secrets
+import threading
+from collections import defaultdict
+
+from django.core import signing
+from django.core.cache import cache
+from django.db import transaction
+from django.db.models import F
+
+from .models import Notification, NotificationCounter
+
+STREAM_TICKET_SALT = 'core.notification-stream'
+
+# Vé mở luồng thông báo chỉ dùng được một lần, trong thời gian ngắn
+STREAM_TICKET_MAX_AGE = 60
+
+
+def get_unread_count(user_id):
+    """
+    Đọc bộ đếm; nếu người dùng chưa có bộ đếm thì đếm một lần và lưu lại.
+    """
+    count = NotificationCounter.objects.filter(user_id=user_id).values_list('unread_count', flat=True).first()
+    if count is not None:
+        return count
+    return refresh_unread_count(user_id)
+
+
+def refresh_unread_count(user_id):
+    """Tính lại bộ đếm từ bảng thông báo"""
+    count = Notification.objects.filter(user_id=user_id, is_read=False).count()
+    NotificationCounter.objects.update_or_create(user_id=user_id, defaults={'unread_count': count})
+    return count
+
+
+def adjust_unread_count(user_ids, delta):
+    """
+    Tăng/giảm bộ đếm bằng một câu UPDATE. Người dùng chưa có bộ đếm
+    sẽ được đếm lại ở lần đọc đầu tiên nên không cần tạo dòng ở đây.
+    """
+    if not user_ids or not delta:
+        return
+    NotificationCounter.objects.filter(user_id__in=user_ids).update(unread_count=F('unread_count') + delta)
+
+
+def reset_unread_count(user_id):
+    NotificationCounter.objects.filter(user_id=user_id).update(unread_count=0)
+
+
+def make_stream_ticket(user):
+    """
+    Vé mở /api/notifications/stream/?ticket=... (EventSource không gửi được header
+    Authorization). Dùng vé thay cho access token để token không nằm trong URL và
+    log truy cập.
+    """
+    return signing.dumps({'user': user.pk, 'nonce': secrets.token_urlsafe(16)}, salt=STREAM_TICKET_SALT)
+
+
+def read_stream_ticket(ticket):
+    """Id người dùng của vé còn hạn và chưa dùng, hoặc None"""
+    try:
+        payload = signing.loads(ticket, salt=STREAM_TICKET_SALT, max_age=STREAM_TICKET_MAX_AGE)
+    except signing.BadSignature:
+        return None
+    # cache.add thất bại nếu vé đã được dùng (cần cache dùng chung khi chạy nhiều worker)
+    if not cache.add(f"notifications:stream-ticket:{payload['nonce']}", True, STREAM_TICKET_MAX_AGE):
+        return None
+    return payload['user']
+
+
+def serialize_notification(notification):
+    return {
+        'id': notification.id,
+        'content': notification.content,
+        'created_at': notification.created_at.isoformat() if notification.created_at else None,
+        'is_read': notification.is_read,
+    }
+
+
+def notify_users(users, content):
+    """
+    Tạo cùng một thông báo cho nhiều người dùng bằng bulk_create,
+    cập nhật bộ đếm và đẩy tới các kết nối đang mở sau khi commit.
+    """
+    user_ids = list(dict.fromkeys(getattr(user, 'pk', user) for user in users))
+    if not user_ids:
+        return []
+
+    notifications = Notification.objects.bulk_create([
+        Notification(user_id=user_id, content=content) for user_id in user_ids
+    ])
+    adjust_unread_count(user_ids, 1)
+
+    payloads = [(n.user_id, serialize_notification(n)) for n in notifications]
+    transaction.on_commit(lambda: hub.publish_many(payloads))
+    return notifications
+
+
+class NotificationHub:
+    """
+    Phân phối thông báo mới tới các kết nối SSE trong cùng process.
+
+    Mỗi kết nối có một asyncio.Queue gắn với event loop của nó; publish có thể
+    gọi từ code đồng bộ ở thread khác. Khi chạy nhiều worker, kết nối ở worker
+    khác vẫn nhận được thay đổi qua bộ đếm (xem async_views.notification_stream).
+    """
+    QUEUE_SIZE = 100
+
+    def __init__(self):
+        self._subscribers = defaultdict(set)
+        self._lock = threading.Lock()
+
+    def subscribe(self, user_id):
+        queue = asyncio.Queue(maxsize=self.QUEUE_SIZE)
+        entry = (asyncio.get_running_loop(), queue)
+        with self._lock:
+            self._subscribers[user_id].add(entry)
+        return entry
+
+    def unsubscribe(self, user_id, entry):
+        with self._lock:
+            subscribers = self._subscribers.get(user_id)
+            if subscribers is not None:
+                subscribers.discard(entry)
+                if not subscribers:
+                    del self._subscribers[user_id]
+
+    def publish(self, user_id, payload):
+        self.publish_many([(user_id, payload)])
+
+    def publish_many(self, payloads):
+        with self._lock:
+            targets = [(set(self._subscribers.get(user_id, ())), payload) for user_id, payload in payloads]
+        for entries, payload in targets:
+            for loop, queue in entries:
+                try:
+                    loop.call_soon_threadsafe(_offer, queue, payload)
+                except RuntimeError:
+                    # Event loop đã đóng, kết nối sẽ tự hủy đăng ký
+                    pass
+
+
+def _offer(queue, payload):
+    # Client đọc chậm: bỏ thông báo cũ nhất thay vì chặn người gửi
+    if queue.full():
+        queue.get_nowait()
+    queue.put_nowait(payload)
+
+
+hub = NotificationHub()
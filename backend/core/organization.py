@@ -0,0 +1,106 @@
+"""
+Thống kê theo cây tổ chức (Đoàn trường → Liên chi đoàn khoa → Chi đoàn).
+
+Đơn vị lưu đường dẫn vật hóa (OrganizationUnit.path) với các đoạn cùng độ dài,
+nên:
+
+- cây con của một đơn vị là unit__path LIKE 'path%': JOIN với organization_units
+  theo index của path rồi theo index khóa ngoại unit_id, không quét cả bảng
+  người dùng;
+- gộp theo đơn vị con trực tiếp chỉ là GROUP BY SUBSTR(path, 1, len(path) + 7).
+
+Số liệu đoàn viên (số lượng, tham gia hoạt động, đoàn phí một quý) của cả cây
+con được tính trong một truy vấn; đoàn phí JOIN qua FilteredRelation nên mỗi
+đoàn viên có tối đa một dòng đoàn phí và các phép đếm không bị nhân lên.
+"""
+from django.contrib.auth import get_user_model
+from django.db import transaction
+from django.db.models import Count, FilteredRelation, Q
+from django.db.models.functions import Substr
+
+from .models import Activity, OrganizationUnit
+from .registrations import PARTICIPANT_STATUSES
+from .summaries import bump_data_version
+
+User = get_user_model()
+
+
+def in_subtree(queryset, unit, field='unit'):
+    """Lọc queryset (người dùng, hoạt động) thuộc đơn vị unit hoặc các đơn vị con của nó"""
+    return queryset.filter(**{f'{field}__path__startswith': unit.path})
+
+
+def member_aggregates(year, quarter):
+    participating = Q(
+        activity_registrations__status__in=PARTICIPANT_STATUSES,
+        activity_registrations__registration_date__year=year,
+    )
+    return {
+        'members': Count('id', distinct=True),
+        'active_members': Count('id', distinct=True, filter=Q(is_active=True)),
+        'participants': Count('id', distinct=True, filter=participating),
+        'participations': Count('activity_registrations', distinct=True, filter=participating),
+        'fee_paid': Count('id', distinct=True, filter=Q(is_active=True, fee__paid=True)),
+    }
+
+
+def subtree_members(unit, year, quarter):
+    members = in_subtree(User.objects.filter(role='DOAN_VIEN'), unit)
+    return members.annotate(
+        fee=FilteredRelation('union_fees', condition=Q(union_fees__year=year, union_fees__quarter=quarter))
+    )
+
+
+def _with_rates(row):
+    active = row['active_members']
+    row['fee_unpaid'] = active - row['fee_paid']
+    row['participation_rate'] = round(row['participants'] / active, 4) if active else 0
+    row['fee_paid_rate'] = round(row['fee_paid'] / active, 4) if active else 0
+    return row
+
+
+def subtree_stats(unit, year, quarter):
+    """Số liệu của cả cây con: đoàn viên trong một truy vấn, hoạt động trong một truy vấn"""
+    row = subtree_members(unit, year, quarter).aggregate(**member_aggregates(year, quarter))
+    row['activities'] = in_subtree(Activity.objects.filter(start_date__year=year), unit).count()
+    return _with_rates(row)
+
+
+def branch_stats(unit, year, quarter):
+    """
+    Số liệu gộp theo từng đơn vị con trực tiếp (mỗi khoa của Đoàn trường, mỗi chi
+    đoàn của khoa). Đoàn viên gắn thẳng vào unit được gộp vào dòng của chính unit.
+    """
+    prefix = Substr('unit__path', 1, len(unit.path) + OrganizationUnit.PATH_SEGMENT)
+    member_rows = {
+        row.pop('branch'): row
+        for row in subtree_members(unit, year, quarter)
+        .annotate(branch=prefix).values('branch')
+        .annotate(**member_aggregates(year, quarter)).order_by()
+    }
+    activity_counts = dict(
+        in_subtree(Activity.objects.filter(start_date__year=year), unit)
+        .annotate(branch=prefix).values_list('branch').annotate(count=Count('id')).order_by()
+    )
+
+    empty = dict.fromkeys(member_aggregates(year, quarter), 0)
+    rows = []
+    for branch in [unit, *unit.children.all()]:
+        row = {'id': branch.id, 'name': branch.name, 'kind': branch.kind}
+        row.update(member_rows.get(branch.path, empty))
+        row['activities'] = activity_counts.get(branch.path, 0)
+        rows.append(_with_rates(row))
+    # Bỏ dòng của chính unit nếu không có ai gắn thẳng vào nó
+    if not rows[0]['members'] and not rows[0]['activities']:
+        rows.pop(0)
+    return rows
+
+
+def assign_members(unit, user_ids):
+    """Chuyển nhiều người dùng vào unit bằng một câu UPDATE. Trả về số người đã chuyển"""
+    with transaction.atomic():
+        updated = User.objects.filter(id__in=user_ids).update(unit=unit)
+    if updated:
+        # UPDATE hàng loạt không phát signal, tự làm mới danh sách rút gọn đoàn viên
+        transaction.on_commit(lambda: bump_data_version('members'))
+    return updated
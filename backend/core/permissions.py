@@ -1,5 +1,7 @@
 from rest_framework import permissions
 
+from .acl import ACTION_PERMISSIONS, has_post_permission
+
 class IsAdmin(permissions.BasePermission):
     """
     Cho phép truy cập chỉ khi người dùng là Admin.
@@ -72,4 +74,15 @@ class ReadOnly(permissions.BasePermission):
     Cho phép truy cập chỉ với các request GET, HEAD hoặc OPTIONS.
     """
     def has_permission(self, request, view):
-        return request.method in permissions.SAFE_METHODS 
\ No newline at end of file
+        return request.method in permissions.SAFE_METHODS
+
+class HasPostPermission(permissions.BasePermission):
+    """
+    Kiểm tra quyền Read/Write/Delete trên bài viết theo bảng permissions (xem core/acl.py).
+    """
+    def has_object_permission(self, request, view, obj):
+        permission_type = ACTION_PERMISSIONS.get(view.action)
+        if permission_type is None:
+            return True
+        return has_post_permission(request.user, obj, permission_type, view.get_grants())
+
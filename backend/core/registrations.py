@@ -0,0 +1,242 @@
+"""
+Thao tác hàng loạt trên đăng ký hoạt động (duyệt, từ chối, điểm danh).
+"""
+from collections import Counter
+from datetime import timedelta
+
+from django.conf import settings
+from django.db import transaction
+from django.db.models import Count, OuterRef, Subquery
+from django.db.models.functions import Coalesce
+from django.utils import timezone
+from django.utils.dateparse import parse_datetime
+
+from .calendar_feed import invalidate_user_feeds
+from .models import Activity, ActivityRegistration
+
+PARTICIPANT_STATUSES = ['Approved', 'Attended']
+
+# Giới hạn số id trong một request để tránh giữ khóa quá lâu
+MAX_BULK_SIZE = 1000
+
+# Giới hạn số sự kiện điểm danh ngoại tuyến trong một lần đồng bộ
+MAX_SYNC_EVENTS = 5000
+
+# Cho phép lệch đồng hồ giữa thiết bị điểm danh và máy chủ
+CLOCK_SKEW_TOLERANCE = timedelta(minutes=5)
+
+# Trạng thái đích và các trạng thái nguồn hợp lệ cho từng thao tác
+BULK_TRANSITIONS = {
+    'approve': ('Approved', ['Pending', 'Rejected']),
+    'reject': ('Rejected', ['Pending', 'Approved']),
+    'attend': ('Attended', ['Pending', 'Approved']),
+}
+
+# Trạng thái đăng ký có thể ghi nhận điểm danh (kể cả đã điểm danh)
+CHECKIN_STATUSES = ['Pending', 'Approved', 'Attended']
+
+
+def parse_id_list(value):
+    """Chuyển danh sách id từ request thành list số nguyên, giữ nguyên thứ tự, bỏ trùng"""
+    if value is None:
+        return None
+    if isinstance(value, str):
+        value = [item for item in value.split(',') if item.strip()]
+    if not isinstance(value, (list, tuple)):
+        raise ValueError('Danh sách id không hợp lệ')
+    ids = list(dict.fromkeys(int(item) for item in value))
+    if len(ids) > MAX_BULK_SIZE:
+        raise ValueError(f'Tối đa {MAX_BULK_SIZE} id mỗi lần')
+    return ids
+
+
+def participant_counts(activity_ids):
+    """Số người tham gia (Approved/Attended) của nhiều hoạt động trong một truy vấn"""
+    counts = dict.fromkeys(activity_ids, 0)
+    rows = ActivityRegistration.objects.filter(
+        activity_id__in=activity_ids, status__in=PARTICIPANT_STATUSES
+    ).values('activity_id').annotate(count=Count('id'))
+    for row in rows:
+        counts[row['activity_id']] = row['count']
+    return counts
+
+
+def with_participant_counts(queryset):
+    """
+    Annotate participants_total cho queryset hoạt động bằng subquery,
+    thay cho một truy vấn COUNT mỗi hoạt động khi serialize.
+    """
+    counts = ActivityRegistration.objects.filter(
+        activity=OuterRef('pk'), status__in=PARTICIPANT_STATUSES
+    ).order_by().values('activity').annotate(count=Count('id')).values('count')
+    return queryset.annotate(participants_total=Coalesce(Subquery(counts), 0))
+
+
+def bulk_transition(operation, registration_ids=None, activity_id=None, user_ids=None):
+    """
+    Áp dụng một thao tác cho nhiều đăng ký bằng một câu UPDATE trong một transaction.
+
+    Đăng ký được xác định bằng registration_ids, hoặc activity_id + user_ids.
+    Trả về kết quả cho từng id đầu vào và số người tham gia sau cập nhật.
+    """
+    target, allowed_from = BULK_TRANSITIONS[operation]
+
+    if registration_ids is not None:
+        key_field, keys = 'id', registration_ids
+        queryset = ActivityRegistration.objects.filter(id__in=keys)
+    else:
+        key_field, keys = 'user_id', user_ids
+        queryset = ActivityRegistration.objects.filter(activity_id=activity_id, user_id__in=keys)
+
+    results = dict.fromkeys(keys, 'not_found')
+
+    with transaction.atomic():
+        rows = list(
+            queryset.select_for_update().values_list(key_field, 'id', 'activity_id', 'status', 'user_id')
+        )
+
+        to_update = []
+        for key, registration_id, row_activity_id, current, row_user_id in rows:
+            if current == target:
+                results[key] = 'unchanged'
+            elif current not in allowed_from:
+                results[key] = 'invalid_status'
+            else:
+                to_update.append((key, registration_id, row_activity_id, current, row_user_id))
+
+        activity_ids = {row[2] for row in rows}
+
+        if operation == 'approve' and to_update:
+            # Khóa các hoạt động liên quan để tính chỗ trống nhất quán
+            limits = dict(
+                Activity.objects.select_for_update()
+                .filter(id__in=activity_ids, max_participants__isnull=False)
+                .values_list('id', 'max_participants')
+            )
+            if limits:
+                current_counts = participant_counts(list(limits))
+                accepted = []
+                for item in to_update:
+                    row_activity_id = item[2]
+                    if row_activity_id in limits and current_counts[row_activity_id] >= limits[row_activity_id]:
+                        results[item[0]] = 'full'
+                        continue
+                    if row_activity_id in limits:
+                        current_counts[row_activity_id] += 1
+                    accepted.append(item)
+                to_update = accepted
+
+        if to_update:
+            now = timezone.now()
+            fields = {'status': target, 'updated_at': now}
+            if operation == 'attend':
+                fields['attendance_date'] = now
+            ActivityRegistration.objects.filter(
+                id__in=[item[1] for item in to_update]
+            ).update(**fields)
+            for item in to_update:
+                results[item[0]] = 'updated'
+            # UPDATE không phát signal: đăng ký bị từ chối biến mất khỏi lịch của người dùng,
+            # được duyệt lại (từ Rejected) thì xuất hiện lại, nên lịch của mọi người bị đổi trạng thái đều làm mới
+            invalidate_user_feeds(item[4] for item in to_update)
+
+        counts = participant_counts(list(activity_ids))
+
+    return {
+        'operation': operation,
+        'status': target,
+        'results': results,
+        'counts': dict(Counter(results.values())),
+        'participants': counts,
+    }
+
+
+def _parse_event_time(value):
+    moment = parse_datetime(value) if isinstance(value, str) else None
+    if moment is None:
+        raise ValueError('attended_at không hợp lệ')
+    if settings.USE_TZ and timezone.is_naive(moment):
+        moment = timezone.make_aware(moment)
+    elif not settings.USE_TZ and timezone.is_aware(moment):
+        moment = timezone.make_naive(moment)
+    return moment
+
+
+def sync_attendance(events):
+    """
+    Đồng bộ một lô sự kiện điểm danh thu thập ngoại tuyến.
+
+    Mỗi sự kiện gồm activity, user, attended_at. Các sự kiện trùng
+    (activity, user) được gộp, giữ thời điểm muộn nhất. Đăng ký được cập nhật
+    trong một transaction theo nguyên tắc last-write-wins trên attendance_date;
+    các trường hợp không áp dụng được trả về trong conflicts.
+    """
+    conflicts = []
+    latest = {}
+    duplicates = 0
+    now = timezone.now()
+
+    for index, event in enumerate(events):
+        try:
+            key = (int(event['activity']), int(event['user']))
+            attended_at = _parse_event_time(event.get('attended_at'))
+        except (KeyError, TypeError, ValueError, AttributeError):
+            conflicts.append({'index': index, 'reason': 'invalid'})
+            continue
+        if attended_at > now + CLOCK_SKEW_TOLERANCE:
+            conflicts.append({'index': index, 'activity': key[0], 'user': key[1], 'reason': 'future_timestamp'})
+            continue
+        if key in latest:
+            duplicates += 1
+            if attended_at <= latest[key]:
+                continue
+        latest[key] = attended_at
+
+    applied = 0
+    unchanged = 0
+
+    with transaction.atomic():
+        registrations = {}
+        if latest:
+            queryset = ActivityRegistration.objects.select_for_update().filter(
+                activity_id__in={key[0] for key in latest},
+                user_id__in={key[1] for key in latest},
+            ).only('id', 'activity_id', 'user_id', 'status', 'attendance_date', 'updated_at')
+            registrations = {(r.activity_id, r.user_id): r for r in queryset}
+
+        to_update = []
+        for key, attended_at in latest.items():
+            registration = registrations.get(key)
+            conflict = {'activity': key[0], 'user': key[1]}
+            if registration is None:
+                conflicts.append(dict(conflict, reason='not_registered'))
+                continue
+            if registration.status not in CHECKIN_STATUSES:
+                conflicts.append(dict(conflict, reason='invalid_status', status=registration.status))
+                continue
+            current = registration.attendance_date
+            if registration.status == 'Attended' and current is not None:
+                if current == attended_at:
+                    unchanged += 1
+                    continue
+                if current > attended_at:
+                    conflicts.append(dict(conflict, reason='stale', server_attendance_date=current))
+                    continue
+            registration.status = 'Attended'
+            registration.attendance_date = attended_at
+            registration.updated_at = now
+            to_update.append(registration)
+
+        if to_update:
+            ActivityRegistration.objects.bulk_update(
+                to_update, ['status', 'attendance_date', 'updated_at'], batch_size=500
+            )
+            applied = len(to_update)
+
+    return {
+        'received': len(events),
+        'applied': applied,
+        'unchanged': unchanged,
+        'duplicates': duplicates,
+        'conflicts': conflicts,
+    }
@@ -0,0 +1,132 @@
+"""
+Nhắc lịch hoạt động.
+
+Mỗi hoạt động có tối đa hai lời nhắc trong bảng activity_reminders: trước giờ bắt đầu
+(gửi cho người đã đăng ký) và trước hạn đăng ký (gửi cho đoàn viên chưa đăng ký).
+Lời nhắc được lên lịch khi hoạt động được lưu; scheduler chỉ đọc các lời nhắc đã
+đến hạn qua index một phần trên due_at nên không phải quét toàn bộ hoạt động.
+"""
+from datetime import timedelta
+
+from django.conf import settings
+from django.contrib.auth import get_user_model
+from django.db import transaction
+from django.db.models import Exists, OuterRef
+
+from .models import ActivityRegistration, ActivityReminder
+from .notifications import notify_users
+
+User = get_user_model()
+
+# Người đã đăng ký ở các trạng thái này được nhắc trước giờ bắt đầu
+START_REMINDER_STATUSES = ['Pending', 'Approved']
+
+# Số lời nhắc xử lý trong một transaction
+REMINDER_BATCH_SIZE = 200
+
+
+def get_start_offset():
+    return timedelta(hours=getattr(settings, 'REMINDER_BEFORE_START_HOURS', 24))
+
+
+def get_deadline_offset():
+    return timedelta(hours=getattr(settings, 'REMINDER_BEFORE_DEADLINE_HOURS', 24))
+
+
+def schedule_reminders(activity):
+    """
+    Tạo/cập nhật lời nhắc theo thời gian hiện tại của hoạt động. Nếu thời gian
+    thay đổi, lời nhắc được đặt lại để gửi theo lịch mới.
+    """
+    planned = {'start': activity.start_date - get_start_offset()}
+    if activity.registration_deadline:
+        planned['deadline'] = activity.registration_deadline - get_deadline_offset()
+
+    existing = {reminder.kind: reminder for reminder in ActivityReminder.objects.filter(activity=activity)}
+    for kind, due_at in planned.items():
+        reminder = existing.get(kind)
+        if reminder is None:
+            ActivityReminder.objects.create(activity=activity, kind=kind, due_at=due_at)
+        elif reminder.due_at != due_at:
+            ActivityReminder.objects.filter(pk=reminder.pk).update(due_at=due_at, sent_at=None, recipients=0)
+
+    # Hoạt động không còn hạn đăng ký thì bỏ lời nhắc tương ứng (nếu chưa gửi)
+    if 'deadline' not in planned and 'deadline' in existing:
+        ActivityReminder.objects.filter(pk=existing['deadline'].pk, sent_at__isnull=True).delete()
+
+
+def start_recipients(activity):
+    return ActivityRegistration.objects.filter(
+        activity=activity, status__in=START_REMINDER_STATUSES
+    ).values_list('user_id', flat=True)
+
+
+def deadline_recipients(activity):
+    """Đoàn viên đang hoạt động chưa có đăng ký nào cho hoạt động (anti-join)"""
+    registered = ActivityRegistration.objects.filter(activity=activity, user=OuterRef('pk'))
+    return User.objects.filter(role='DOAN_VIEN', is_active=True).filter(
+        ~Exists(registered)
+    ).values_list('id', flat=True)
+
+
+def reminder_message(reminder):
+    activity = reminder.activity
+    if reminder.kind == 'start':
+        location = f" tại {activity.location}" if activity.location else ''
+        return f"Nhắc nhở: hoạt động {activity.title} bắt đầu lúc {activity.start_date:%d/%m/%Y %H:%M}{location}."
+    return (
+        f"Nhắc nhở: hoạt động {activity.title} sẽ đóng đăng ký lúc "
+        f"{activity.registration_deadline:%d/%m/%Y %H:%M}. Đăng ký ngay nếu bạn muốn tham gia."
+    )
+
+
+def _is_stale(reminder, now):
+    """Lời nhắc quá muộn (hoạt động đã bắt đầu, đăng ký đã đóng) thì bỏ qua"""
+    activity = reminder.activity
+    if reminder.kind == 'start':
+        return activity.start_date <= now
+    return (
+        not activity.registration_open
+        or activity.registration_deadline is None
+        or activity.registration_deadline <= now
+    )
+
+
+def send_due_reminders(now, batch_size=REMINDER_BATCH_SIZE):
+    """
+    Gửi các lời nhắc đã đến hạn theo từng lô. Lời nhắc được khóa và đánh dấu
+    sent_at trong cùng transaction với việc tạo thông báo nên không bao giờ gửi hai lần.
+    """
+    sent = skipped = notified = 0
+    while True:
+        with transaction.atomic():
+            batch = list(
+                ActivityReminder.objects.select_for_update(skip_locked=True, of=('self',))
+                .select_related('activity')
+                .filter(sent_at__isnull=True, due_at__lte=now)
+                .order_by('due_at')[:batch_size]
+            )
+            if not batch:
+                break
+
+            for reminder in batch:
+                if _is_stale(reminder, now):
+                    skipped += 1
+                    recipients = []
+                elif reminder.kind == 'start':
+                    recipients = list(start_recipients(reminder.activity))
+                else:
+                    recipients = list(deadline_recipients(reminder.activity))
+                if recipients:
+                    notify_users(recipients, reminder_message(reminder))
+                    sent += 1
+                    notified += len(recipients)
+                reminder.sent_at = now
+                reminder.recipients = len(recipients)
+
+            ActivityReminder.objects.bulk_update(batch, ['sent_at', 'recipients'])
+
+        if len(batch) < batch_size:
+            break
+
+    return {'sent': sent, 'skipped': skipped, 'notifications': notified}
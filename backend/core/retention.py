@@ -0,0 +1,100 @@
+"""
+Lưu trữ và dọn dẹp thông báo cũ.
+
+Thông báo đã đọc quá thời hạn giữ lại được chép sang bảng notifications_archive
+(và tùy chọn ra file JSONL nén gzip theo tháng), sau đó xóa khỏi bảng chính.
+Mỗi lô chạy trong một transaction ngắn để không giữ khóa lâu.
+"""
+import gzip
+import json
+import os
+import time
+from datetime import timedelta
+
+from django.conf import settings
+from django.db import transaction
+from django.utils import timezone
+
+from .models import Notification, NotificationArchive
+
+
+def get_retention_days():
+    return getattr(settings, 'NOTIFICATION_RETENTION_DAYS', 180)
+
+
+def archivable_notifications(older_than_days=None, now=None):
+    days = get_retention_days() if older_than_days is None else older_than_days
+    cutoff = (now or timezone.now()) - timedelta(days=days)
+    return Notification.objects.filter(is_read=True, created_at__lt=cutoff)
+
+
+def _month_of(moment):
+    return moment.date().replace(day=1)
+
+
+def _export_rows(export_dir, rows):
+    """Ghi thêm vào file gzip của từng tháng (gzip cho phép nối nhiều member)"""
+    by_month = {}
+    for row in rows:
+        by_month.setdefault(_month_of(row['created_at']), []).append(row)
+    for month, month_rows in by_month.items():
+        path = os.path.join(export_dir, f"notifications-{month:%Y-%m}.jsonl.gz")
+        with gzip.open(path, 'at', encoding='utf-8') as handle:
+            for row in month_rows:
+                handle.write(json.dumps({
+                    'id': row['id'],
+                    'user_id': row['user_id'],
+                    'content': row['content'],
+                    'created_at': row['created_at'].isoformat(),
+                }, ensure_ascii=False) + '\n')
+
+
+def archive_notifications(older_than_days=None, chunk_size=1000, pause=0.0,
+                          export_dir=None, dry_run=False, now=None, stdout=None):
+    """
+    Chuyển thông báo đã đọc cũ sang bảng lưu trữ theo từng lô.
+    Trả về số dòng đã xử lý (hoặc sẽ xử lý nếu dry_run).
+    """
+    candidates = archivable_notifications(older_than_days, now)
+    if dry_run:
+        return candidates.count()
+
+    if export_dir:
+        os.makedirs(export_dir, exist_ok=True)
+
+    archived = 0
+    last_id = 0
+    while True:
+        with transaction.atomic():
+            rows = list(
+                candidates.filter(id__gt=last_id)
+                .order_by('id')
+                .select_for_update(skip_locked=True)
+                .values('id', 'user_id', 'content', 'created_at')[:chunk_size]
+            )
+            if not rows:
+                break
+
+            NotificationArchive.objects.bulk_create([
+                NotificationArchive(
+                    original_id=row['id'],
+                    user_id=row['user_id'],
+                    content=row['content'],
+                    created_at=row['created_at'],
+                    month=_month_of(row['created_at']),
+                )
+                for row in rows
+            ])
+            if export_dir:
+                _export_rows(export_dir, rows)
+            # Chỉ xóa thông báo đã đọc nên bộ đếm chưa đọc không thay đổi
+            Notification.objects.filter(id__in=[row['id'] for row in rows], is_read=True).delete()
+
+        last_id = rows[-1]['id']
+        archived += len(rows)
+        if stdout is not None:
+            stdout.write(f"Đã lưu trữ {archived} thông báo (id <= {last_id})")
+        if pause:
+            time.sleep(pause)
+
+    return archived
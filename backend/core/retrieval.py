@@ -0,0 +1,451 @@
+"""
+Tìm kiếm đoạn văn cho chatbot (BM25) trên bài viết đã đăng, hoạt động và kho
+quy định (core/regulations/*.md), không cần dịch vụ tìm kiếm bên ngoài.
+
+- Văn bản được chuẩn hóa như từ khóa chatbot (bỏ dấu, chữ thường) và chia thành
+  các đoạn tối đa PASSAGE_WORDS từ; mỗi đoạn là một tài liệu trong chỉ mục ngược.
+- Posting của mỗi từ là hai array (id đoạn, tần suất) nên chỉ mục nhỏ gọn trong
+  bộ nhớ; đoạn bị xóa/cập nhật được đánh dấu và dọn khi quá nhiều.
+- Signal tăng phiên bản "retrieval" khi bài viết/hoạt động thay đổi (không có cache
+  dùng chung thì phiên bản là id lớn nhất của sync_changes, dòng được ghi cho mọi
+  lần lưu/xóa bài viết và hoạt động); lần tìm kiếm sau đó chỉ đọc các dòng có
+  updated_at từ lần đồng bộ trước (lùi SYNC_OVERLAP để không sót transaction commit
+  muộn) và các dòng đã xóa từ nhật ký sync_changes.
+  Trong lúc một request đang đồng bộ, các request khác dùng chỉ mục hiện có thay
+  vì chờ khóa.
+- Chỉ mục được lưu ra đĩa (CHATBOT_INDEX_PATH) để tiến trình mới khởi động nhanh:
+  ở thread nền, tối đa mỗi CHATBOT_INDEX_SAVE_SECONDS giây một lần, và bởi lệnh
+  rebuild_chatbot_index; không bao giờ trong request tìm kiếm.
+"""
+import glob
+import heapq
+import math
+import os
+import pickle
+import threading
+import time
+from array import array
+from collections import Counter
+from concurrent.futures import ThreadPoolExecutor
+from datetime import timedelta
+
+from django.conf import settings
+
+from .chatbot import fold
+from .models import Activity, Post, SyncChange
+from .conditional import queryset_version
+from .summaries import get_data_version, has_shared_cache
+
+VERSION_NAME = 'retrieval'
+INDEX_FORMAT = 2
+
+# Số từ tối đa của một đoạn văn
+PASSAGE_WORDS = 120
+
+# Tham số BM25
+K1 = 1.2
+B = 0.75
+
+# Từ xuất hiện trong quá nửa số đoạn gần như không phân biệt được tài liệu;
+# bỏ qua khi câu hỏi còn từ khác (giữ chi phí mỗi truy vấn nhỏ)
+COMMON_TERM_RATIO = 0.5
+
+# Dọn posting khi số đoạn đã xóa vượt tỉ lệ này
+COMPACT_RATIO = 0.25
+
+INDEXED_POST_STATUSES = ['Published']
+
+# Đọc lại các dòng có updated_at trong khoảng này trước mốc đồng bộ lần trước:
+# updated_at được gán lúc lưu, transaction có thể commit muộn hơn
+SYNC_OVERLAP = timedelta(minutes=5)
+
+
+def get_index_path():
+    return getattr(settings, 'CHATBOT_INDEX_PATH', os.path.join(settings.BASE_DIR, 'var', 'chatbot_index.pickle'))
+
+
+def get_save_interval():
+    return getattr(settings, 'CHATBOT_INDEX_SAVE_SECONDS', 60)
+
+
+def get_regulations_dir():
+    return getattr(settings, 'CHATBOT_REGULATIONS_DIR', os.path.join(os.path.dirname(__file__), 'regulations'))
+
+
+def tokenize(text):
+    return fold(text).split()
+
+
+def split_passages(text):
+    """Chia theo đoạn văn, đoạn dài hơn PASSAGE_WORDS từ được cắt nhỏ"""
+    passages = []
+    for paragraph in text.replace('\r\n', '\n').split('\n\n'):
+        words = paragraph.split()
+        for start in range(0, len(words), PASSAGE_WORDS):
+            passages.append(' '.join(words[start:start + PASSAGE_WORDS]))
+    return passages
+
+
+class BM25Index:
+    def __init__(self):
+        self.postings = {}       # từ -> (array id đoạn, array tần suất)
+        self.lengths = array('I')
+        self.passages = []       # id đoạn -> (khóa tài liệu, tiêu đề, văn bản, nguồn) hoặc None nếu đã xóa
+        self.documents = {}      # khóa tài liệu -> (dấu phiên bản, [id đoạn])
+        self.frequencies = {}    # từ -> số đoạn còn sống chứa từ
+        self.live_count = 0
+        self.total_length = 0
+        # Mốc đồng bộ: updated_at lớn nhất đã đọc theo loại tài liệu, id nhật ký xóa đã đọc
+        self.synced_at = {}
+        self.deleted_cursor = 0
+        self.files = {}          # file quy định -> mtime đã đánh chỉ mục
+        self._norms = None
+
+    def add_document(self, key, stamp, title, text, source):
+        self.remove_document(key)
+        ids = []
+        for passage in split_passages(text) or ['']:
+            terms = tokenize(f'{title} {passage}')
+            if not terms:
+                continue
+            passage_id = len(self.passages)
+            self.passages.append((key, title, passage, source))
+            self.lengths.append(len(terms))
+            for term, frequency in Counter(terms).items():
+                entry = self.postings.get(term)
+                if entry is None:
+                    entry = self.postings[term] = (array('I'), array('H'))
+                entry[0].append(passage_id)
+                entry[1].append(min(frequency, 65535))
+                self.frequencies[term] = self.frequencies.get(term, 0) + 1
+            self.live_count += 1
+            self.total_length += len(terms)
+            ids.append(passage_id)
+        self.documents[key] = (stamp, ids)
+        self._norms = None
+
+    def remove_document(self, key):
+        stamp_ids = self.documents.pop(key, None)
+        if stamp_ids is None:
+            return
+        for passage_id in stamp_ids[1]:
+            _, title, text, _ = self.passages[passage_id]
+            for term in set(tokenize(f'{title} {text}')):
+                remaining = self.frequencies[term] - 1
+                if remaining:
+                    self.frequencies[term] = remaining
+                else:
+                    del self.frequencies[term]
+            self.passages[passage_id] = None
+            self.live_count -= 1
+            self.total_length -= self.lengths[passage_id]
+        self._norms = None
+
+    def stamp(self, key):
+        entry = self.documents.get(key)
+        return entry[0] if entry else None
+
+    def keys(self, prefix):
+        return [key for key in self.documents if key[0] == prefix]
+
+    def needs_compaction(self):
+        return len(self.passages) and (len(self.passages) - self.live_count) / len(self.passages) > COMPACT_RATIO
+
+    def compact(self):
+        """Đánh số lại các đoạn còn sống, bỏ posting của đoạn đã xóa"""
+        mapping = {}
+        passages, lengths = [], array('I')
+        for old_id, passage in enumerate(self.passages):
+            if passage is not None:
+                mapping[old_id] = len(passages)
+                passages.append(passage)
+                lengths.append(self.lengths[old_id])
+        postings = {}
+        for term, (ids, frequencies) in self.postings.items():
+            new_ids, new_frequencies = array('I'), array('H')
+            for passage_id, frequency in zip(ids, frequencies):
+                new_id = mapping.get(passage_id)
+                if new_id is not None:
+                    new_ids.append(new_id)
+                    new_frequencies.append(frequency)
+            if new_ids:
+                postings[term] = (new_ids, new_frequencies)
+        self.passages, self.lengths, self.postings = passages, lengths, postings
+        self.documents = {
+            key: (stamp, [mapping[passage_id] for passage_id in ids])
+            for key, (stamp, ids) in self.documents.items()
+        }
+        self._norms = None
+
+    def norms(self):
+        # k1 * (1 - b + b * độ dài / độ dài trung bình), tính lại sau mỗi lần chỉ mục thay đổi
+        if self._norms is None:
+            average = self.total_length / self.live_count if self.live_count else 1
+            self._norms = [K1 * (1 - B + B * length / average) for length in self.lengths]
+        return self._norms
+
+    def search(self, query, limit=3):
+        """[(điểm, id đoạn)] của limit đoạn phù hợp nhất"""
+        if not self.live_count:
+            return []
+        # Thống kê chỉ tính các đoạn còn sống, không tính đoạn đã xóa chờ dọn
+        frequencies, total = self.frequencies, self.live_count
+        terms = [term for term in set(tokenize(query)) if term in frequencies]
+        selective = [term for term in terms if frequencies[term] <= total * COMMON_TERM_RATIO]
+        terms = selective or terms
+
+        norms, passages = self.norms(), self.passages
+        scores = {}
+        for term in terms:
+            ids, term_frequencies = self.postings[term]
+            document_frequency = frequencies[term]
+            idf = math.log(1 + (total - document_frequency + 0.5) / (document_frequency + 0.5))
+            for passage_id, frequency in zip(ids, term_frequencies):
+                if passages[passage_id] is None:
+                    continue
+                scores[passage_id] = scores.get(passage_id, 0.0) + idf * frequency * (K1 + 1) / (frequency + norms[passage_id])
+        return heapq.nlargest(limit, ((score, passage_id) for passage_id, score in scores.items()))
+
+    def results(self, query, limit=3):
+        results = []
+        for score, passage_id in self.search(query, limit):
+            (kind, object_id), title, text, source = self.passages[passage_id]
+            results.append({
+                'kind': kind, 'id': object_id, 'title': title, 'text': text,
+                'source': source, 'score': round(score, 4),
+            })
+        return results
+
+
+def post_document(row):
+    return row['title'], row['content'], f"Bài viết: {row['title']}"
+
+
+def activity_document(row):
+    text = '\n\n'.join(part for part in [row['description'], row['location'] or ''] if part)
+    return row['title'], text, f"Hoạt động: {row['title']}"
+
+
+def is_indexed_post(row):
+    return row['status'] in INDEXED_POST_STATUSES
+
+
+# Loại tài liệu -> (model, các cột cần đọc, điều kiện đánh chỉ mục, hàm tạo (tiêu đề, nội dung, nguồn))
+SOURCES = {
+    'post': (Post, ['id', 'title', 'content', 'status', 'updated_at'], is_indexed_post, post_document),
+    'activity': (
+        Activity, ['id', 'title', 'description', 'location', 'updated_at'], lambda row: True, activity_document,
+    ),
+}
+
+
+def sync_deleted(index):
+    """Bỏ các tài liệu đã xóa, đọc từ nhật ký sync_changes sau cursor lần trước"""
+    changes = 0
+    rows = (
+        SyncChange.objects.filter(id__gt=index.deleted_cursor, deleted=True, kind__in=list(SOURCES))
+        .order_by('id').values_list('id', 'kind', 'object_id')
+    )
+    for change_id, kind, object_id in rows.iterator(chunk_size=500):
+        if index.stamp((kind, object_id)) is not None:
+            index.remove_document((kind, object_id))
+            changes += 1
+        index.deleted_cursor = change_id
+    return changes
+
+
+def sync_models(index):
+    """
+    Đánh chỉ mục lại các dòng đổi từ lần đồng bộ trước (theo updated_at), bỏ các
+    dòng đã xóa hoặc không còn được đánh chỉ mục (bài viết về nháp). Trả về số thay đổi
+    """
+    if not index.synced_at:
+        # Chỉ mục mới đọc toàn bộ bảng, các lần xóa trước đó không cần xử lý
+        index.deleted_cursor = SyncChange.objects.order_by('-id').values_list('id', flat=True).first() or 0
+    changes = sync_deleted(index)
+    for kind, (model, fields, include, build) in SOURCES.items():
+        since = index.synced_at.get(kind)
+        rows = model.objects.order_by()
+        if since is not None:
+            rows = rows.filter(updated_at__gte=since - SYNC_OVERLAP)
+        for row in rows.values(*fields).iterator(chunk_size=500):
+            key, stamp = (kind, row['id']), row['updated_at'].timestamp()
+            since = row['updated_at'] if since is None else max(since, row['updated_at'])
+            if not include(row):
+                if index.stamp(key) is not None:
+                    index.remove_document(key)
+                    changes += 1
+            elif index.stamp(key) != stamp:
+                title, text, source = build(row)
+                index.add_document(key, stamp, title, text, source)
+                changes += 1
+        if since is not None:
+            index.synced_at[kind] = since
+    return changes
+
+
+def read_regulations(paths):
+    """[(khóa, dấu phiên bản, tiêu đề, nội dung)]: mỗi mục '## nguồn' của file .md là một tài liệu"""
+    documents = []
+    for path in paths:
+        name, stamp = os.path.basename(path), os.path.getmtime(path)
+        with open(path, encoding='utf-8') as file:
+            sections = file.read().split('\n## ')[1:]
+        for number, section in enumerate(sections):
+            heading, _, body = section.partition('\n')
+            documents.append((('regulation', f'{name}#{number}'), stamp, heading.strip(), body.strip()))
+    return documents
+
+
+def sync_regulations(index):
+    """Chỉ đọc lại các file quy định có mtime đổi"""
+    files = {
+        os.path.basename(path): (path, os.path.getmtime(path))
+        for path in sorted(glob.glob(os.path.join(get_regulations_dir(), '*.md')))
+    }
+    changed = {name for name, (_, stamp) in files.items() if index.files.get(name) != stamp}
+    removed = set(index.files) - set(files)
+    if not changed and not removed:
+        return 0
+
+    changes = 0
+    documents = read_regulations([files[name][0] for name in sorted(changed)])
+    current = {key for key, *_ in documents}
+    for key in index.keys('regulation'):
+        name = key[1].partition('#')[0]
+        if name in removed or (name in changed and key not in current):
+            index.remove_document(key)
+            changes += 1
+    for key, stamp, heading, body in documents:
+        if index.stamp(key) != stamp:
+            index.add_document(key, stamp, heading, body, heading)
+            changes += 1
+    index.files = {name: stamp for name, (_, stamp) in files.items()}
+    return changes
+
+
+def load_index(path):
+    try:
+        with open(path, 'rb') as file:
+            data = pickle.load(file)
+    except (OSError, pickle.UnpicklingError, EOFError, AttributeError):
+        return None
+    if not isinstance(data, dict) or data.get('format') != INDEX_FORMAT:
+        return None
+    return data['index']
+
+
+def save_index(index, path):
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    temporary = f'{path}.{os.getpid()}.tmp'
+    with open(temporary, 'wb') as file:
+        pickle.dump({'format': INDEX_FORMAT, 'index': index}, file, protocol=pickle.HIGHEST_PROTOCOL)
+    os.replace(temporary, path)
+
+
+def refresh(index):
+    changes = sync_models(index) + sync_regulations(index)
+    if index.needs_compaction():
+        index.compact()
+    return changes
+
+
+_lock = threading.Lock()
+_index = None
+_index_path = None
+_index_version = None
+_saver = None
+_save_state = {'pending': False, 'saved_at': 0.0, 'dirty': False}
+
+
+def index_version():
+    """Phiên bản dữ liệu được đánh chỉ mục, giống nhau ở mọi worker"""
+    if has_shared_cache():
+        return get_data_version(VERSION_NAME)
+    return queryset_version(SyncChange.objects.filter(kind__in=list(SOURCES)), 'id')
+
+
+def get_index(version=None):
+    """
+    Chỉ mục của tiến trình: nạp từ đĩa lần đầu, đồng bộ tăng dần khi phiên bản dữ
+    liệu đổi. Nếu request khác đang đồng bộ thì trả về chỉ mục hiện có, không chờ.
+    """
+    global _index, _index_path, _index_version
+    path = get_index_path()
+    if version is None:
+        version = index_version()
+    loaded = _index is not None and _index_path == path
+    if loaded and _index_version == version:
+        return _index
+    if not _lock.acquire(blocking=not loaded):
+        return _index
+    try:
+        if _index is None or _index_path != path:
+            _index, _index_path, _index_version = load_index(path) or BM25Index(), path, None
+            _save_state['dirty'] = False
+        if _index_version != version:
+            if refresh(_index):
+                _save_state['dirty'] = True
+            _index_version = version
+        index = _index
+    finally:
+        _lock.release()
+    schedule_save()
+    return index
+
+
+def persist_index():
+    """Lưu chỉ mục hiện tại ra đĩa. Chỉ giữ khóa trong lúc pickle, không trong lúc ghi file"""
+    with _lock:
+        if _index is None:
+            return False
+        path = _index_path
+        data = pickle.dumps({'format': INDEX_FORMAT, 'index': _index}, protocol=pickle.HIGHEST_PROTOCOL)
+        _save_state['dirty'] = False
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    temporary = f'{path}.{os.getpid()}.tmp'
+    with open(temporary, 'wb') as file:
+        file.write(data)
+    os.replace(temporary, path)
+    return True
+
+
+def _save_in_worker():
+    try:
+        persist_index()
+    finally:
+        _save_state['pending'] = False
+        _save_state['saved_at'] = time.monotonic()
+
+
+def schedule_save():
+    """Lưu chỉ mục ở thread nền nếu có thay đổi, tối đa mỗi CHATBOT_INDEX_SAVE_SECONDS giây (0: không lưu)"""
+    global _saver
+    interval = get_save_interval()
+    state = _save_state
+    if interval <= 0 or not state['dirty'] or state['pending'] or time.monotonic() - state['saved_at'] < interval:
+        return
+    state['pending'] = True
+    if _saver is None:
+        _saver = ThreadPoolExecutor(max_workers=1, thread_name_prefix='chatbot-index-save')
+    _saver.submit(_save_in_worker)
+
+
+def rebuild_index():
+    """Dựng lại toàn bộ chỉ mục và lưu ra đĩa"""
+    global _index, _index_path, _index_version
+    path, index = get_index_path(), BM25Index()
+    refresh(index)
+    save_index(index, path)
+    with _lock:
+        _index, _index_path, _index_version = index, path, None
+        _save_state['dirty'] = False
+    return index
+
+
+def get_top_k():
+    return getattr(settings, 'CHATBOT_TOP_K', 3)
+
+
+def search_passages(query, limit=None):
+    return get_index().results(query, limit or get_top_k())
@@ -0,0 +1,264 @@
+"""
+Chuyển năm học cho đoàn viên: khóa tài khoản đoàn viên đã tốt nghiệp, đổi tên
+khoa/ban và mở các quý đoàn phí mới.
+
+Kế hoạch là một dict (thường đọc từ file JSON):
+
+    {
+        "name": "2026-2027",
+        "deactivate": {"member_since_before": "2022-09-01", "student_id_prefixes": ["22"]},
+        "move_departments": {"Khoa CNTT": "Trường CNTT"},
+        "open_fee_quarters": {"year": 2027, "quarters": [1, 2, 3, 4], "amount": 15000}
+    }
+
+Mỗi bước là một câu UPDATE (hoặc INSERT ... SELECT cho đoàn phí) trên từng khoảng
+id người dùng, mỗi khoảng một transaction ngắn: chỉ các dòng trong khoảng bị khóa,
+không khóa cả bảng core_user. Tiến độ (bước, id cuối) được ghi vào
+rollover_checkpoints trong cùng transaction nên chạy lại cùng tên kế hoạch sẽ
+tiếp tục từ khoảng chưa xong. Đổi nội dung kế hoạch đã có checkpoint (kể cả đã
+hoàn tất) phải dùng restart.
+
+Hai lần chạy không được chồng lên nhau: trên PostgreSQL lần chạy giữ
+pg_advisory_lock tới khi xong; ngoài ra mỗi khoảng khóa dòng checkpoint
+(select_for_update) và dừng nếu tiến độ đã bị tiến trình khác ghi đè.
+"""
+import time
+
+from django.contrib.auth import get_user_model
+from django.db import connection, transaction
+from django.db.models import Case, Count, Max, Min, Q, Value, When
+from django.utils import timezone
+from django.utils.dateparse import parse_date
+
+from .authentication import invalidate_user
+from .models import RolloverCheckpoint, UnionFeeStatus
+from .summaries import bump_data_version
+
+User = get_user_model()
+
+STEPS = ['deactivate', 'move_departments', 'open_fee_quarters']
+
+# Vai trò chịu ảnh hưởng khi khóa tài khoản và mở đoàn phí
+MEMBER_ROLES = ['DOAN_VIEN']
+
+DEFAULT_CHUNK_SIZE = 1000
+
+# Khóa advisory (PostgreSQL) giữ trong suốt một lần chạy
+ROLLOVER_LOCK_ID = 720532
+
+
+class RolloverError(Exception):
+    """Kế hoạch không hợp lệ"""
+
+
+def validate_plan(plan):
+    """Kiểm tra và chuẩn hóa kế hoạch. Raise RolloverError nếu không hợp lệ"""
+    if not plan.get('name'):
+        raise RolloverError('Kế hoạch cần có name')
+    unknown = set(plan) - set(STEPS) - {'name'}
+    if unknown:
+        raise RolloverError(f"Mục không hỗ trợ: {', '.join(sorted(unknown))}")
+
+    deactivate = plan.get('deactivate')
+    if deactivate is not None:
+        criteria = {'member_since_before', 'student_id_prefixes', 'student_ids'}
+        # Không cho phép khóa toàn bộ đoàn viên vì quên điều kiện
+        if not criteria & {key for key, value in deactivate.items() if value}:
+            raise RolloverError(f"deactivate cần ít nhất một điều kiện: {', '.join(sorted(criteria))}")
+        before = deactivate.get('member_since_before')
+        if before and parse_date(str(before)) is None:
+            raise RolloverError('member_since_before phải có dạng YYYY-MM-DD')
+
+    moves = plan.get('move_departments')
+    if moves is not None and (not isinstance(moves, dict) or not all(moves.values())):
+        raise RolloverError('move_departments phải là {khoa cũ: khoa mới}')
+
+    fees = plan.get('open_fee_quarters')
+    if fees is not None:
+        quarters = fees.get('quarters', [1, 2, 3, 4])
+        if not isinstance(fees.get('year'), int) or not quarters or not set(quarters) <= {1, 2, 3, 4}:
+            raise RolloverError('open_fee_quarters cần year (số) và quarters trong 1-4')
+    return plan
+
+
+def graduates_filter(criteria):
+    condition = Q(role__in=MEMBER_ROLES, is_active=True)
+    if criteria.get('member_since_before'):
+        condition &= Q(member_since__lt=parse_date(str(criteria['member_since_before'])))
+    if criteria.get('student_id_prefixes'):
+        prefixes = Q()
+        for prefix in criteria['student_id_prefixes']:
+            prefixes |= Q(student_id__startswith=prefix)
+        condition &= prefixes
+    if criteria.get('student_ids'):
+        condition &= Q(student_id__in=criteria['student_ids'])
+    if criteria.get('departments'):
+        condition &= Q(department__in=criteria['departments'])
+    return condition
+
+
+def fee_members_filter(plan):
+    # Đoàn phí chỉ mở cho đoàn viên còn hoạt động sau bước khóa tài khoản
+    condition = Q(role__in=MEMBER_ROLES, is_active=True)
+    if plan.get('deactivate'):
+        condition &= ~graduates_filter(plan['deactivate'])
+    return condition
+
+
+def fee_defaults(plan):
+    fees = plan['open_fee_quarters']
+    amount = fees.get('amount', UnionFeeStatus._meta.get_field('amount').default)
+    return fees['year'], sorted(set(fees.get('quarters', [1, 2, 3, 4]))), amount
+
+
+def preview(plan):
+    """Số dòng mỗi bước sẽ thay đổi, không sửa dữ liệu"""
+    validate_plan(plan)
+    counts = {}
+    if plan.get('deactivate'):
+        counts['deactivate'] = User.objects.filter(graduates_filter(plan['deactivate'])).count()
+    if plan.get('move_departments'):
+        counts['move_departments'] = dict(
+            User.objects.filter(department__in=list(plan['move_departments']))
+            .values_list('department').annotate(count=Count('id')).order_by('department')
+        )
+    if plan.get('open_fee_quarters'):
+        year, quarters, _ = fee_defaults(plan)
+        members = User.objects.filter(fee_members_filter(plan))
+        existing = UnionFeeStatus.objects.filter(
+            year=year, quarter__in=quarters, user__in=members.values('id')
+        ).count()
+        counts['open_fee_quarters'] = members.count() * len(quarters) - existing
+    return counts
+
+
+def _deactivate_chunk(plan, low, high):
+    ids = list(
+        User.objects.filter(graduates_filter(plan['deactivate']), id__gte=low, id__lt=high)
+        .values_list('id', flat=True)
+    )
+    if ids:
+        User.objects.filter(id__in=ids).update(is_active=False)
+        # UPDATE hàng loạt không phát signal: bỏ cache xác thực để tài khoản bị khóa ngay
+        for user_id in ids:
+            invalidate_user(user_id)
+    return len(ids)
+
+
+def _move_departments_chunk(plan, low, high):
+    moves = plan['move_departments']
+    return User.objects.filter(id__gte=low, id__lt=high, department__in=list(moves)).update(
+        department=Case(*[When(department=old, then=Value(new)) for old, new in moves.items()])
+    )
+
+
+def _open_fee_quarters_chunk(plan, low, high):
+    """INSERT ... SELECT cho từng quý; bỏ qua đoàn viên đã có bản ghi của quý đó"""
+    year, quarters, amount = fee_defaults(plan)
+    members = User.objects.filter(fee_members_filter(plan), id__gte=low, id__lt=high).values('id')
+    members_sql, members_params = members.query.sql_with_params()
+    fee_table = connection.ops.quote_name(UnionFeeStatus._meta.db_table)
+    created = 0
+    with connection.cursor() as cursor:
+        for quarter in quarters:
+            cursor.execute(
+                f"INSERT INTO {fee_table} (user_id, year, quarter, paid, amount) "
+                f"SELECT member.id, %s, %s, %s, %s FROM ({members_sql}) member "
+                f"WHERE NOT EXISTS (SELECT 1 FROM {fee_table} fee "
+                f"WHERE fee.user_id = member.id AND fee.year = %s AND fee.quarter = %s)",
+                [year, quarter, False, amount, *members_params, year, quarter],
+            )
+            created += cursor.rowcount
+    return created
+
+
+STEP_FUNCTIONS = {
+    'deactivate': _deactivate_chunk,
+    'move_departments': _move_departments_chunk,
+    'open_fee_quarters': _open_fee_quarters_chunk,
+}
+
+
+def lock_run():
+    """Giữ khóa cho cả lần chạy trên PostgreSQL. Trả về False nếu tiến trình khác đang chạy"""
+    if connection.vendor != 'postgresql':
+        return True
+    with connection.cursor() as cursor:
+        cursor.execute('SELECT pg_try_advisory_lock(%s)', [ROLLOVER_LOCK_ID])
+        return cursor.fetchone()[0]
+
+
+def unlock_run():
+    if connection.vendor == 'postgresql':
+        with connection.cursor() as cursor:
+            cursor.execute('SELECT pg_advisory_unlock(%s)', [ROLLOVER_LOCK_ID])
+
+
+def _start(plan, restart):
+    """Lấy (hoặc tạo lại khi restart) checkpoint của kế hoạch, khóa dòng trong lúc kiểm tra"""
+    with transaction.atomic():
+        RolloverCheckpoint.objects.get_or_create(name=plan['name'], defaults={'plan': plan})
+        checkpoint = RolloverCheckpoint.objects.select_for_update().get(name=plan['name'])
+        if checkpoint.plan != plan and not restart:
+            state = 'đã hoàn tất' if checkpoint.completed_at is not None else 'đang chạy dở'
+            raise RolloverError(
+                f"Kế hoạch {plan['name']} {state} với nội dung khác; dùng restart để chạy lại từ đầu"
+            )
+        if restart:
+            checkpoint.plan, checkpoint.step, checkpoint.last_id, checkpoint.counts = plan, '', 0, {}
+            checkpoint.started_at, checkpoint.completed_at = timezone.now(), None
+            checkpoint.save()
+    return checkpoint
+
+
+def _lock_checkpoint(checkpoint):
+    """Khóa dòng checkpoint tới hết transaction; dừng nếu tiến trình khác đã ghi tiến độ"""
+    current = RolloverCheckpoint.objects.select_for_update().get(pk=checkpoint.pk)
+    if (current.step, current.last_id, current.completed_at) != (checkpoint.step, checkpoint.last_id, None):
+        raise RolloverError(f"Kế hoạch {checkpoint.name} đang được chạy ở tiến trình khác")
+
+
+def run_rollover(plan, chunk_size=DEFAULT_CHUNK_SIZE, pause=0.0, restart=False, stdout=None):
+    """
+    Áp dụng kế hoạch theo từng khoảng id, tiếp tục từ checkpoint nếu đã chạy dở.
+    Trả về checkpoint (counts: số dòng đã đổi theo từng bước).
+    """
+    validate_plan(plan)
+    if not lock_run():
+        raise RolloverError('Đang có một lần chuyển năm học khác chạy')
+    try:
+        checkpoint = _start(plan, restart)
+        if checkpoint.completed_at is None:
+            _run_steps(checkpoint, plan, chunk_size, pause, stdout)
+    finally:
+        unlock_run()
+    return checkpoint
+
+
+def _run_steps(checkpoint, plan, chunk_size, pause, stdout):
+    bounds = User.objects.aggregate(low=Min('id'), high=Max('id'))
+    low, high = bounds['low'] or 0, (bounds['high'] or 0) + 1
+    steps = [step for step in STEPS if plan.get(step)]
+    start = steps.index(checkpoint.step) if checkpoint.step in steps else 0
+    for position, step in enumerate(steps[start:], start=start):
+        cursor = checkpoint.last_id if step == checkpoint.step else low
+        while cursor < high:
+            upper = cursor + chunk_size
+            with transaction.atomic():
+                _lock_checkpoint(checkpoint)
+                changed = STEP_FUNCTIONS[step](plan, cursor, upper)
+                checkpoint.step, checkpoint.last_id = step, upper
+                checkpoint.counts[step] = checkpoint.counts.get(step, 0) + changed
+                checkpoint.save(update_fields=['step', 'last_id', 'counts', 'updated_at'])
+            cursor = upper
+            if stdout is not None:
+                stdout.write(f"{step}: id < {upper}, đã đổi {checkpoint.counts[step]} dòng")
+            if pause:
+                time.sleep(pause)
+
+    with transaction.atomic():
+        _lock_checkpoint(checkpoint)
+        checkpoint.completed_at, checkpoint.last_id = timezone.now(), 0
+        checkpoint.save(update_fields=['completed_at', 'last_id', 'updated_at'])
+    # Cập nhật hàng loạt không phát signal, tự làm mới danh sách rút gọn đoàn viên
+    bump_data_version('members')
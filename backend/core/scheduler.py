@@ -0,0 +1,176 @@
+"""
+Tác vụ định kỳ: chuyển trạng thái hoạt động theo thời gian, đóng đăng ký khi qua hạn
+và gửi lời nhắc.
+
+Mỗi tác vụ có một dòng trong bảng scheduled_jobs (thời điểm chạy kế tiếp, kết quả
+lần chạy trước). Lệnh `python manage.py run_scheduler` chạy các tác vụ đến hạn;
+dòng tác vụ được khóa (SELECT ... FOR UPDATE SKIP LOCKED) nên có thể chạy nhiều
+worker mà một tác vụ không bị thực thi hai lần.
+"""
+import traceback
+from collections import defaultdict
+from datetime import timedelta
+
+from django.db import transaction
+from django.db.models import Count
+from django.utils import timezone
+
+from .models import Activity, ActivityRegistration, ScheduledJob
+from .notifications import notify_users
+from .calendar_feed import activities_version_name
+from .reminders import send_due_reminders
+from .summaries import bump_data_version
+from .sync import record_changes
+
+# Tên tác vụ -> (hàm nhận thời điểm hiện tại, chu kỳ mặc định tính bằng giây)
+JOBS = {}
+
+# Người tham gia được báo khi hoạt động bắt đầu
+NOTIFY_ON_START_STATUSES = ['Approved']
+
+
+def job(name, interval):
+    def decorator(func):
+        JOBS[name] = (func, interval)
+        return func
+    return decorator
+
+
+def _activities_changed(activity_ids):
+    # UPDATE hàng loạt không phát signal, tự làm mới cache danh sách rút gọn, lịch và feed
+    # đồng bộ. Phiên bản chỉ tới được web worker qua cache dùng chung (REDIS_URL); không
+    # có cache chung thì các danh sách đó không cache theo phiên bản (core/summaries.py)
+    transaction.on_commit(lambda: [bump_data_version(name) for name in ['activities', activities_version_name()]])
+    record_changes('activity', activity_ids)
+
+
+@job('activity_status', 60)
+def update_activity_statuses(now):
+    """
+    Upcoming -> Ongoing khi tới giờ bắt đầu, Upcoming/Ongoing -> Completed khi kết thúc.
+    Mỗi chuyển đổi là một câu UPDATE theo khoảng thời gian trên cột đã đánh index.
+    """
+    with transaction.atomic():
+        completed = list(
+            Activity.objects.select_for_update()
+            .filter(status__in=['Upcoming', 'Ongoing'], end_date__lte=now)
+            .values_list('id', 'title', 'user_id')
+        )
+        started = list(
+            Activity.objects.select_for_update()
+            .filter(status='Upcoming', start_date__lte=now, end_date__gt=now)
+            .values_list('id', 'title')
+        )
+
+        if completed:
+            Activity.objects.filter(id__in=[row[0] for row in completed]).update(
+                status='Completed', registration_open=False, updated_at=now
+            )
+        if started:
+            Activity.objects.filter(id__in=[row[0] for row in started]).update(
+                status='Ongoing', updated_at=now
+            )
+
+        # Báo người tham gia khi hoạt động bắt đầu
+        participants = defaultdict(list)
+        for activity_id, user_id in ActivityRegistration.objects.filter(
+            activity_id__in=[row[0] for row in started], status__in=NOTIFY_ON_START_STATUSES
+        ).values_list('activity_id', 'user_id'):
+            participants[activity_id].append(user_id)
+        for activity_id, title in started:
+            notify_users(participants[activity_id], f"Hoạt động {title} đã bắt đầu.")
+
+        # Nhắc người tạo hoàn tất điểm danh
+        for activity_id, title, creator_id in completed:
+            notify_users([creator_id], f"Hoạt động {title} đã kết thúc. Vui lòng hoàn tất điểm danh.")
+
+        if started or completed:
+            _activities_changed([row[0] for row in completed + started])
+
+    return {'started': len(started), 'completed': len(completed)}
+
+
+@job('close_registrations', 60)
+def close_registrations(now):
+    """Đóng đăng ký của các hoạt động đã qua hạn đăng ký"""
+    with transaction.atomic():
+        closing = list(
+            Activity.objects.select_for_update()
+            .filter(registration_open=True, registration_deadline__lte=now)
+            .values_list('id', 'title', 'user_id')
+        )
+        if not closing:
+            return {'closed': 0}
+
+        activity_ids = [row[0] for row in closing]
+        Activity.objects.filter(id__in=activity_ids).update(registration_open=False, updated_at=now)
+
+        pending = dict(
+            ActivityRegistration.objects.filter(activity_id__in=activity_ids, status='Pending')
+            .values_list('activity_id').annotate(count=Count('id'))
+        )
+        for activity_id, title, creator_id in closing:
+            notify_users(
+                [creator_id],
+                f"Đã đóng đăng ký hoạt động {title}: {pending.get(activity_id, 0)} đăng ký đang chờ duyệt."
+            )
+        _activities_changed(activity_ids)
+
+    return {'closed': len(closing)}
+
+
+@job('activity_reminders', 60)
+def activity_reminders(now):
+    """Gửi lời nhắc trước giờ bắt đầu và trước hạn đăng ký (core/reminders.py)"""
+    return send_due_reminders(now)
+
+
+def ensure_jobs(now):
+    """Tạo dòng cho các tác vụ mới đăng ký trong JOBS"""
+    existing = set(ScheduledJob.objects.filter(name__in=JOBS).values_list('name', flat=True))
+    ScheduledJob.objects.bulk_create([
+        ScheduledJob(name=name, interval_seconds=interval, next_run_at=now)
+        for name, (_, interval) in JOBS.items() if name not in existing
+    ], ignore_conflicts=True)
+
+
+def run_due_jobs(now=None, force=False):
+    """
+    Chạy các tác vụ đến hạn (hoặc tất cả nếu force). Lỗi của một tác vụ được ghi
+    vào last_error và không ảnh hưởng tác vụ khác. Trả về {tên: kết quả}.
+    """
+    now = now or timezone.now()
+    ensure_jobs(now)
+
+    results = {}
+    with transaction.atomic():
+        jobs = ScheduledJob.objects.select_for_update(skip_locked=True).filter(enabled=True, name__in=JOBS)
+        if not force:
+            jobs = jobs.filter(next_run_at__lte=now)
+
+        for scheduled in jobs:
+            func = JOBS[scheduled.name][0]
+            try:
+                with transaction.atomic():
+                    result = func(now)
+                scheduled.last_error = ''
+            except Exception:
+                result = {'error': True}
+                scheduled.last_error = traceback.format_exc()
+            scheduled.last_result = result
+            scheduled.last_run_at = now
+            scheduled.next_run_at = now + timedelta(seconds=scheduled.interval_seconds)
+            scheduled.save(update_fields=['last_result', 'last_error', 'last_run_at', 'next_run_at'])
+            results[scheduled.name] = result
+
+    return results
+
+
+def seconds_until_next_job(now=None):
+    now = now or timezone.now()
+    next_run_at = ScheduledJob.objects.filter(enabled=True, name__in=JOBS).order_by('next_run_at').values_list(
+        'next_run_at', flat=True
+    ).first()
+    if next_run_at is None:
+        return None
+    return max((next_run_at - now).total_seconds(), 0)
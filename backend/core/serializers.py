@@ -1,20 +1,68 @@
 from rest_framework import serializers
 from django.contrib.auth import get_user_model
+from django.utils import timezone
 from .models import (
     Post, Activity, WorkSchedule, 
     ActivityRegistration, Notification, Permission,
-    MemberAchievement, UnionFeeStatus, MemberActivity, MemberStatistics
+    MemberAchievement, UnionFeeStatus, MemberActivity, MemberStatistics, OrganizationUnit
 )
+from .acl import get_grants, post_access
+from .images import variant_urls
 
 User = get_user_model()
 
-class UserSerializer(serializers.ModelSerializer):
+def parse_field_list(value):
+    """'id, status,activity' -> {'id', 'status', 'activity'}; None nếu không truyền"""
+    if value is None:
+        return None
+    return {name.strip() for name in value.split(',') if name.strip()}
+
+def selected_fields(serializer_class, request):
+    """
+    Tập tên trường serializer gốc sẽ trả về theo ?fields= và ?expand= của request.
+    View dùng kết quả này để bỏ các JOIN/truy vấn đếm không cần thiết.
+    """
+    available = set(serializer_class.Meta.fields)
+    if request is None or request.method not in ('GET', 'HEAD'):
+        return available
+
+    fields = parse_field_list(request.query_params.get('fields'))
+    expand = parse_field_list(request.query_params.get('expand'))
+    selected = available if fields is None else fields & available
+    if expand is not None:
+        expandable = set(getattr(serializer_class.Meta, 'expandable_fields', ()))
+        selected = (selected - expandable) | (expand & expandable)
+    return selected
+
+class DynamicFieldsMixin:
+    """
+    Cho phép client chọn các trường trả về (chỉ với GET):
+    - ?fields=id,status,activity : chỉ trả về các trường được liệt kê
+    - ?expand=activity_detail : trong các trường tốn kém (Meta.expandable_fields:
+      object lồng nhau, số đếm) chỉ trả về các trường được liệt kê; expand= rỗng bỏ tất cả
+    Không truyền tham số thì trả về đầy đủ như trước. Chỉ áp dụng cho serializer gốc,
+    serializer lồng bên trong luôn trả về đầy đủ.
+    """
+
+    def is_root_serializer(self):
+        parent = self.parent
+        return parent is None or (isinstance(parent, serializers.ListSerializer) and parent.parent is None)
+
+    def get_fields(self):
+        fields = super().get_fields()
+        if not self.is_root_serializer():
+            return fields
+        selected = selected_fields(self.__class__, self.context.get('request'))
+        return {name: field for name, field in fields.items() if name in selected}
+
+class UserSerializer(DynamicFieldsMixin, serializers.ModelSerializer):
     class Meta:
         model = User
         fields = ['id', 'username', 'email', 'full_name', 'role', 
                   'phone_number', 'address', 'date_joined', 'is_active', 'last_login',
-                  'student_id', 'department', 'position', 'member_since', 'avatar']
-        read_only_fields = ['id', 'date_joined', 'last_login']
+                  'student_id', 'department', 'position', 'member_since', 'avatar', 'unit']
+        # Chuyển đơn vị qua organization-units/<id>/assign-members/
+        read_only_fields = ['id', 'date_joined', 'last_login', 'unit']
 
 class UserCreateSerializer(serializers.ModelSerializer):
     password = serializers.CharField(write_only=True)
@@ -35,15 +83,25 @@ class UserUpdateSerializer(serializers.ModelSerializer):
     class Meta:
         model = User
         fields = ['email', 'full_name', 'phone_number', 'address', 'is_active']
+    
+    def update(self, instance, validated_data):
+        # instance có thể là request.user dựng từ cache xác thực: chỉ ghi các cột được
+        # gửi lên để không ghi đè vai trò/trạng thái cũ lên giá trị mới trong DB
+        for attr, value in validated_data.items():
+            setattr(instance, attr, value)
+        instance.save(update_fields=list(validated_data))
+        return instance
 
-class PostSerializer(serializers.ModelSerializer):
+class PostSerializer(DynamicFieldsMixin, serializers.ModelSerializer):
     author = serializers.SerializerMethodField()
+    access = serializers.SerializerMethodField()
     
     class Meta:
         model = Post
         fields = ['id', 'author', 'title', 'content', 'created_at', 
-                  'updated_at', 'status']
+                  'updated_at', 'status', 'access']
         read_only_fields = ['id', 'created_at', 'updated_at', 'author']
+        expandable_fields = ['author']
     
     def get_author(self, obj):
         return {
@@ -52,35 +110,66 @@ class PostSerializer(serializers.ModelSerializer):
             'full_name': obj.user.full_name
         }
     
+    def get_access(self, obj):
+        # Quyền Read/Write/Delete của người dùng hiện tại, từ quyền đã nạp một lần cho cả trang
+        request = self.context.get('request')
+        if request is None or not request.user.is_authenticated:
+            return []
+        grants = self.context.get('post_grants') or get_grants(request.user)
+        return post_access(request.user, obj, grants)
+    
     def create(self, validated_data):
         validated_data['user'] = self.context['request'].user
         return super().create(validated_data)
 
-class ActivitySerializer(serializers.ModelSerializer):
+class ActivitySerializer(DynamicFieldsMixin, serializers.ModelSerializer):
     user_details = UserSerializer(read_only=True, source='user')
-    participants_count = serializers.IntegerField(read_only=True)
-    current_participants = serializers.IntegerField(read_only=True)
+    participants_count = serializers.SerializerMethodField()
+    current_participants = serializers.SerializerMethodField()
+    image_variants = serializers.SerializerMethodField()
     
     class Meta:
         model = Activity
         fields = ['id', 'title', 'description', 'start_date', 'end_date', 
                  'status', 'user', 'user_details', 'location', 'participants_count', 
-                 'current_participants', 'type', 'max_participants', 'registration_deadline', 'image']
-        read_only_fields = ['id']
+                 'current_participants', 'type', 'max_participants', 'registration_deadline',
+                 'registration_open', 'image', 'image_variants', 'unit']
+        # registration_open do hạn đăng ký quyết định (job close_registrations, update bên dưới)
+        read_only_fields = ['id', 'registration_open']
+        expandable_fields = ['user_details', 'participants_count', 'current_participants']
+    
+    def get_participants_count(self, obj):
+        # Dùng giá trị đã annotate sẵn (xem registrations.with_participant_counts) nếu có
+        count = getattr(obj, 'participants_total', None)
+        return obj.participants_count if count is None else count
+    
+    def get_current_participants(self, obj):
+        return self.get_participants_count(obj)
+    
+    def get_image_variants(self, obj):
+        request = self.context.get('request')
+        return variant_urls(obj, request.build_absolute_uri if request else None)
     
     def to_representation(self, instance):
         representation = super().to_representation(instance)
-        representation['participants_count'] = instance.participants_count
-        representation['current_participants'] = instance.current_participants
-        if not representation['image']:
+        if 'image' in representation and not representation['image']:
             representation['image'] = None
         return representation
     
     def create(self, validated_data):
         validated_data['user'] = self.context['request'].user
         return super().create(validated_data)
+    
+    def update(self, instance, validated_data):
+        # Gia hạn đăng ký (hoặc bỏ hạn) thì mở lại đăng ký đã bị close_registrations đóng
+        if 'registration_deadline' in validated_data:
+            deadline = validated_data['registration_deadline']
+            extended = deadline != instance.registration_deadline and (deadline is None or deadline > timezone.now())
+            if extended and validated_data.get('status', instance.status) != 'Completed':
+                validated_data['registration_open'] = True
+        return super().update(instance, validated_data)
 
-class WorkScheduleSerializer(serializers.ModelSerializer):
+class WorkScheduleSerializer(DynamicFieldsMixin, serializers.ModelSerializer):
     class Meta:
         model = WorkSchedule
         fields = ['id', 'title', 'description', 'schedule_date', 'status']
@@ -90,7 +179,7 @@ class WorkScheduleSerializer(serializers.ModelSerializer):
         validated_data['user'] = self.context['request'].user
         return super().create(validated_data)
 
-class ActivityRegistrationSerializer(serializers.ModelSerializer):
+class ActivityRegistrationSerializer(DynamicFieldsMixin, serializers.ModelSerializer):
     activity_detail = ActivitySerializer(source='activity', read_only=True)
     user_detail = UserSerializer(source='user', read_only=True)
     
@@ -101,18 +190,19 @@ class ActivityRegistrationSerializer(serializers.ModelSerializer):
                   'reason', 'phone_number', 'emergency_contact', 
                   'dietary_requirements', 'additional_info']
         read_only_fields = ['id', 'registration_date', 'activity_detail', 'user_detail', 'attendance_date']
+        expandable_fields = ['activity_detail', 'user_detail']
     
     def create(self, validated_data):
         validated_data['user'] = self.context['request'].user
         return super().create(validated_data)
 
-class NotificationSerializer(serializers.ModelSerializer):
+class NotificationSerializer(DynamicFieldsMixin, serializers.ModelSerializer):
     class Meta:
         model = Notification
         fields = ['id', 'content', 'created_at', 'is_read']
         read_only_fields = ['id', 'created_at']
 
-class PermissionSerializer(serializers.ModelSerializer):
+class PermissionSerializer(DynamicFieldsMixin, serializers.ModelSerializer):
     user_detail = UserSerializer(source='user', read_only=True)
     granted_by_detail = UserSerializer(source='granted_by', read_only=True)
     
@@ -121,14 +211,26 @@ class PermissionSerializer(serializers.ModelSerializer):
         fields = ['id', 'user', 'user_detail', 'post', 'permission_type', 
                   'granted_by', 'granted_by_detail']
         read_only_fields = ['id', 'user_detail', 'granted_by_detail']
+        expandable_fields = ['user_detail', 'granted_by_detail']
 
 # Serializers mới cho sổ đoàn viên
-class MemberAchievementSerializer(serializers.ModelSerializer):
+class MemberAchievementSerializer(DynamicFieldsMixin, serializers.ModelSerializer):
     class Meta:
         model = MemberAchievement
         fields = ['id', 'title', 'description', 'date']
         read_only_fields = ['id']
 
+class OrganizationUnitSerializer(serializers.ModelSerializer):
+    class Meta:
+        model = OrganizationUnit
+        fields = ['id', 'name', 'kind', 'parent', 'path', 'depth']
+        read_only_fields = ['id', 'path', 'depth']
+    
+    def validate_parent(self, parent):
+        if parent is not None and self.instance is not None and parent.is_descendant_of(self.instance):
+            raise serializers.ValidationError('Không thể chuyển đơn vị vào cây con của chính nó')
+        return parent
+
 class UnionFeeQuarterSerializer(serializers.ModelSerializer):
     class Meta:
         model = UnionFeeStatus
@@ -138,7 +240,7 @@ class UnionFeeYearSerializer(serializers.Serializer):
     year = serializers.IntegerField()
     quarters = UnionFeeQuarterSerializer(many=True)
 
-class MemberActivitySerializer(serializers.ModelSerializer):
+class MemberActivitySerializer(DynamicFieldsMixin, serializers.ModelSerializer):
     class Meta:
         model = MemberActivity
         fields = ['id', 'title', 'date', 'type', 'status', 'points']
@@ -148,13 +250,13 @@ class MemberActivitySerializer(serializers.ModelSerializer):
     def get_title(self, obj):
         return obj.activity.title
 
-class MemberStatisticsSerializer(serializers.ModelSerializer):
+class MemberStatisticsSerializer(DynamicFieldsMixin, serializers.ModelSerializer):
     class Meta:
         model = MemberStatistics
         fields = ['total_activities', 'total_points', 'attendance_rate', 'rank']
 
 # Serializer tổng hợp cho API sổ đoàn viên
-class MemberBookSerializer(serializers.ModelSerializer):
+class MemberBookSerializer(DynamicFieldsMixin, serializers.ModelSerializer):
     achievements = MemberAchievementSerializer(many=True, read_only=True)
     activities = serializers.SerializerMethodField()
     union_fee_status = serializers.SerializerMethodField()
@@ -165,6 +267,7 @@ class MemberBookSerializer(serializers.ModelSerializer):
         fields = ['id', 'full_name', 'username', 'student_id', 'department', 
                   'position', 'date_joined', 'member_since', 'avatar',
                   'activities', 'achievements', 'union_fee_status', 'stats']
+        expandable_fields = ['activities', 'achievements', 'union_fee_status', 'stats']
     
     def get_activities(self, obj):
         member_activities = MemberActivity.objects.filter(user=obj)
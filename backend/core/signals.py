@@ -0,0 +1,154 @@
+from django.contrib.auth import get_user_model
+from django.db import transaction
+from django.db.models.signals import post_delete, post_save, pre_save
+from django.dispatch import receiver
+
+from .acl import invalidate_grants
+from .authentication import invalidate_user
+from .calendar_feed import activities_version_name, invalidate_user_feeds
+from .images import needs_variants, queue_variants
+from .chatbot import VERSION_NAME as CHAT_INTENTS_VERSION
+from .models import (
+    Activity, ActivityRegistration, ChatIntent, ChatKeyword, Notification, OrganizationUnit, Permission, Post,
+    WorkSchedule
+)
+from .notifications import adjust_unread_count, hub, serialize_notification
+from .reminders import schedule_reminders
+from .retrieval import VERSION_NAME as RETRIEVAL_VERSION
+from .sync import record_changes
+from .summaries import (
+    ACTIVITY_SUMMARY_FIELDS, MEMBER_SUMMARY_FIELDS, SCHEDULE_SUMMARY_FIELDS, bump_data_version
+)
+
+User = get_user_model()
+
+# Danh sách rút gọn và các cột của nó (kèm cột dùng để lọc)
+SUMMARY_SOURCES = {
+    Activity: ('activities', set(ACTIVITY_SUMMARY_FIELDS) | {'start_date', 'end_date'}),
+    WorkSchedule: ('work_schedules', set(SCHEDULE_SUMMARY_FIELDS) | {'user'}),
+    User: ('members', set(MEMBER_SUMMARY_FIELDS) | {'is_active', 'unit'}),
+}
+
+
+@receiver(post_save, sender=Notification)
+def notification_created(sender, instance, created, **kwargs):
+    # Thông báo tạo bằng bulk_create được xử lý trong notify_users
+    if created and not instance.is_read:
+        adjust_unread_count([instance.user_id], 1)
+        payload = serialize_notification(instance)
+        transaction.on_commit(lambda: hub.publish(instance.user_id, payload))
+
+
+@receiver(post_delete, sender=Notification)
+def notification_deleted(sender, instance, **kwargs):
+    if not instance.is_read:
+        adjust_unread_count([instance.user_id], -1)
+
+
+def summary_changed(sender, instance, update_fields=None, **kwargs):
+    name, fields = SUMMARY_SOURCES[sender]
+    # Bỏ qua các lần lưu không chạm tới cột của danh sách (ví dụ last_login khi đăng nhập)
+    if update_fields and not fields.intersection(update_fields):
+        return
+    transaction.on_commit(lambda: bump_data_version(name))
+
+
+for model in SUMMARY_SOURCES:
+    post_save.connect(summary_changed, sender=model, dispatch_uid=f'summary_save_{model.__name__}')
+    post_delete.connect(summary_changed, sender=model, dispatch_uid=f'summary_delete_{model.__name__}')
+
+
+@receiver(post_save, sender=Activity)
+@receiver(post_delete, sender=Activity)
+def activity_calendar_changed(sender, instance, **kwargs):
+    transaction.on_commit(lambda: bump_data_version(activities_version_name()))
+
+
+@receiver(post_save, sender=ActivityRegistration)
+@receiver(post_delete, sender=ActivityRegistration)
+@receiver(post_save, sender=WorkSchedule)
+@receiver(post_delete, sender=WorkSchedule)
+def user_calendar_changed(sender, instance, **kwargs):
+    invalidate_user_feeds([instance.user_id])
+
+
+@receiver(post_save, sender=User)
+@receiver(post_delete, sender=User)
+def user_account_changed(sender, instance, update_fields=None, **kwargs):
+    # Feed của tài khoản bị khóa/xóa phải ngừng hoạt động
+    if update_fields and 'is_active' not in update_fields:
+        return
+    invalidate_user_feeds([instance.pk])
+
+
+@receiver(post_save, sender=Activity)
+def activity_reminders_changed(sender, instance, update_fields=None, **kwargs):
+    if update_fields and not {'start_date', 'registration_deadline'}.intersection(update_fields):
+        return
+    schedule_reminders(instance)
+
+
+@receiver(post_save, sender=Activity)
+def activity_image_changed(sender, instance, **kwargs):
+    if needs_variants(instance):
+        queue_variants(instance)
+
+
+@receiver(post_save, sender=User)
+@receiver(post_delete, sender=User)
+def user_auth_changed(sender, instance, **kwargs):
+    # Vai trò/trạng thái trong cache xác thực phải được đọc lại
+    invalidate_user(instance.pk)
+
+
+@receiver(pre_save, sender=Permission)
+def permission_reassigned(sender, instance, **kwargs):
+    # Quyền chuyển sang người khác: người dùng cũ cũng phải nạp lại quyền
+    if instance.pk:
+        previous = Permission.objects.filter(pk=instance.pk).values_list('user_id', flat=True).first()
+        if previous is not None and previous != instance.user_id:
+            invalidate_grants([previous])
+
+
+@receiver(post_save, sender=Permission)
+@receiver(post_delete, sender=Permission)
+def permission_changed(sender, instance, **kwargs):
+    invalidate_grants([instance.user_id])
+
+
+@receiver(post_save, sender=OrganizationUnit)
+@receiver(post_delete, sender=OrganizationUnit)
+def organization_unit_changed(sender, instance, **kwargs):
+    # Chuyển đơn vị sang nhánh khác làm đổi danh sách đoàn viên lọc theo ?unit=
+    transaction.on_commit(lambda: bump_data_version('members'))
+
+
+@receiver(post_save, sender=ChatIntent)
+@receiver(post_delete, sender=ChatIntent)
+@receiver(post_save, sender=ChatKeyword)
+@receiver(post_delete, sender=ChatKeyword)
+def chat_intents_changed(sender, instance, **kwargs):
+    # Automaton của chatbot được dựng lại ở lần hỏi tiếp theo
+    transaction.on_commit(lambda: bump_data_version(CHAT_INTENTS_VERSION))
+
+
+
+@receiver(post_save, sender=Post)
+@receiver(post_delete, sender=Post)
+@receiver(post_save, sender=Activity)
+@receiver(post_delete, sender=Activity)
+def retrieval_documents_changed(sender, instance, **kwargs):
+    # Lần tìm kiếm sau chỉ đọc các dòng có updated_at mới và các dòng đã xóa trong sync_changes (core/retrieval.py)
+    transaction.on_commit(lambda: bump_data_version(RETRIEVAL_VERSION))
+
+
+@receiver(post_save, sender=Post)
+@receiver(post_save, sender=Activity)
+def sync_object_saved(sender, instance, **kwargs):
+    record_changes('post' if sender is Post else 'activity', [instance.pk])
+
+
+@receiver(post_delete, sender=Post)
+@receiver(post_delete, sender=Activity)
+def sync_object_deleted(sender, instance, **kwargs):
+    record_changes('post' if sender is Post else 'activity', [instance.pk], deleted=True)
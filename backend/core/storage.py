@@ -0,0 +1,99 @@
+"""
+Lưu trữ media theo địa chỉ nội dung.
+
+File upload được lưu tại <thư mục>/<2 ký tự đầu của hash>/<hash><đuôi file>, với
+hash là SHA-256 của nội dung. Cùng một nội dung chỉ được lưu một lần, và một URL
+không bao giờ đổi nội dung nên được cache vĩnh viễn (Cache-Control: immutable).
+File dạng văn bản (SVG, CSV...) được nén sẵn thành .gz/.br để view media
+(core/media.py) hoặc nginx trả về mà không phải nén lại mỗi request.
+
+MEDIA_STORAGE='s3' chuyển sang S3 hoặc dịch vụ tương thích (MinIO) qua django-storages.
+"""
+import gzip
+import hashlib
+import posixpath
+import re
+
+from django.core.files.base import ContentFile, File
+from django.core.files.storage import FileSystemStorage
+
+from .middleware import brotli
+
+try:
+    from storages.backends.s3boto3 import S3Boto3Storage
+except ImportError:
+    S3Boto3Storage = None
+
+HASH_LENGTH = 32
+
+# <thư mục>/ab/ab12...(32 ký tự hex).<đuôi>
+CONTENT_ADDRESSED_RE = re.compile(r'(?:^|/)([0-9a-f]{2})/(\1[0-9a-f]{%d})(\.[\w]+)?$' % (HASH_LENGTH - 2))
+
+# Đuôi file được nén sẵn (ảnh, video... đã được nén theo định dạng)
+PRECOMPRESSED_EXTENSIONS = {'.svg', '.txt', '.csv', '.json', '.xml', '.html', '.css', '.js'}
+
+
+def content_digest(content):
+    """SHA-256 của một django File, đọc theo chunk"""
+    digest = hashlib.sha256()
+    for chunk in content.chunks():
+        digest.update(chunk)
+    content.seek(0)
+    return digest.hexdigest()[:HASH_LENGTH]
+
+
+def content_addressed_name(name, digest):
+    directory, filename = posixpath.split(name)
+    extension = posixpath.splitext(filename)[1].lower()
+    return posixpath.join(directory, digest[:2], digest + extension)
+
+
+def is_content_addressed(name):
+    return CONTENT_ADDRESSED_RE.search(name) is not None
+
+
+class ContentAddressedMixin:
+    def save(self, name, content, max_length=None):
+        if name is None:
+            name = content.name
+        if not hasattr(content, 'chunks'):
+            content = File(content, name)
+
+        target = content_addressed_name(name.replace('\\', '/'), content_digest(content))
+        # Nội dung đã có: dùng lại file cũ thay vì ghi bản sao
+        if self.exists(target):
+            return target
+
+        saved = super().save(target, content, max_length=max_length)
+        if posixpath.splitext(saved)[1] in PRECOMPRESSED_EXTENSIONS:
+            self._save_precompressed(saved, content)
+        return saved
+
+    def _save_precompressed(self, name, content):
+        content.seek(0)
+        data = b''.join(content.chunks())
+        super().save(name + '.gz', ContentFile(gzip.compress(data, mtime=0)))
+        if brotli is not None:
+            # Chỉ nén một lần nên dùng mức nén cao nhất
+            super().save(name + '.br', ContentFile(brotli.compress(data, quality=11)))
+
+    def delete(self, name):
+        super().delete(name)
+        for suffix in ('.gz', '.br'):
+            if self.exists(name + suffix):
+                super().delete(name + suffix)
+
+
+class ContentAddressedStorage(ContentAddressedMixin, FileSystemStorage):
+    """Lưu trữ cục bộ trong MEDIA_ROOT, phục vụ qua core.media.serve_media"""
+
+
+if S3Boto3Storage is not None:
+    class ContentAddressedS3Storage(ContentAddressedMixin, S3Boto3Storage):
+        """S3/MinIO; cấu hình qua STORAGES['default']['OPTIONS'] (xem settings)"""
+
+        def get_object_parameters(self, name):
+            params = super().get_object_parameters(name)
+            if is_content_addressed(name):
+                params.setdefault('CacheControl', 'public, max-age=31536000, immutable')
+            return params
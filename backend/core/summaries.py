@@ -0,0 +1,144 @@
+"""
+Danh sách rút gọn cho lịch và dropdown.
+
+Mỗi danh sách là một truy vấn values() chỉ lấy vài cột (không tạo model instance,
+không phân trang nhưng giới hạn theo khoảng ngày). Kết quả được cache theo
+"phiên bản" của bảng: signal tăng phiên bản mỗi khi dữ liệu thay đổi nên cache
+cũ tự hết hiệu lực, và ETag cho phép client nhận 304 mà không cần truy vấn DB.
+
+Phiên bản nằm trong Django cache nên chỉ đúng khi cache dùng chung giữa các worker,
+scheduler và lệnh quản trị (REDIS_URL, xem project/settings.py). Với cache riêng
+từng tiến trình (LocMem, DummyCache) không có phiên bản: danh sách luôn được truy
+vấn lại và ETag tính theo nội dung.
+"""
+import hashlib
+import json
+import time
+from datetime import datetime, timedelta
+
+from django.conf import settings
+from django.core.cache import DEFAULT_CACHE_ALIAS, cache, caches
+from django.core.cache.backends.dummy import DummyCache
+from django.core.cache.backends.locmem import LocMemCache
+from django.core.serializers.json import DjangoJSONEncoder
+from django.utils.dateparse import parse_date
+from django.utils.http import quote_etag
+from rest_framework.response import Response
+
+from .conditional import not_modified_response, set_validators
+
+# Khoảng ngày tối đa của một lần gọi (đủ cho lịch dạng quý)
+SUMMARY_MAX_DAYS = 93
+
+# Giới hạn số dòng cho các danh sách không theo ngày (dropdown đoàn viên)
+SUMMARY_MAX_ROWS = 2000
+
+ACTIVITY_SUMMARY_FIELDS = ['id', 'title', 'start_date', 'end_date', 'status', 'type', 'location']
+SCHEDULE_SUMMARY_FIELDS = ['id', 'title', 'schedule_date', 'status']
+MEMBER_SUMMARY_FIELDS = ['id', 'full_name', 'student_id', 'department', 'role']
+
+
+def get_cache_timeout():
+    return getattr(settings, 'SUMMARY_CACHE_TIMEOUT', 300)
+
+
+def parse_window(params):
+    """
+    Đọc ?start=YYYY-MM-DD&end=YYYY-MM-DD (end không bao gồm).
+    Mặc định là tháng hiện tại. Raise ValueError nếu không hợp lệ.
+    """
+    start_param, end_param = params.get('start'), params.get('end')
+    if start_param is None and end_param is None:
+        start = datetime.now().date().replace(day=1)
+        end = (start + timedelta(days=32)).replace(day=1)
+    else:
+        start = parse_date(start_param or '')
+        end = parse_date(end_param or '')
+        if start is None or end is None:
+            raise ValueError('start và end phải có dạng YYYY-MM-DD')
+    if end <= start:
+        raise ValueError('end phải sau start')
+    if (end - start).days > SUMMARY_MAX_DAYS:
+        raise ValueError(f'Khoảng thời gian tối đa {SUMMARY_MAX_DAYS} ngày')
+    return datetime.combine(start, datetime.min.time()), datetime.combine(end, datetime.min.time())
+
+
+def _version_key(name):
+    return f'version:{name}'
+
+
+def has_shared_cache():
+    """Django cache mặc định có dùng chung giữa các tiến trình không"""
+    return not isinstance(caches[DEFAULT_CACHE_ALIAS], (LocMemCache, DummyCache))
+
+
+def get_data_version(name):
+    """
+    Phiên bản dữ liệu dùng làm khóa cache; signal gọi bump_data_version khi dữ liệu đổi.
+    Chỉ dùng được khi has_shared_cache(): với cache riêng từng tiến trình, phiên bản
+    tăng ở worker khác, scheduler hay lệnh quản trị không tới được tiến trình này.
+    """
+    # Giá trị khởi tạo theo thời gian để ETag cũ không trùng sau khi cache bị xóa
+    cache.add(_version_key(name), int(time.time() * 1000), None)
+    return cache.get(_version_key(name))
+
+
+def bump_data_version(name):
+    try:
+        cache.incr(_version_key(name))
+    except ValueError:
+        cache.set(_version_key(name), int(time.time() * 1000), None)
+
+
+def summary_response(request, name, key_parts, build):
+    """
+    Trả về danh sách rút gọn: 304 nếu ETag của client còn hợp lệ,
+    ngược lại lấy từ cache hoặc chạy build() (một truy vấn) rồi cache lại.
+    """
+    if not has_shared_cache():
+        # Không có phiên bản dùng chung: luôn truy vấn, ETag theo nội dung
+        data = build()
+        content = json.dumps(data, cls=DjangoJSONEncoder, sort_keys=True)
+        etag = quote_etag(hashlib.md5(content.encode('utf-8')).hexdigest())
+        response = not_modified_response(request, etag, None)
+        return response or set_validators(Response(data), etag, None)
+
+    key = ':'.join(str(part) for part in [name, get_data_version(name), *key_parts])
+    digest = hashlib.md5(key.encode('utf-8')).hexdigest()
+    etag = quote_etag(digest)
+
+    response = not_modified_response(request, etag, None)
+    if response is not None:
+        return response
+
+    cache_key = f'summary:data:{digest}'
+    data = cache.get(cache_key)
+    if data is None:
+        data = build()
+        cache.set(cache_key, data, get_cache_timeout())
+    return set_validators(Response(data), etag, None)
+
+
+def activity_summary(queryset, start, end):
+    """Hoạt động diễn ra (một phần) trong khoảng [start, end)"""
+    return list(
+        queryset.filter(start_date__lt=end, end_date__gte=start)
+        .order_by('start_date')
+        .values(*ACTIVITY_SUMMARY_FIELDS)
+    )
+
+
+def schedule_summary(queryset, start, end):
+    return list(
+        queryset.filter(schedule_date__gte=start, schedule_date__lt=end)
+        .order_by('schedule_date')
+        .values(*SCHEDULE_SUMMARY_FIELDS)
+    )
+
+
+def member_summary(queryset):
+    return list(
+        queryset.filter(is_active=True)
+        .order_by('full_name')
+        .values(*MEMBER_SUMMARY_FIELDS)[:SUMMARY_MAX_ROWS]
+    )
@@ -0,0 +1,122 @@
+"""
+Feed thay đổi cho đồng bộ tăng dần (chatbox-node và các cache phía sau).
+
+Mỗi lần hoạt động hoặc bài viết được lưu/xóa, dòng của nó trong sync_changes được
+thay bằng một dòng mới; id tự tăng của dòng là con trỏ (cursor). Client gửi
+cursor lần trước và nhận các đối tượng đổi sau đó (dạng rút gọn, không qua
+ActivitySerializer) cùng cursor mới: mỗi lần đồng bộ chỉ là một truy vấn theo
+khóa chính trên sync_changes và một truy vấn values() cho mỗi loại đối tượng.
+
+Dòng nhật ký được ghi trong cùng transaction với thay đổi (không mất khi tiến
+trình dừng ngay sau commit): Post.save/Activity.save mở transaction.atomic bao cả
+signal post_save, xóa thì Django đã chạy post_delete trong transaction của lệnh
+xóa, UPDATE hàng loạt phải gọi record_changes trong transaction.atomic của mình
+(core/scheduler.py). Id tự tăng được cấp lúc INSERT chứ không phải lúc
+commit: nếu hai transaction ghi song song, transaction lấy id lớn hơn có thể
+commit trước và client đọc ở giữa sẽ bỏ qua id nhỏ hơn. Vì vậy trên PostgreSQL
+việc ghi nhật ký giữ pg_advisory_xact_lock tới hết transaction: transaction ghi
+sau phải chờ transaction trước commit, id luôn được cấp theo thứ tự commit
+(SQLite vốn chỉ cho một transaction ghi tại một thời điểm).
+"""
+import hashlib
+import json
+
+from django.db import connection, transaction
+from django.db.models import Max
+
+from .acl import readable_posts
+from .models import Activity, Post, SyncChange
+from .union import UNION_INFO
+
+ACTIVITY_SYNC_FIELDS = [
+    'id', 'title', 'description', 'type', 'status', 'location', 'start_date', 'end_date',
+    'registration_deadline', 'registration_open', 'max_participants', 'updated_at',
+]
+POST_SYNC_FIELDS = ['id', 'title', 'content', 'status', 'updated_at']
+
+# Bài viết ở trạng thái này được báo là đã xóa
+HIDDEN_POST_STATUSES = ['Deleted']
+
+# Khóa advisory của nhật ký đồng bộ (số bất kỳ, không trùng khóa advisory khác)
+SYNC_LOCK_ID = 720531
+
+SYNC_DEFAULT_LIMIT = 500
+SYNC_MAX_LIMIT = 2000
+
+# Thông tin Đoàn trường chỉ đổi khi triển khai bản mới: client gửi lại phiên bản đã có
+UNION_INFO_VERSION = hashlib.sha1(
+    json.dumps(UNION_INFO, sort_keys=True, ensure_ascii=False).encode('utf-8')
+).hexdigest()[:12]
+
+
+def lock_feed():
+    """Các transaction ghi nhật ký lần lượt cho tới khi commit (xem đầu file)"""
+    if connection.vendor == 'postgresql':
+        with connection.cursor() as cursor:
+            cursor.execute('SELECT pg_advisory_xact_lock(%s)', [SYNC_LOCK_ID])
+
+
+def record_changes(kind, ids, deleted=False):
+    """
+    Ghi nhận thay đổi của các đối tượng trong transaction hiện tại. Nơi gọi phải
+    nằm trong transaction.atomic cùng với thay đổi (xem đầu file), nếu không dòng
+    nhật ký chỉ được ghi sau khi thay đổi đã commit
+    """
+    ids = list(ids)
+    if not ids:
+        return
+
+    with transaction.atomic():
+        lock_feed()
+        SyncChange.objects.filter(kind=kind, object_id__in=ids).delete()
+        SyncChange.objects.bulk_create(
+            [SyncChange(kind=kind, object_id=object_id, deleted=deleted) for object_id in ids],
+            batch_size=500,
+        )
+
+
+def parse_cursor(params):
+    """(cursor, limit) từ query params. Raise ValueError nếu không hợp lệ"""
+    cursor = int(params.get('cursor') or 0)
+    limit = int(params.get('limit') or SYNC_DEFAULT_LIMIT)
+    if cursor < 0 or limit <= 0:
+        raise ValueError('cursor và limit phải là số không âm')
+    return cursor, min(limit, SYNC_MAX_LIMIT)
+
+
+def sync_changes(user, cursor, limit, union_version=None):
+    rows = list(
+        SyncChange.objects.filter(id__gt=cursor).order_by('id')
+        .values_list('id', 'kind', 'object_id', 'deleted')[:limit + 1]
+    )
+    has_more = len(rows) > limit
+    rows = rows[:limit]
+
+    changed = {'activity': set(), 'post': set()}
+    deleted = {'activity': set(), 'post': set()}
+    for _, kind, object_id, is_deleted in rows:
+        if kind in changed:
+            (deleted if is_deleted else changed)[kind].add(object_id)
+
+    activities = list(Activity.objects.filter(id__in=changed['activity']).values(*ACTIVITY_SYNC_FIELDS))
+    posts = list(
+        readable_posts(Post.objects.filter(id__in=changed['post']), user)
+        .exclude(status__in=HIDDEN_POST_STATUSES).values(*POST_SYNC_FIELDS)
+    )
+    # Đối tượng đã bị xóa sau khi ghi nhật ký, hoặc bài viết người dùng không được đọc
+    deleted['activity'] |= changed['activity'] - {activity['id'] for activity in activities}
+    deleted['post'] |= changed['post'] - {post['id'] for post in posts}
+
+    result = {
+        'cursor': rows[-1][0] if rows else cursor,
+        'has_more': has_more,
+        # Cursor lớn hơn mọi dòng (DB được khôi phục): client cần đồng bộ lại từ 0
+        'reset': not rows and cursor > 0 and cursor > (SyncChange.objects.aggregate(last=Max('id'))['last'] or 0),
+        'activities': activities,
+        'posts': posts,
+        'deleted': {'activities': sorted(deleted['activity']), 'posts': sorted(deleted['post'])},
+        'union_version': UNION_INFO_VERSION,
+    }
+    if union_version != UNION_INFO_VERSION:
+        result['union_info'] = UNION_INFO
+    return result
@@ -0,0 +1,44 @@
+"""
+Thông tin giới thiệu Đoàn trường (endpoint union_info, feed đồng bộ)
+"""
+
+UNION_INFO = {
+    'name': 'Đoàn Thanh niên Trường Đại học ABC',
+    'description': 'Đoàn TNCS Hồ Chí Minh Trường Đại học ABC là tổ chức chính trị - xã hội của thanh niên trong trường, hoạt động dưới sự lãnh đạo trực tiếp của Đảng ủy nhà trường.',
+    'established': '1975-05-15',
+    'mission': [
+        'Đoàn kết, tập hợp thanh niên trong trường',
+        'Giáo dục lý tưởng cách mạng, đạo đức, lối sống văn hóa cho thanh niên',
+        'Chăm lo và bảo vệ quyền lợi chính đáng của thanh niên',
+        'Phát huy vai trò xung kích, sáng tạo của thanh niên trong học tập, nghiên cứu khoa học'
+    ],
+    'structure': [
+        {
+            'name': 'Ban Chấp hành Đoàn trường',
+            'description': 'Cơ quan lãnh đạo cao nhất của Đoàn trường giữa hai kỳ đại hội'
+        },
+        {
+            'name': 'Ban Thường vụ Đoàn trường',
+            'description': 'Cơ quan thường trực của Ban Chấp hành'
+        },
+        {
+            'name': 'Các ban chuyên môn',
+            'description': 'Gồm Ban Tổ chức, Ban Tuyên giáo, Ban Học tập, Ban Phong trào, Ban Hậu cần'
+        },
+        {
+            'name': 'Liên chi đoàn Khoa',
+            'description': 'Tổ chức đoàn ở cấp khoa'
+        },
+        {
+            'name': 'Chi đoàn',
+            'description': 'Tổ chức cơ sở của Đoàn ở các lớp'
+        }
+    ],
+    'regulations_summary': 'Đoàn viên có trách nhiệm tham gia sinh hoạt chi đoàn định kỳ, đóng đoàn phí đầy đủ, thực hiện nghiêm túc điều lệ Đoàn và các nghị quyết của Đoàn các cấp.',
+    'contact': {
+        'address': 'Phòng A123, Khu A, Trường Đại học ABC',
+        'phone': '0123.456.789',
+        'email': 'doankhoa@example.edu.vn',
+        'facebook': 'facebook.com/doantruongabc'
+    }
+}
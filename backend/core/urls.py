@@ -7,16 +7,19 @@ from rest_framework_simplejwt.views import (
 from .views import (
     UserViewSet, PostViewSet, ActivityViewSet, 
     WorkScheduleViewSet, ActivityRegistrationViewSet, 
-    NotificationViewSet, PermissionViewSet,
+    NotificationViewSet, PermissionViewSet, OrganizationUnitViewSet,
     dashboard_stats, participation_chart, activity_type_chart,
-    chatbot_query, union_info,
+    chatbot_query, chatbot_analytics, union_info, sync_feed,
     MemberAchievementViewSet, UnionFeeStatusViewSet, MemberActivityViewSet,
     member_book, member_activities, member_achievements, member_fee_status,
     get_report_dashboard, get_report_activities, get_report_members,
     get_activities_by_month, get_participation_by_month, get_activity_types,
-    download_report, member_stats
+    download_report, member_stats, fee_arrears_report,
+    activity_checkin, calendar_feed_url, rotate_calendar_feed_url, calendar_feed
 )
 
+from .async_views import notification_stream, dashboard_all, async_widget_view
+
 router = DefaultRouter()
 router.register(r'users', UserViewSet, basename='user')
 router.register(r'posts', PostViewSet, basename='post')
@@ -25,6 +28,7 @@ router.register(r'work-schedules', WorkScheduleViewSet, basename='work-schedule'
 router.register(r'activity-registrations', ActivityRegistrationViewSet, basename='activity-registration')
 router.register(r'notifications', NotificationViewSet, basename='notification')
 router.register(r'permissions', PermissionViewSet, basename='permission')
+router.register(r'organization-units', OrganizationUnitViewSet, basename='organization-unit')
 
 # Đăng ký router cho sổ đoàn viên
 router.register(r'member-achievements', MemberAchievementViewSet, basename='member-achievement')
@@ -32,6 +36,8 @@ router.register(r'union-fee-status', UnionFeeStatusViewSet, basename='union-fee-
 router.register(r'member-activities', MemberActivityViewSet, basename='member-activity')
 
 urlpatterns = [
+    # Đặt trước router để không bị hiểu là notifications/<pk>/
+    path('notifications/stream/', notification_stream, name='notification-stream'),
     path('', include(router.urls)),
     path('token/', TokenObtainPairView.as_view(), name='token_obtain_pair'),
     path('token/refresh/', TokenRefreshView.as_view(), name='token_refresh'),
@@ -42,10 +48,30 @@ urlpatterns = [
     path('dashboard/activity-type-chart/', activity_type_chart, name='activity-type-chart'),
     path('dashboard/member-stats/', member_stats, name='member-stats'),
     
+    # Dashboard async (chạy dưới ASGI): các truy vấn độc lập chạy song song
+    path('dashboard/all/', dashboard_all, name='dashboard-all'),
+    path('async/dashboard/stats/', async_widget_view('stats'), name='async-dashboard-stats'),
+    path('async/dashboard/participation-chart/', async_widget_view('participation_chart'), name='async-participation-chart'),
+    path('async/dashboard/activity-type-chart/', async_widget_view('activity_type_chart'), name='async-activity-type-chart'),
+    path('async/dashboard/member-stats/', async_widget_view('member_stats'), name='async-member-stats'),
+    path('async/reports/dashboard/', async_widget_view('report_dashboard'), name='async-report-dashboard'),
+    
+    # Điểm danh bằng mã QR
+    path('checkin/', activity_checkin, name='activity-checkin'),
+    
+    # Lịch iCalendar cho ứng dụng lịch
+    path('calendar/feed-url/', calendar_feed_url, name='calendar-feed-url'),
+    path('calendar/feed-url/rotate/', rotate_calendar_feed_url, name='calendar-feed-url-rotate'),
+    path('calendar/<str:token>/feed.ics', calendar_feed, name='calendar-feed'),
+    
     # Chatbot and Union Info API endpoints
     path('chatbot/query/', chatbot_query, name='chatbot-query'),
+    path('chatbot/analytics/', chatbot_analytics, name='chatbot-analytics'),
     path('union/info/', union_info, name='union-info'),
     
+    # Đồng bộ tăng dần cho chatbox-node
+    path('sync/changes/', sync_feed, name='sync-changes'),
+    
     # Sổ đoàn viên API
     path('member-book/', member_book, name='member-book'),
     path('member-activities/', member_activities, name='member-activities'),
@@ -60,4 +86,5 @@ urlpatterns = [
     path('reports/participation-by-month/', get_participation_by_month, name='participation-by-month'),
     path('reports/activity-types/', get_activity_types, name='activity-types'),
     path('reports/download/', download_report, name='download-report'),
+    path('reports/fee-arrears/', fee_arrears_report, name='fee-arrears-report'),
 ] 
\ No newline at end of file
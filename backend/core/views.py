@@ -1,26 +1,52 @@
-from django.db.models import Q, Count
+from django.db.models import Q, Count, Min, Prefetch
 from rest_framework import viewsets, filters, status, permissions
-from rest_framework.decorators import action, api_view, permission_classes
+from rest_framework.decorators import action, api_view, permission_classes, authentication_classes
 from rest_framework.response import Response
 from rest_framework_simplejwt.views import TokenObtainPairView
 from django.contrib.auth import get_user_model
 from django.db.models.functions import ExtractMonth
-from datetime import datetime
+from django.http import Http404, StreamingHttpResponse
+from django.shortcuts import get_object_or_404
+from django.urls import reverse
+from django.utils import timezone
+from rest_framework.pagination import PageNumberPagination
+from datetime import datetime, timedelta
 from .models import (
     Post, Activity, WorkSchedule, 
     ActivityRegistration, Notification, Permission,
-    MemberAchievement, UnionFeeStatus, MemberActivity, MemberStatistics
+    MemberAchievement, UnionFeeStatus, MemberActivity, MemberStatistics, OrganizationUnit
 )
 from .serializers import (
     UserSerializer, UserCreateSerializer, UserUpdateSerializer, 
     PostSerializer, ActivitySerializer, WorkScheduleSerializer,
     ActivityRegistrationSerializer, NotificationSerializer, PermissionSerializer,
     MemberAchievementSerializer, UnionFeeQuarterSerializer, MemberActivitySerializer,
-    MemberStatisticsSerializer, MemberBookSerializer
+    MemberStatisticsSerializer, MemberBookSerializer, OrganizationUnitSerializer, selected_fields
 )
 from .permissions import (
     IsAdmin, IsCanBoDoan, IsAdminOrCanBoDoan, 
-    IsDoanVien, IsOwnerOrAdminOrCanBoDoan, IsOwner
+    IsDoanVien, IsOwnerOrAdminOrCanBoDoan, IsOwner, HasPostPermission
+)
+from .acl import get_grants, readable_posts
+from .chat_cache import cached_answer, query_stats
+from .sync import parse_cursor, sync_changes
+from .union import UNION_INFO
+from .member_import import ImportFileError, get_api_max_rows, import_members, limit_rows, read_members
+from .organization import assign_members, branch_stats, in_subtree, subtree_stats
+from .fees import arrears_queryset, arrears_by_department, arrears_summary, stream_arrears_csv
+from .registrations import (
+    bulk_transition, parse_id_list, sync_attendance, with_participant_counts, MAX_SYNC_EVENTS
+)
+from .checkin import CheckinError, check_in, make_checkin_token, get_token_max_age
+from .conditional import ConditionalGetMixin, conditional_view, queryset_version
+from .dashboard import build_widget
+from .calendar_feed import make_feed_token, read_feed_token, rotate_feed_token, feed_window, feed_response
+from .summaries import (
+    summary_response, parse_window, activity_summary, schedule_summary, member_summary
+)
+from .notifications import (
+    notify_users, get_unread_count, adjust_unread_count, reset_unread_count, refresh_unread_count,
+    make_stream_ticket, STREAM_TICKET_MAX_AGE
 )
 
 User = get_user_model()
@@ -42,7 +68,7 @@ class UserViewSet(viewsets.ModelViewSet):
             return [IsAdminOrCanBoDoan()]
         elif self.action in ['update', 'partial_update', 'retrieve']:
             return [IsOwnerOrAdminOrCanBoDoan()]
-        elif self.action in ['list', 'search']:
+        elif self.action in ['list', 'search', 'summary', 'bulk_import']:
             return [IsAdminOrCanBoDoan()]
         elif self.action == 'me':
             return [permissions.IsAuthenticated()]
@@ -62,6 +88,52 @@ class UserViewSet(viewsets.ModelViewSet):
                 return Response(serializer.data)
             return Response(serializer.errors, status=status.HTTP_400_BAD_REQUEST)
     
+    @action(detail=False, methods=['get'], permission_classes=[IsAdminOrCanBoDoan])
+    def summary(self, request):
+        """Danh sách người dùng rút gọn cho dropdown (không phân trang)"""
+        role = request.query_params.get('role', '')
+        department = request.query_params.get('department', '')
+        unit = request.query_params.get('unit', '')
+        
+        def build():
+            queryset = User.objects.all()
+            if role:
+                queryset = queryset.filter(role=role)
+            if department:
+                queryset = queryset.filter(department=department)
+            if unit:
+                # Cả các chi đoàn trực thuộc
+                queryset = in_subtree(queryset, get_unit(unit))
+            return member_summary(queryset)
+        
+        return summary_response(request, 'members', [role, department, unit], build)
+    
+    @action(detail=False, methods=['post'], url_path='import', permission_classes=[IsAdminOrCanBoDoan])
+    def bulk_import(self, request):
+        """
+        Nhập đoàn viên từ file CSV/XLSX (field file), trả về lỗi theo từng dòng.
+        Tối đa MEMBER_IMPORT_API_MAX_ROWS dòng; file lớn hơn dùng lệnh import_members.
+        """
+        upload = request.FILES.get('file')
+        if upload is None:
+            return Response({'detail': 'Vui lòng chọn file .csv hoặc .xlsx.'}, status=status.HTTP_400_BAD_REQUEST)
+        
+        # Cán bộ đoàn không tạo được tài khoản Admin
+        allowed_roles = None if request.user.role == 'ADMIN' else ['DOAN_VIEN', 'CAN_BO_DOAN']
+        dry_run = str(request.data.get('dry_run', '')).lower() in ['1', 'true']
+        try:
+            # Băm mật khẩu tuần tự ngay trong request: không fork process pool từ worker web
+            rows = limit_rows(read_members(upload.file, upload.name), get_api_max_rows())
+            result = import_members(
+                rows, allowed_roles=allowed_roles, default_password=request.data.get('default_password') or None,
+                dry_run=dry_run, workers=1,
+            )
+        except ImportFileError as error:
+            return Response({'detail': str(error)}, status=status.HTTP_400_BAD_REQUEST)
+        return Response(
+            result.as_dict(), status=status.HTTP_201_CREATED if result.created else status.HTTP_200_OK
+        )
+    
     @action(detail=False, methods=['get'], permission_classes=[IsAdminOrCanBoDoan])
     def search(self, request):
         query = request.query_params.get('q', '')
@@ -91,10 +163,22 @@ class PostViewSet(viewsets.ModelViewSet):
     def get_permissions(self):
         if self.action in ['create']:
             return [IsAdminOrCanBoDoan()]
-        elif self.action in ['update', 'partial_update', 'destroy']:
-            return [IsOwnerOrAdminOrCanBoDoan()]
+        elif self.action in ['retrieve', 'update', 'partial_update', 'destroy']:
+            return [permissions.IsAuthenticated(), HasPostPermission()]
         return [permissions.IsAuthenticated()]
     
+    def get_grants(self):
+        # Quyền của người dùng chỉ đọc một lần cho cả request (cả trang bài viết)
+        if not hasattr(self, '_grants'):
+            self._grants = get_grants(self.request.user)
+        return self._grants
+    
+    def get_serializer_context(self):
+        context = super().get_serializer_context()
+        if self.request.user.is_authenticated:
+            context['post_grants'] = self.get_grants()
+        return context
+    
     def get_queryset(self):
         # Lọc bài viết theo trạng thái
         status_filter = self.request.query_params.get('status')
@@ -105,12 +189,18 @@ class PostViewSet(viewsets.ModelViewSet):
         # Ẩn các bài viết đã xóa trừ khi người dùng là Admin
         elif not (self.request.user.is_authenticated and self.request.user.role == 'ADMIN'):
             queryset = queryset.exclude(status='Deleted')
-            
+        
+        # Chỉ các bài viết người dùng được đọc (lọc trong SQL)
+        if self.request.user.is_authenticated:
+            queryset = readable_posts(queryset, self.request.user)
+        
+        if 'author' in selected_fields(PostSerializer, self.request):
+            queryset = queryset.select_related('user')
         return queryset
     
     @action(detail=False, methods=['get'])
     def my_posts(self, request):
-        posts = Post.objects.filter(user=request.user)
+        posts = Post.objects.filter(user=request.user).select_related('user')
         page = self.paginate_queryset(posts)
         if page is not None:
             serializer = self.get_serializer(page, many=True)
@@ -119,7 +209,7 @@ class PostViewSet(viewsets.ModelViewSet):
         serializer = self.get_serializer(posts, many=True)
         return Response(serializer.data)
 
-class ActivityViewSet(viewsets.ModelViewSet):
+class ActivityViewSet(ConditionalGetMixin, viewsets.ModelViewSet):
     queryset = Activity.objects.all()
     serializer_class = ActivitySerializer
     filter_backends = [filters.SearchFilter]
@@ -130,6 +220,13 @@ class ActivityViewSet(viewsets.ModelViewSet):
             return [IsAdminOrCanBoDoan()]
         return [permissions.IsAuthenticated()]
     
+    def get_dependency_versions(self, instance=None):
+        # Số người tham gia được tính từ bảng đăng ký
+        registrations = ActivityRegistration.objects.all()
+        if instance is not None:
+            registrations = registrations.filter(activity=instance)
+        return [queryset_version(registrations)]
+    
     def get_queryset(self):
         # Lọc hoạt động theo trạng thái
         status = self.request.query_params.get('status', None)
@@ -137,7 +234,17 @@ class ActivityViewSet(viewsets.ModelViewSet):
         
         if status:
             queryset = queryset.filter(status=status)
-            
+        
+        unit = self.request.query_params.get('unit')
+        if unit:
+            queryset = in_subtree(queryset, get_unit(unit))
+        
+        # Chỉ JOIN bảng người dùng và đếm người tham gia khi client cần các trường này
+        fields = selected_fields(ActivitySerializer, self.request)
+        if 'user_details' in fields:
+            queryset = queryset.select_related('user')
+        if fields & {'participants_count', 'current_participants'}:
+            queryset = with_participant_counts(queryset)
         return queryset
     
     def create(self, request, *args, **kwargs):
@@ -168,25 +275,33 @@ class ActivityViewSet(viewsets.ModelViewSet):
             
         return Response(serializer.data)
     
+    @action(detail=False, methods=['get'])
+    def summary(self, request):
+        """Hoạt động rút gọn cho lịch: ?start=YYYY-MM-DD&end=YYYY-MM-DD, mặc định tháng hiện tại"""
+        try:
+            start, end = parse_window(request.query_params)
+        except ValueError as e:
+            return Response({'detail': str(e)}, status=status.HTTP_400_BAD_REQUEST)
+        status_filter = request.query_params.get('status', '')
+        
+        def build():
+            queryset = Activity.objects.all()
+            if status_filter:
+                queryset = queryset.filter(status=status_filter)
+            return activity_summary(queryset, start, end)
+        
+        return summary_response(request, 'activities', [start, end, status_filter], build)
+    
     def send_activity_notification(self, activity):
         """Gửi thông báo về hoạt động mới tới tất cả đoàn viên"""
         try:
             # Tìm tất cả đoàn viên
-            doan_vien_users = User.objects.filter(is_active=True)
+            doan_vien_ids = User.objects.filter(is_active=True).values_list('id', flat=True)
             
             notification_content = f"Hoạt động mới: {activity.title}. Diễn ra vào {activity.start_date.strftime('%d/%m/%Y %H:%M')} tại {activity.location}. Hạn đăng ký: {activity.registration_deadline.strftime('%d/%m/%Y %H:%M') if activity.registration_deadline else 'Không có'}."
             
-            # Tạo thông báo cho từng người dùng
-            notifications = []
-            for user in doan_vien_users:
-                notifications.append(Notification(
-                    user=user,
-                    content=notification_content
-                ))
-            
-            # Bulk create để tối ưu hiệu suất
-            if notifications:
-                Notification.objects.bulk_create(notifications)
+            # Bulk create để tối ưu hiệu suất, đồng thời cập nhật bộ đếm chưa đọc
+            notify_users(doan_vien_ids, notification_content)
                 
             return True
         except Exception as e:
@@ -244,6 +359,18 @@ class ActivityViewSet(viewsets.ModelViewSet):
         serializer = ActivityRegistrationSerializer(registrations, many=True)
         return Response(serializer.data)
 
+    @action(detail=True, methods=['get'], url_path='checkin-token', permission_classes=[IsAdminOrCanBoDoan])
+    def checkin_token(self, request, pk=None):
+        """
+        Tạo mã điểm danh (hiển thị dạng QR) cho hoạt động
+        """
+        activity = self.get_object()
+        return Response({
+            'activity': activity.id,
+            'token': make_checkin_token(activity),
+            'expires_in': get_token_max_age()
+        })
+
     @action(detail=True, methods=['get'], permission_classes=[permissions.IsAuthenticated])
     def participants(self, request, pk=None):
         """
@@ -286,6 +413,20 @@ class WorkScheduleViewSet(viewsets.ModelViewSet):
         if self.request.user.role in ['ADMIN', 'CAN_BO_DOAN']:
             return WorkSchedule.objects.all()
         return WorkSchedule.objects.filter(user=self.request.user)
+    
+    @action(detail=False, methods=['get'])
+    def summary(self, request):
+        """Lịch công tác rút gọn cho lịch: ?start=YYYY-MM-DD&end=YYYY-MM-DD, mặc định tháng hiện tại"""
+        try:
+            start, end = parse_window(request.query_params)
+        except ValueError as e:
+            return Response({'detail': str(e)}, status=status.HTTP_400_BAD_REQUEST)
+        # Admin và cán bộ đoàn dùng chung một bản cache
+        scope = 'all' if request.user.role in ['ADMIN', 'CAN_BO_DOAN'] else request.user.id
+        return summary_response(
+            request, 'work_schedules', [scope, start, end],
+            lambda: schedule_summary(self.get_queryset(), start, end)
+        )
 
 class ActivityRegistrationViewSet(viewsets.ModelViewSet):
     queryset = ActivityRegistration.objects.all()
@@ -304,13 +445,23 @@ class ActivityRegistrationViewSet(viewsets.ModelViewSet):
         if self.request.user.role in ['ADMIN', 'CAN_BO_DOAN']:
             activity_id = self.request.query_params.get('activity')
             if activity_id:
-                return ActivityRegistration.objects.filter(activity_id=activity_id)
-            return ActivityRegistration.objects.all()
-        return ActivityRegistration.objects.filter(user=self.request.user)
+                return self.with_related(ActivityRegistration.objects.filter(activity_id=activity_id))
+            return self.with_related(ActivityRegistration.objects.all())
+        return self.with_related(ActivityRegistration.objects.filter(user=self.request.user))
+    
+    def with_related(self, queryset):
+        """Nạp trước người dùng/hoạt động lồng nhau chỉ khi client yêu cầu"""
+        fields = selected_fields(ActivityRegistrationSerializer, self.request)
+        if 'user_detail' in fields:
+            queryset = queryset.select_related('user')
+        if 'activity_detail' in fields:
+            activities = with_participant_counts(Activity.objects.select_related('user'))
+            queryset = queryset.prefetch_related(Prefetch('activity', queryset=activities))
+        return queryset
     
     @action(detail=False, methods=['get'])
     def my_registrations(self, request):
-        registrations = ActivityRegistration.objects.filter(user=request.user)
+        registrations = self.with_related(ActivityRegistration.objects.filter(user=request.user))
         page = self.paginate_queryset(registrations)
         if page is not None:
             serializer = self.get_serializer(page, many=True)
@@ -326,8 +477,60 @@ class ActivityRegistrationViewSet(viewsets.ModelViewSet):
         registration.save()
         serializer = self.get_serializer(registration)
         return Response(serializer.data)
+    
+    def _bulk_transition(self, request, operation):
+        """
+        Nhận registration_ids, hoặc activity + user_ids, và cập nhật trạng thái hàng loạt
+        """
+        activity_id = request.data.get('activity')
+        try:
+            registration_ids = parse_id_list(request.data.get('registration_ids'))
+            user_ids = parse_id_list(request.data.get('user_ids'))
+            if activity_id not in (None, ''):
+                activity_id = int(activity_id)
+        except (TypeError, ValueError) as e:
+            return Response({'detail': str(e) or 'Danh sách id không hợp lệ'}, status=status.HTTP_400_BAD_REQUEST)
+        
+        if registration_ids is None and not (activity_id and user_ids is not None):
+            return Response(
+                {'detail': 'Cần registration_ids hoặc activity và user_ids'},
+                status=status.HTTP_400_BAD_REQUEST
+            )
+        
+        summary = bulk_transition(
+            operation,
+            registration_ids=registration_ids,
+            activity_id=activity_id,
+            user_ids=user_ids
+        )
+        return Response(summary)
+    
+    @action(detail=False, methods=['post'], url_path='bulk-approve', permission_classes=[IsAdminOrCanBoDoan])
+    def bulk_approve(self, request):
+        return self._bulk_transition(request, 'approve')
+    
+    @action(detail=False, methods=['post'], url_path='bulk-reject', permission_classes=[IsAdminOrCanBoDoan])
+    def bulk_reject(self, request):
+        return self._bulk_transition(request, 'reject')
+    
+    @action(detail=False, methods=['post'], url_path='bulk-attend', permission_classes=[IsAdminOrCanBoDoan])
+    def bulk_attend(self, request):
+        return self._bulk_transition(request, 'attend')
+    
+    @action(detail=False, methods=['post'], url_path='sync-attendance', permission_classes=[IsAdminOrCanBoDoan])
+    def sync_attendance(self, request):
+        """
+        Đồng bộ điểm danh ngoại tuyến: {"events": [{"activity", "user", "attended_at"}, ...]}
+        """
+        events = request.data.get('events')
+        if not isinstance(events, list) or not events:
+            return Response({'detail': 'events phải là danh sách không rỗng'}, status=status.HTTP_400_BAD_REQUEST)
+        if len(events) > MAX_SYNC_EVENTS:
+            return Response({'detail': f'Tối đa {MAX_SYNC_EVENTS} sự kiện mỗi lần'}, status=status.HTTP_400_BAD_REQUEST)
+        
+        return Response(sync_attendance(events))
 
-class NotificationViewSet(viewsets.ModelViewSet):
+class NotificationViewSet(ConditionalGetMixin, viewsets.ModelViewSet):
     serializer_class = NotificationSerializer
     
     def get_permissions(self):
@@ -341,18 +544,40 @@ class NotificationViewSet(viewsets.ModelViewSet):
         # Hiển thị thông báo của người dùng đang đăng nhập
         return Notification.objects.filter(user=self.request.user)
     
+    def perform_update(self, serializer):
+        serializer.save()
+        refresh_unread_count(serializer.instance.user_id)
+    
     @action(detail=True, methods=['post', 'patch'])
     def mark_read(self, request, pk=None):
         notification = self.get_object()
-        notification.is_read = True
-        notification.save()
+        if not notification.is_read:
+            updated = Notification.objects.filter(pk=notification.pk, is_read=False).update(
+                is_read=True, updated_at=timezone.now()
+            )
+            if updated:
+                adjust_unread_count([notification.user_id], -1)
+            notification.refresh_from_db()
         serializer = self.get_serializer(notification)
         return Response(serializer.data)
     
     @action(detail=False, methods=['post', 'patch'])
     def mark_all_read(self, request):
-        Notification.objects.filter(user=request.user, is_read=False).update(is_read=True)
+        Notification.objects.filter(user=request.user, is_read=False).update(is_read=True, updated_at=timezone.now())
+        reset_unread_count(request.user.id)
         return Response({'status': 'success'})
+    
+    @action(detail=False, methods=['get'])
+    def unread_count(self, request):
+        return Response({'unread_count': get_unread_count(request.user.id)})
+    
+    @action(detail=False, methods=['post'], url_path='stream-ticket')
+    def stream_ticket(self, request):
+        """Vé dùng một lần để mở luồng thông báo bằng EventSource"""
+        return Response({
+            'ticket': make_stream_ticket(request.user),
+            'expires_in': STREAM_TICKET_MAX_AGE,
+        })
 
 class PermissionViewSet(viewsets.ModelViewSet):
     queryset = Permission.objects.all()
@@ -361,144 +586,145 @@ class PermissionViewSet(viewsets.ModelViewSet):
     def get_permissions(self):
         return [IsAdmin()]
     
+    def get_queryset(self):
+        queryset = Permission.objects.all()
+        fields = selected_fields(PermissionSerializer, self.request)
+        related = [name for name in ('user', 'granted_by') if f'{name}_detail' in fields]
+        if related:
+            queryset = queryset.select_related(*related)
+        return queryset
+    
     def perform_create(self, serializer):
         serializer.save(granted_by=self.request.user)
 
+def get_unit(unit_id):
+    """Đơn vị theo id trong query param; 404 nếu không tồn tại"""
+    try:
+        return get_object_or_404(OrganizationUnit, pk=int(unit_id))
+    except (TypeError, ValueError):
+        raise Http404('Đơn vị không hợp lệ')
+
+class OrganizationUnitViewSet(viewsets.ModelViewSet):
+    """
+    Cây tổ chức Đoàn trường → Liên chi đoàn → Chi đoàn.
+    Danh sách sắp xếp theo path (thứ tự duyệt cây); ?parent=<id> lấy đơn vị con
+    trực tiếp, ?root=<id> lấy cả cây con.
+    """
+    serializer_class = OrganizationUnitSerializer
+    
+    def get_permissions(self):
+        if self.action in ['list', 'retrieve']:
+            return [permissions.IsAuthenticated()]
+        return [IsAdminOrCanBoDoan()]
+    
+    def get_queryset(self):
+        queryset = OrganizationUnit.objects.all()
+        parent = self.request.query_params.get('parent')
+        root = self.request.query_params.get('root')
+        if parent:
+            queryset = queryset.filter(parent_id=parent)
+        if root:
+            queryset = queryset.filter(path__startswith=get_unit(root).path)
+        return queryset
+    
+    def destroy(self, request, *args, **kwargs):
+        unit = self.get_object()
+        if unit.children.exists():
+            return Response({'detail': 'Đơn vị còn đơn vị trực thuộc, hãy chuyển hoặc xóa trước.'},
+                            status=status.HTTP_400_BAD_REQUEST)
+        return super().destroy(request, *args, **kwargs)
+    
+    @action(detail=True, methods=['get'])
+    def stats(self, request, pk=None):
+        """
+        Số liệu cả cây con của đơn vị (đoàn viên, tham gia hoạt động, đoàn phí một quý)
+        và theo từng đơn vị trực thuộc. ?year=&quarter= mặc định là quý hiện tại.
+        """
+        unit = self.get_object()
+        now = datetime.now()
+        try:
+            year = int(request.query_params.get('year', now.year))
+            quarter = int(request.query_params.get('quarter', (now.month - 1) // 3 + 1))
+        except (TypeError, ValueError):
+            return Response({'detail': 'Năm hoặc quý không hợp lệ'}, status=status.HTTP_400_BAD_REQUEST)
+        if quarter not in (1, 2, 3, 4):
+            return Response({'detail': 'Quý phải từ 1 đến 4'}, status=status.HTTP_400_BAD_REQUEST)
+        
+        return Response({
+            'unit': OrganizationUnitSerializer(unit).data,
+            'year': year,
+            'quarter': quarter,
+            'totals': subtree_stats(unit, year, quarter),
+            'children': branch_stats(unit, year, quarter),
+        })
+    
+    @action(detail=True, methods=['post'], url_path='assign-members')
+    def assign(self, request, pk=None):
+        """Chuyển các người dùng trong user_ids vào đơn vị"""
+        unit = self.get_object()
+        try:
+            user_ids = parse_id_list(request.data.get('user_ids'))
+        except (TypeError, ValueError) as error:
+            return Response({'detail': str(error)}, status=status.HTTP_400_BAD_REQUEST)
+        if not user_ids:
+            return Response({'detail': 'Vui lòng chọn người dùng.'}, status=status.HTTP_400_BAD_REQUEST)
+        return Response({'unit': unit.id, 'updated': assign_members(unit, user_ids)})
+
+def next_status_change(now):
+    """Thời điểm sớm nhất sau now mà một hoạt động bắt đầu hoặc kết thúc (đổi trạng thái)"""
+    bounds = Activity.objects.filter(status__in=['Upcoming', 'Ongoing']).aggregate(
+        start=Min('start_date', filter=Q(status='Upcoming', start_date__gt=now)),
+        end=Min('end_date', filter=Q(end_date__gt=now)),
+    )
+    return min((value for value in bounds.values() if value is not None), default=None)
+
+def activity_data_versions(request):
+    """
+    Phiên bản dữ liệu hoạt động/đăng ký dùng cho ETag của các biểu đồ dashboard.
+    Số liệu phụ thuộc thời gian (trạng thái hoạt động, số liệu theo tháng) nên ETag
+    kèm ngày hiện tại và mốc đổi trạng thái kế tiếp: qua mốc đó ETag đổi theo.
+    """
+    now = datetime.now()
+    return [
+        queryset_version(Activity.objects.all()),
+        queryset_version(ActivityRegistration.objects.all()),
+        (now.date(), next_status_change(now)),
+    ]
+
+def dashboard_versions(request):
+    return activity_data_versions(request) + [
+        queryset_version(User.objects.all(), 'date_joined'),
+        queryset_version(Post.objects.all()),
+    ]
+
 @api_view(['GET'])
 @permission_classes([permissions.IsAuthenticated])
+@conditional_view(dashboard_versions)
 def dashboard_stats(request):
     """
     Get dashboard statistics including total users, activities, posts and registrations
     """
-    users_count = User.objects.count()
-    activities_count = Activity.objects.count()
-    posts_count = Post.objects.count()
-    registrations_count = ActivityRegistration.objects.count()
-    
-    # Thống kê về hoạt động
-    upcoming_activities = Activity.objects.filter(status='Upcoming').count()
-    ongoing_activities = Activity.objects.filter(status='Ongoing').count()
-    completed_activities = Activity.objects.filter(status='Completed').count()
-    
-    # Thống kê số người tham gia
-    total_participants = ActivityRegistration.objects.filter(status='Registered').count()
-    
-    # Tính trung bình số người tham gia mỗi hoạt động
-    average_participation = 0
-    if activities_count > 0:
-        average_participation = total_participants / activities_count
-    
-    # Dữ liệu phân loại hoạt động
-    activity_by_type = []
-    for activity_type, _ in Activity.TYPE_CHOICES:
-        type_count = Activity.objects.filter(type=activity_type).count()
-        if type_count > 0:
-            activity_by_type.append({
-                'type': activity_type,
-                'count': type_count
-            })
-    
-    return Response({
-        'totalUsers': users_count,
-        'totalActivities': activities_count,
-        'totalPosts': posts_count,
-        'registrations': registrations_count,
-        
-        # Thêm thống kê về hoạt động
-        'activity_stats': {
-            'total': activities_count,
-            'upcoming': upcoming_activities,
-            'ongoing': ongoing_activities,
-            'completed': completed_activities,
-            'participants': total_participants,
-            'average': round(average_participation, 1),
-            'by_type': activity_by_type
-        }
-    })
+    return Response(build_widget('stats'))
 
 @api_view(['GET'])
 @permission_classes([permissions.IsAuthenticated])
+@conditional_view(activity_data_versions)
 def participation_chart(request):
     """
     Get monthly participation data for dashboard chart
     """
-    current_year = datetime.now().year
-    
-    # Get monthly registrations count for current year
-    monthly_data = ActivityRegistration.objects.filter(
-        registration_date__year=current_year,
-        status='Registered'
-    ).annotate(
-        month=ExtractMonth('registration_date')
-    ).values('month').annotate(
-        count=Count('id')
-    ).order_by('month')
-    
-    # Prepare data for all months
-    month_labels = ['T1', 'T2', 'T3', 'T4', 'T5', 'T6', 'T7', 'T8', 'T9', 'T10', 'T11', 'T12']
-    monthly_counts = [0] * 12
-    
-    for item in monthly_data:
-        month_idx = item['month'] - 1  # Convert 1-based month to 0-based index
-        monthly_counts[month_idx] = item['count']
-    
-    return Response({
-        'labels': month_labels,
-        'datasets': [
-            {
-                'label': 'Số lượng đoàn viên tham gia',
-                'data': monthly_counts,
-                'borderColor': '#3B82F6',
-                'backgroundColor': 'rgba(59, 130, 246, 0.1)',
-                'fill': True
-            }
-        ]
-    })
+    return Response(build_widget('participation_chart'))
 
 @api_view(['GET'])
 @permission_classes([permissions.IsAuthenticated])
+@conditional_view(activity_data_versions)
 def activity_type_chart(request):
     """
     Endpoint to get data for the activity type chart
     Returns activity distribution by type for pie chart visualization
     """
     try:
-        # Count activities by type
-        activities_by_type = Activity.objects.values('type').annotate(count=Count('type')).order_by('-count')
-        
-        # Prepare data for chart
-        labels = []
-        data = []
-        background_colors = [
-            '#4F46E5', '#3B82F6', '#0EA5E9', '#06B6D4', '#14B8A6', 
-            '#10B981', '#34D399', '#6EE7B7', '#F59E0B', '#EF4444'
-        ]
-        
-        for item in activities_by_type:
-            activity_type = item['type'] or 'Không phân loại'
-            labels.append(activity_type)
-            data.append(item['count'])
-        
-        # Make sure we have enough colors (cycle through if needed)
-        while len(background_colors) < len(labels):
-            background_colors.extend(background_colors[:len(labels) - len(background_colors)])
-        
-        # Only use as many colors as we have data points
-        background_colors = background_colors[:len(labels)]
-        
-        chart_data = {
-            'labels': labels,
-            'datasets': [
-                {
-                    'label': 'Số lượng hoạt động theo phân loại',
-                    'data': data,
-                    'backgroundColor': background_colors,
-                    'borderWidth': 1
-                }
-            ]
-        }
-        
-        return Response(chart_data)
+        return Response(build_widget('activity_type_chart'))
     except Exception as e:
         return Response(
             {
@@ -524,52 +750,22 @@ def chatbot_query(request):
             status=status.HTTP_400_BAD_REQUEST
         )
     
-    # Đây là phiên bản mẫu, trong thực tế bạn sẽ tích hợp với LLM và hệ thống RAG
-    # Các câu trả lời mẫu dựa trên từ khóa trong câu hỏi
-    query_lower = query.lower()
-    
-    if any(keyword in query_lower for keyword in ['giờ làm việc', 'thời gian làm việc', 'mở cửa']):
-        response = {
-            'answer': 'Văn phòng Đoàn trường mở cửa từ 8h00 đến 17h00 các ngày trong tuần từ thứ Hai đến thứ Sáu.',
-            'sources': ['Quy định hoạt động của Đoàn trường, Điều 5, Khoản 2']
-        }
-    elif any(keyword in query_lower for keyword in ['đăng ký', 'tham gia', 'hoạt động']):
-        response = {
-            'answer': 'Để đăng ký tham gia hoạt động, bạn có thể vào mục "Hoạt động" trên thanh menu, chọn hoạt động muốn tham gia và nhấn nút "Đăng ký tham gia".',
-            'sources': ['Hướng dẫn sử dụng hệ thống, Phần 3.2']
-        }
-    elif any(keyword in query_lower for keyword in ['điểm rèn luyện', 'đrl', 'điểm']):
-        response = {
-            'answer': 'Điểm rèn luyện từ hoạt động Đoàn sẽ được cập nhật vào cuối mỗi học kỳ. Mỗi hoạt động có mức điểm khác nhau tùy theo quy mô và tính chất. Để xem chi tiết điểm, vui lòng kiểm tra trong mục "Hồ sơ cá nhân".',
-            'sources': ['Quy định về điểm rèn luyện, Điều 7', 'Quy chế đánh giá kết quả rèn luyện, Điều 12']
-        }
-    elif any(keyword in query_lower for keyword in ['xin nghỉ', 'vắng mặt', 'không tham gia']):
-        response = {
-            'answer': 'Để xin nghỉ một hoạt động đã đăng ký, bạn cần gửi đơn xin phép đến cán bộ Đoàn phụ trách hoạt động ít nhất 24 giờ trước khi hoạt động diễn ra. Trong trường hợp khẩn cấp, có thể liên hệ trực tiếp qua số điện thoại của văn phòng Đoàn.',
-            'sources': ['Quy định tham gia hoạt động Đoàn, Điều 8, Khoản 3']
-        }
-    elif any(keyword in query_lower for keyword in ['chứng nhận', 'xác nhận', 'giấy xác nhận']):
-        response = {
-            'answer': 'Để yêu cầu giấy chứng nhận tham gia hoạt động, bạn cần liên hệ văn phòng Đoàn trường với thông tin hoạt động cụ thể và lý do xin cấp giấy chứng nhận. Thời gian xử lý yêu cầu từ 3-5 ngày làm việc.',
-            'sources': ['Quy trình cấp giấy chứng nhận hoạt động, Điều 4']
-        }
-    elif any(keyword in query_lower for keyword in ['chuyển sinh hoạt', 'chuyển đoàn']):
-        response = {
-            'answer': 'Để chuyển sinh hoạt Đoàn, bạn cần làm thủ tục tại văn phòng Đoàn trường với các giấy tờ: (1) Đơn xin chuyển sinh hoạt, (2) Sổ đoàn viên, (3) Giấy giới thiệu của chi đoàn. Thời gian xử lý từ 5-7 ngày làm việc.',
-            'sources': ['Hướng dẫn chuyển sinh hoạt Đoàn, Mục II, Điểm 2']
-        }
-    elif any(keyword in query_lower for keyword in ['đoàn phí', 'nộp tiền', 'đóng phí']):
-        response = {
-            'answer': 'Đoàn phí được đóng mỗi năm một lần vào đầu năm học hoặc theo quy định của chi đoàn. Mức đoàn phí hiện tại là 50.000 đồng/năm. Việc đóng đoàn phí là trách nhiệm bắt buộc của mỗi đoàn viên.',
-            'sources': ['Điều lệ Đoàn TNCS Hồ Chí Minh, Chương III, Điều 5', 'Quy định nội bộ của Đoàn trường']
-        }
-    else:
-        response = {
-            'answer': 'Cảm ơn câu hỏi của bạn. Để có thông tin chi tiết nhất, vui lòng liên hệ văn phòng Đoàn trường qua số điện thoại 0123.456.789 hoặc email doankhoa@example.edu.vn, hoặc kiểm tra mục "Tài liệu - Quy định" trên trang web.',
-            'sources': ['Thông tin liên hệ Đoàn trường']
-        }
-    
-    return Response(response)
+    # Ý định (core/chatbot.py) và đoạn trích (core/retrieval.py), cache theo câu hỏi đã chuẩn hóa
+    answer, hit = cached_answer(query)
+    return Response({**answer, 'cached': hit})
+
+@api_view(['GET'])
+@permission_classes([IsAdminOrCanBoDoan])
+def chatbot_analytics(request):
+    """
+    Thống kê câu hỏi chatbot: tỉ lệ trúng cache và các câu hỏi chưa có sẵn câu trả lời
+    """
+    try:
+        days = int(request.query_params.get('days', 30))
+        limit = min(int(request.query_params.get('limit', 20)), 100)
+    except ValueError:
+        return Response({'error': 'days và limit phải là số nguyên.'}, status=status.HTTP_400_BAD_REQUEST)
+    return Response(query_stats(timezone.now() - timedelta(days=days), limit))
 
 # API lấy dữ liệu về đoàn trường
 @api_view(['GET'])
@@ -578,46 +774,20 @@ def union_info(request):
     """
     Get information about the Students' Union
     """
-    return Response({
-        'name': 'Đoàn Thanh niên Trường Đại học ABC',
-        'description': 'Đoàn TNCS Hồ Chí Minh Trường Đại học ABC là tổ chức chính trị - xã hội của thanh niên trong trường, hoạt động dưới sự lãnh đạo trực tiếp của Đảng ủy nhà trường.',
-        'established': '1975-05-15',
-        'mission': [
-            'Đoàn kết, tập hợp thanh niên trong trường',
-            'Giáo dục lý tưởng cách mạng, đạo đức, lối sống văn hóa cho thanh niên',
-            'Chăm lo và bảo vệ quyền lợi chính đáng của thanh niên',
-            'Phát huy vai trò xung kích, sáng tạo của thanh niên trong học tập, nghiên cứu khoa học'
-        ],
-        'structure': [
-            {
-                'name': 'Ban Chấp hành Đoàn trường',
-                'description': 'Cơ quan lãnh đạo cao nhất của Đoàn trường giữa hai kỳ đại hội'
-            },
-            {
-                'name': 'Ban Thường vụ Đoàn trường',
-                'description': 'Cơ quan thường trực của Ban Chấp hành'
-            },
-            {
-                'name': 'Các ban chuyên môn',
-                'description': 'Gồm Ban Tổ chức, Ban Tuyên giáo, Ban Học tập, Ban Phong trào, Ban Hậu cần'
-            },
-            {
-                'name': 'Liên chi đoàn Khoa',
-                'description': 'Tổ chức đoàn ở cấp khoa'
-            },
-            {
-                'name': 'Chi đoàn',
-                'description': 'Tổ chức cơ sở của Đoàn ở các lớp'
-            }
-        ],
-        'regulations_summary': 'Đoàn viên có trách nhiệm tham gia sinh hoạt chi đoàn định kỳ, đóng đoàn phí đầy đủ, thực hiện nghiêm túc điều lệ Đoàn và các nghị quyết của Đoàn các cấp.',
-        'contact': {
-            'address': 'Phòng A123, Khu A, Trường Đại học ABC',
-            'phone': '0123.456.789',
-            'email': 'doankhoa@example.edu.vn',
-            'facebook': 'facebook.com/doantruongabc'
-        }
-    })
+    return Response(UNION_INFO)
+
+# Feed thay đổi cho đồng bộ tăng dần (xem core/sync.py)
+@api_view(['GET'])
+@permission_classes([permissions.IsAuthenticated])
+def sync_feed(request):
+    """
+    Hoạt động, bài viết và thông tin Đoàn trường thay đổi sau ?cursor=
+    """
+    try:
+        cursor, limit = parse_cursor(request.query_params)
+    except ValueError:
+        return Response({'error': 'cursor và limit phải là số nguyên không âm.'}, status=status.HTTP_400_BAD_REQUEST)
+    return Response(sync_changes(request.user, cursor, limit, request.query_params.get('union_version')))
 
 # Viewset cho thành tích đoàn viên
 class MemberAchievementViewSet(viewsets.ModelViewSet):
@@ -785,29 +955,7 @@ def get_report_dashboard(request):
     """
     Lấy dữ liệu tổng quan cho báo cáo dashboard
     """
-    # Thống kê số lượng người dùng theo vai trò
-    user_stats = User.objects.values('role').annotate(count=Count('id'))
-    
-    # Thống kê hoạt động
-    activity_stats = {
-        'total': Activity.objects.count(),
-        'completed': Activity.objects.filter(status='Completed').count(),
-        'ongoing': Activity.objects.filter(status='Published').count(),
-        'upcoming': Activity.objects.filter(status='Draft').count()
-    }
-    
-    # Thống kê đăng ký hoạt động
-    registration_stats = {
-        'total': ActivityRegistration.objects.count(),
-        'completed': ActivityRegistration.objects.filter(status='Completed').count(),
-        'cancelled': ActivityRegistration.objects.filter(status='Cancelled').count()
-    }
-    
-    return Response({
-        'user_stats': user_stats,
-        'activity_stats': activity_stats,
-        'registration_stats': registration_stats
-    })
+    return Response(build_widget('report_dashboard'))
 
 @api_view(['GET'])
 @permission_classes([IsAdminOrCanBoDoan])
@@ -935,47 +1083,109 @@ def member_stats(request):
     """
     Get member statistics for the members management page
     """
-    # Tổng số thành viên và trạng thái hoạt động
-    total_members = User.objects.filter(role='DOAN_VIEN').count()
-    active_members = User.objects.filter(role='DOAN_VIEN', is_active=True).count()
-    inactive_members = total_members - active_members
+    return Response(build_widget('member_stats'))
+
+@api_view(['GET'])
+@permission_classes([IsAdminOrCanBoDoan])
+def fee_arrears_report(request):
+    """
+    Báo cáo đoàn viên chưa đóng đoàn phí theo quý.
+    Dùng ?export=csv để tải toàn bộ danh sách dưới dạng CSV.
+    """
+    now = datetime.now()
+    try:
+        year = int(request.query_params.get('year', now.year))
+        quarter = int(request.query_params.get('quarter', (now.month - 1) // 3 + 1))
+    except (TypeError, ValueError):
+        return Response({'error': 'Năm hoặc quý không hợp lệ'}, status=status.HTTP_400_BAD_REQUEST)
+    
+    if quarter not in (1, 2, 3, 4):
+        return Response({'error': 'Quý phải từ 1 đến 4'}, status=status.HTTP_400_BAD_REQUEST)
+    
+    department = request.query_params.get('department')
+    unit = request.query_params.get('unit')
+    queryset = arrears_queryset(year, quarter, department, get_unit(unit) if unit else None)
+    
+    if request.query_params.get('export') == 'csv':
+        response = StreamingHttpResponse(
+            stream_arrears_csv(queryset, year, quarter),
+            content_type='text/csv; charset=utf-8'
+        )
+        response['Content-Disposition'] = f'attachment; filename="no-doan-phi-{year}-Q{quarter}.csv"'
+        return response
     
-    # Thành viên mới trong tháng hiện tại
-    current_month = datetime.now().month
-    current_year = datetime.now().year
-    new_members_this_month = User.objects.filter(
-        role='DOAN_VIEN',
-        date_joined__month=current_month,
-        date_joined__year=current_year
-    ).count()
-    
-    # Thống kê theo vai trò
-    members_by_role = []
-    for role, role_name in User.ROLE_CHOICES:
-        role_count = User.objects.filter(role=role).count()
-        members_by_role.append({
-            'role': role,
-            'count': role_count
-        })
+    paginator = PageNumberPagination()
+    page = paginator.paginate_queryset(
+        queryset.values('id', 'username', 'full_name', 'student_id', 'department', 'outstanding'),
+        request
+    )
     
-    # Thống kê theo khoa/ban
-    departments = User.objects.filter(role='DOAN_VIEN').values('department').annotate(
-        count=Count('id')
-    ).order_by('department')
+    return Response({
+        'year': year,
+        'quarter': quarter,
+        'summary': arrears_summary(queryset),
+        'by_department': list(arrears_by_department(queryset)),
+        'count': paginator.page.paginator.count,
+        'next': paginator.get_next_link(),
+        'previous': paginator.get_previous_link(),
+        'results': page
+    })
+
+@api_view(['POST'])
+@permission_classes([permissions.IsAuthenticated])
+def activity_checkin(request):
+    """
+    Đoàn viên tự điểm danh bằng cách quét mã QR của hoạt động
+    """
+    token = request.data.get('token')
+    if not token:
+        return Response({'detail': 'Thiếu mã điểm danh', 'code': 'invalid'}, status=status.HTTP_400_BAD_REQUEST)
+    
+    try:
+        result = check_in(token, request.user)
+    except CheckinError as e:
+        return Response({'detail': e.message, 'code': e.code}, status=status.HTTP_400_BAD_REQUEST)
     
-    members_by_department = []
-    for dept in departments:
-        if dept['department']:  # Chỉ đếm nếu department không phải None hoặc trống
-            members_by_department.append({
-                'department': dept['department'],
-                'count': dept['count']
-            })
+    return Response(result)
+
+def feed_url_payload(request, token):
+    url = request.build_absolute_uri(reverse('calendar-feed', args=[token]))
+    return {
+        'url': url,
+        'webcal_url': 'webcal://' + url.split('://', 1)[1],
+    }
+
+@api_view(['GET'])
+@permission_classes([permissions.IsAuthenticated])
+def calendar_feed_url(request):
+    """
+    Địa chỉ lịch iCalendar của người dùng để thêm vào ứng dụng lịch trên điện thoại
+    """
+    return Response(feed_url_payload(request, make_feed_token(request.user)))
+
+@api_view(['POST'])
+@permission_classes([permissions.IsAuthenticated])
+def rotate_calendar_feed_url(request):
+    """
+    Thu hồi địa chỉ lịch đã phát (ví dụ khi lỡ chia sẻ) và trả về địa chỉ mới
+    """
+    return Response(feed_url_payload(request, rotate_feed_token(request.user)))
+
+@api_view(['GET'])
+@authentication_classes([])
+@permission_classes([permissions.AllowAny])
+def calendar_feed(request, token):
+    """
+    Lịch iCalendar: hoạt động đã đăng ký/tạo và lịch công tác của người dùng.
+    Xác thực bằng token trong URL; hỗ trợ ?start=YYYY-MM-DD&end=YYYY-MM-DD
+    """
+    user_id = read_feed_token(token)
+    if user_id is None:
+        return Response({'detail': 'Not found.'}, status=status.HTTP_404_NOT_FOUND)
     
-    return Response({
-        'totalMembers': total_members,
-        'activeMembers': active_members,
-        'inactiveMembers': inactive_members,
-        'newMembersThisMonth': new_members_this_month,
-        'membersByRole': members_by_role,
-        'membersByDepartment': members_by_department
-    }) 
\ No newline at end of file
+    try:
+        start, end = feed_window(request.query_params)
+    except ValueError as e:
+        return Response({'detail': str(e)}, status=status.HTTP_400_BAD_REQUEST)
+    
+    return feed_response(request, user_id, start, end)
@@ -34,13 +34,17 @@ INSTALLED_APPS = [
 # Cấu hình REST Framework
 REST_FRAMEWORK = {
     'DEFAULT_AUTHENTICATION_CLASSES': (
-        'rest_framework_simplejwt.authentication.JWTAuthentication',
+        'core.authentication.CachedJWTAuthentication',
     ),
     'DEFAULT_PERMISSION_CLASSES': [
         'rest_framework.permissions.IsAuthenticated',
     ],
     'DEFAULT_PAGINATION_CLASS': 'rest_framework.pagination.PageNumberPagination',
     'PAGE_SIZE': 10,
+    'DEFAULT_RENDERER_CLASSES': [
+        'core.renderers.ORJSONRenderer',
+        'rest_framework.renderers.BrowsableAPIRenderer',
+    ],
     'DEFAULT_SCHEMA_CLASS': 'rest_framework.schemas.coreapi.AutoSchema'
 
 }
@@ -95,6 +99,7 @@ AUTH_USER_MODEL = 'core.User'
 MIDDLEWARE = [
     'corsheaders.middleware.CorsMiddleware',
     'django.middleware.security.SecurityMiddleware',
+    'core.middleware.CompressionMiddleware',  # Nén gzip/brotli, đặt trước các middleware dùng nội dung response
     'django.contrib.sessions.middleware.SessionMiddleware',
     'django.middleware.common.CommonMiddleware',
     'django.middleware.csrf.CsrfViewMiddleware',
@@ -135,8 +140,103 @@ STATIC_URL = '/static/'
 STATIC_ROOT = os.path.join(BASE_DIR, 'staticfiles')
 STATICFILES_DIRS = [os.path.join(BASE_DIR, 'static')]
 
+# Cấu hình Media files (ảnh upload)
+MEDIA_URL = '/media/'
+MEDIA_ROOT = config('MEDIA_ROOT', default=os.path.join(BASE_DIR, 'media'))
+
+# Lưu trữ media theo hash nội dung (core/storage.py): 'local' hoặc 's3' (S3/MinIO,
+# cần cài django-storages và boto3)
+MEDIA_STORAGE = config('MEDIA_STORAGE', default='local')
+STORAGES = {
+    'default': {'BACKEND': 'core.storage.ContentAddressedStorage'},
+    'staticfiles': {'BACKEND': 'django.contrib.staticfiles.storage.StaticFilesStorage'},
+}
+if MEDIA_STORAGE == 's3':
+    STORAGES['default'] = {
+        'BACKEND': 'core.storage.ContentAddressedS3Storage',
+        'OPTIONS': {
+            'bucket_name': config('MEDIA_S3_BUCKET', default='media'),
+            'endpoint_url': config('MEDIA_S3_ENDPOINT_URL', default=None),
+            'access_key': config('MEDIA_S3_ACCESS_KEY', default=None),
+            'secret_key': config('MEDIA_S3_SECRET_KEY', default=None),
+            'custom_domain': config('MEDIA_S3_CUSTOM_DOMAIN', default=None),
+            'querystring_auth': False,
+            'file_overwrite': False,
+        },
+    }
+
+# Đặt tiền tố location internal của nginx (ví dụ /protected-media/) để nginx gửi
+# file media thay cho Django (X-Accel-Redirect)
+MEDIA_ACCEL_REDIRECT_PREFIX = config('MEDIA_ACCEL_REDIRECT_PREFIX', default='')
+
 # Đảm bảo thư mục static tồn tại
 if not os.path.exists(os.path.join(BASE_DIR, 'static')):
     os.makedirs(os.path.join(BASE_DIR, 'static'))
 
-# ... existing code ... 
\ No newline at end of file
+# ... existing code ...
+
+# Cấu hình điểm danh bằng mã QR (thời hạn token, tính bằng giây)
+CHECKIN_TOKEN_MAX_AGE = config('CHECKIN_TOKEN_MAX_AGE', default=600, cast=int)
+
+# Thời hạn giữ thông báo đã đọc trong bảng chính (ngày), xem lệnh archive_notifications
+NOTIFICATION_RETENTION_DAYS = config('NOTIFICATION_RETENTION_DAYS', default=180, cast=int)
+
+# Chạy song song các truy vấn của dashboard async (mỗi truy vấn một kết nối DB)
+DASHBOARD_PARALLEL_QUERIES = config('DASHBOARD_PARALLEL_QUERIES', default=True, cast=bool)
+
+# Cấu hình nén response: chỉ nén response lớn hơn ngưỡng (byte)
+COMPRESSION_MIN_SIZE = config('COMPRESSION_MIN_SIZE', default=1024, cast=int)
+COMPRESSION_BROTLI_QUALITY = config('COMPRESSION_BROTLI_QUALITY', default=5, cast=int)
+
+# Cache dùng chung giữa các worker, scheduler và lệnh quản trị: phiên bản dữ liệu,
+# danh sách rút gọn, feed lịch, quyền bài viết... (ví dụ redis://redis:6379/0).
+# Không đặt REDIS_URL thì Django dùng LocMem riêng từng tiến trình và các cache theo
+# phiên bản tự tắt (core/summaries.py)
+REDIS_URL = config('REDIS_URL', default='')
+if REDIS_URL:
+    CACHES = {
+        'default': {
+            'BACKEND': 'django.core.cache.backends.redis.RedisCache',
+            'LOCATION': REDIS_URL,
+        }
+    }
+
+# Thời gian cache danh sách rút gọn (lịch, dropdown), tính bằng giây
+SUMMARY_CACHE_TIMEOUT = config('SUMMARY_CACHE_TIMEOUT', default=300, cast=int)
+
+# Thời gian cache lịch iCalendar của người dùng, tính bằng giây (feed được làm mới khi dữ liệu thay đổi)
+CALENDAR_FEED_CACHE_TIMEOUT = config('CALENDAR_FEED_CACHE_TIMEOUT', default=3600, cast=int)
+
+# Cấu hình nhắc lịch: gửi trước giờ bắt đầu và trước hạn đăng ký (giờ)
+REMINDER_BEFORE_START_HOURS = config('REMINDER_BEFORE_START_HOURS', default=24, cast=int)
+REMINDER_BEFORE_DEADLINE_HOURS = config('REMINDER_BEFORE_DEADLINE_HOURS', default=24, cast=int)
+
+# Số thread tạo ảnh thu nhỏ cho hoạt động (0: xử lý ngay trong request)
+IMAGE_PROCESSING_WORKERS = config('IMAGE_PROCESSING_WORKERS', default=2, cast=int)
+
+# Cache người dùng khi xác thực JWT (giây, 0 để tắt) và số người dùng tối đa mỗi tiến trình;
+# chỉ có hiệu lực khi có cache dùng chung (REDIS_URL)
+AUTH_USER_CACHE_TTL = config('AUTH_USER_CACHE_TTL', default=60, cast=int)
+AUTH_USER_CACHE_SIZE = config('AUTH_USER_CACHE_SIZE', default=1000, cast=int)
+
+# Thời gian cache quyền theo bài viết của người dùng (giây), cache được làm mới khi bảng permissions thay đổi.
+# Chỉ có tác dụng khi có REDIS_URL, không có cache dùng chung thì quyền luôn đọc từ database
+ACL_CACHE_TIMEOUT = config('ACL_CACHE_TIMEOUT', default=300, cast=int)
+
+# Chỉ mục tìm kiếm của chatbot: file lưu chỉ mục, khoảng cách tối thiểu giữa hai lần lưu
+# ở thread nền (giây, 0 để chỉ lưu bằng lệnh rebuild_chatbot_index), thư mục quy định (*.md) và số đoạn trả về
+CHATBOT_INDEX_PATH = config('CHATBOT_INDEX_PATH', default=os.path.join(BASE_DIR, 'var', 'chatbot_index.pickle'))
+CHATBOT_INDEX_SAVE_SECONDS = config('CHATBOT_INDEX_SAVE_SECONDS', default=60, cast=int)
+CHATBOT_REGULATIONS_DIR = config('CHATBOT_REGULATIONS_DIR', default=os.path.join(BASE_DIR, 'core', 'regulations'))
+CHATBOT_TOP_K = config('CHATBOT_TOP_K', default=3, cast=int)
+
+# Cache câu trả lời chatbot theo câu hỏi đã chuẩn hóa (giây, 0 để tắt) và ghi nhật ký câu hỏi theo lô
+CHATBOT_ANSWER_CACHE_TIMEOUT = config('CHATBOT_ANSWER_CACHE_TIMEOUT', default=3600, cast=int)
+CHATBOT_LOG_BATCH_SIZE = config('CHATBOT_LOG_BATCH_SIZE', default=50, cast=int)
+CHATBOT_LOG_FLUSH_SECONDS = config('CHATBOT_LOG_FLUSH_SECONDS', default=30, cast=int)
+
+# Nhập đoàn viên hàng loạt: số dòng mỗi lô bulk_create và số tiến trình băm mật khẩu (mặc định bằng số CPU, 1 để băm tuần tự)
+MEMBER_IMPORT_CHUNK_SIZE = config('MEMBER_IMPORT_CHUNK_SIZE', default=1000, cast=int)
+MEMBER_IMPORT_WORKERS = config('MEMBER_IMPORT_WORKERS', default=os.cpu_count() or 1, cast=int)
+# Upload qua API băm mật khẩu tuần tự trong request nên giới hạn số dòng; file lớn hơn dùng lệnh import_members
+MEMBER_IMPORT_API_MAX_ROWS = config('MEMBER_IMPORT_API_MAX_ROWS', default=100, cast=int)
@@ -1,9 +1,12 @@
 from django.contrib import admin
-from django.urls import path, include
+from django.conf import settings
+from django.contrib.staticfiles.urls import staticfiles_urlpatterns
+from django.urls import path, include, re_path
 from rest_framework import permissions
 from drf_yasg.views import get_schema_view
 from drf_yasg import openapi
 from django.views.generic import TemplateView
+from core.media import serve_media
 
 schema_view = get_schema_view(
     openapi.Info(
@@ -24,4 +27,8 @@ urlpatterns = [
     path('api/', include('activity.urls')),
     path('swagger/', schema_view.with_ui('swagger', cache_timeout=0), name='schema-swagger-ui'),
     path('redoc/', schema_view.with_ui('redoc', cache_timeout=0), name='schema-redoc'),
-] 
\ No newline at end of file
+    re_path(r'^%s(?P<path>.+)$' % settings.MEDIA_URL.lstrip('/'), serve_media, name='media'),
+]
+
+# uvicorn không tự phục vụ static như runserver; khi DEBUG vẫn xem được trang admin, swagger
+urlpatterns += staticfiles_urlpatterns()
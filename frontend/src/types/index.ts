@@ -95,12 +95,27 @@ export interface Activity {
   current_participants: number;
   status: ActivityStatus;
   image?: string;
+  image_variants?: ActivityImageVariants | null;
   created_at: string;
   updated_at: string;
   created_by: User;
   type?: string;
 }
 
+export interface ActivityImageVariant {
+  width: number;
+  height: number;
+  webp?: string;
+  jpeg?: string;
+}
+
+export interface ActivityImageVariants {
+  thumbnail: ActivityImageVariant;
+  card: ActivityImageVariant;
+  detail: ActivityImageVariant;
+  srcset: { webp?: string; jpeg?: string };
+}
+
 export interface ActivityCreate {
   title: string;
   description: string;